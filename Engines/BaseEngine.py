@@ -0,0 +1,550 @@
+from PyQt5.QtWidgets import QMessageBox
+
+from logger import log
+from modules.Batch import BatchError
+from modules.Metrics import QueryTiming
+from modules.ResultSet import ResultSet
+from modules.Tracer import Tracer
+
+from datetime import datetime
+import time
+
+
+class BaseEngine:
+    # Database cursor type code -> logical type name (int64, string, binary, decimal, timestamp, ...), see columnType
+    TYPES = dict()
+    # Logical type name -> conversion applied to not NULL cells while rows are fetched, only columns of these types
+    # are touched so plain results go from cursor to ResultSet as they are
+    CONVERTERS = {
+        'binary': bytes,
+    }
+
+    def __init__(self, context, profile, result_table=None):
+        """
+        Query Engine shared by all databases, owns executing, fetching, converting, buffering and feeding result to
+        result table. Engine of a database supply connection, cursor and type mapping of its driver
+        :param context: shared properties in application
+        :param profile: object of Profile class, contain all information regarding server connection
+        :param result_table: object of ResultTable class, to populate result into table
+        """
+        self.log = log.getLogger(self.__class__.__name__)
+
+        self.context = context
+        self.profile = profile
+        self.resultTable = result_table
+
+        self.con = None
+        self.cursor = None     # Cursor
+        self.result = None     # ResultSet
+        self.converters = []   # [(column index, converter)] of last executed query
+        self.exhausted = True
+        self.error = None
+        self.query = None
+        self.timestamp = None
+        self.timing = None     # QueryTiming of last executed query
+        self.pool = None       # ConnectionPool from which engine is checked out
+        self.cancelled = False
+        self.timedOut = False
+        self.appliedTimeout = None
+
+    ####################################################################################################################
+    # Driver specific, implemented by engine of each database
+
+    def test_connection(self):
+        """
+        Test connection to server, connection is kept in self.con
+        :return: dict with status and version
+        """
+        raise NotImplementedError
+
+    def openCursor(self, query, streaming):
+        """
+        Create cursor for query
+        :param query: SQL query
+        :param streaming: True if rows should stay on server until they are fetched
+        :return: Cursor
+        """
+        raise NotImplementedError
+
+    def isCancelError(self, error):
+        """
+        :param error: Exception raised by execute/fetch
+        :return: True if query was cancelled by user or by statement timeout
+        """
+        return self.cancelled
+
+    def afterCancel(self):
+        """
+        Bring connection back to usable state after cancelled query
+        :return: None
+        """
+        pass
+
+    def applyTimeout(self):
+        """
+        Enforce statement timeout on server side
+        :return: None
+        """
+        pass
+
+    def cancel(self, timed_out=False):
+        """
+        Cancel running query, called from any thread
+        :param timed_out: True when cancelled by client-side timeout
+        :return: None
+        """
+        raise NotImplementedError
+
+    def ping(self):
+        """
+        Check connection is still alive
+        :return: True if server responded else False
+        """
+        raise NotImplementedError
+
+    def inTransaction(self):
+        """
+        :return: True if connection has uncommitted transaction else False
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Close connection
+        :return: True if connection is closed else False
+        """
+        raise NotImplementedError
+
+    def batchCursor(self):
+        """
+        :return: Cursor on which statements of batch are executed, None if executeBatch open its own cursors
+        """
+        return self.con.cursor()
+
+    def begin(self, cursor):
+        """
+        Start transaction of batch, called only when connection has no open transaction
+        :param cursor: Cursor of batch
+        :return: None
+        """
+        cursor.execute('BEGIN')
+
+    def commit(self):
+        """
+        :return: None
+        """
+        self.con.commit()
+
+    def rollback(self):
+        """
+        :return: None
+        """
+        self.con.rollback()
+
+    def executeBatch(self, cursor, queries):
+        """
+        Execute statements in as few round trips as driver allow, one by one by default
+        :param cursor: Cursor of batch
+        :param queries: list of SQL statements
+        :return: [(seconds, rows)] of each statement
+        :raise BatchError: when statement fail, carrying results of statements executed before it
+        """
+        results = list()
+        for query in queries:
+            start = time.monotonic()
+            try:
+                self.execute(cursor, query)
+                rows = self.countRows(cursor)
+            except Exception as e:
+                raise BatchError(e, results)
+            results.append((time.monotonic() - start, rows))
+        return results
+
+    @classmethod
+    def columnType(cls, column):
+        """
+        Logical type of result column
+        :param column: item of cursor.description
+        :return: type name, None if type code is unknown
+        """
+        return cls.TYPES.get(column[1])
+
+    ####################################################################################################################
+    # Shared pipeline
+
+    def connect(self):
+        """
+        Build connection with server
+        :return: self
+        """
+        self.test_connection()
+        return self
+
+    def displayError(self, error):
+        """
+        :param error: Exception occurred while running XSQL
+        :return: self
+        """
+        error_dialog = QMessageBox()
+        error_dialog.setIcon(QMessageBox.Critical)
+        error_dialog.setWindowTitle('SQL Error')
+        error_dialog.setText(str(error))
+        error_dialog.exec_()
+        return self
+
+    def record(self, cursor, query):
+        """
+        Wrap cursor into RecordingCursor while `Record Trace` is on
+        :param cursor: Cursor created by openCursor
+        :param query: SQL query
+        :return: Cursor
+        """
+        path = self.context.server['trace.record']
+        if not path:
+            return cursor
+        from modules.Trace import RecordingCursor, TraceWriter
+        return RecordingCursor(cursor, TraceWriter.get(path), self, query)
+
+    def execute(self, cursor, query):
+        """
+        Execute query on cursor
+        :param cursor: Cursor created by openCursor
+        :param query: SQL query
+        :return: None
+        """
+        cursor.execute(query)
+
+    def hasRows(self, cursor):
+        """
+        :param cursor: Cursor of executed query
+        :return: True if query returns rows which can be fetched
+        """
+        return cursor.description is not None
+
+    def sql(self, query):
+        """
+        Query executor, called from worker thread so it must not touch any widget
+        :param query: SQL query
+        :return: self
+        """
+        self.log.info(r'{}'.format(query))
+        self.error = None
+        self.cancelled = False
+        self.timedOut = False
+        self.query = query
+        self.timestamp = str(datetime.fromtimestamp(datetime.now().timestamp()).isoformat())
+        self.result = ResultSet([])
+        self.converters = []
+        self.timing = QueryTiming(self.profile.profile, self.profile.type, query)
+        try:
+            start = time.monotonic()
+            try:
+                with Tracer.span('execute', profile=self.profile.profile):
+                    self.discard()
+                    self.applyTimeout()
+                    self.cursor = self.record(self.openCursor(query, self.context.server['streaming']), query)
+                    self.execute(self.cursor, query)
+                    self.describe(self.cursor.description)
+                    self.exhausted = not self.hasRows(self.cursor)
+            finally:
+                self.timing.add('execute', time.monotonic() - start)
+            self.fetch(self.context.editor['result.renderCount'])
+        except Exception as e:
+            if self.isCancelError(e):
+                # Cancelled by user or by statement timeout, rows fetched so far are kept
+                self.timedOut = self.timedOut or not self.cancelled
+                self.cancelled = True
+                self.exhausted = True
+                self.timing.status = 'TIMEOUT' if self.timedOut else 'CANCELLED'
+                self.log.warning('Query cancelled after {} rows, {}'.format(len(self.result), e))
+                self.afterCancel()
+                return self
+            # Executed on worker thread, error is displayed on GUI thread by EngineManager
+            self.log.error(e)
+            self.error = e
+            self.timing.status = 'ERROR'
+            self.timing.error = str(e)
+            return None
+        return self
+
+    def describe(self, description):
+        """
+        Create result buffer and converters of columns from cursor description
+        :param description: cursor.description, None when it is not known yet
+        :return: None
+        """
+        self.result = ResultSet([column[0] for column in description or []], description)
+        self.converters = self.columnConverters(description)
+
+    def columnConverters(self, description):
+        """
+        :param description: cursor.description
+        :return: [(column index, converter)] of columns which need conversion
+        """
+        converters = list()
+        for index, column in enumerate(description or []):
+            converter = self.CONVERTERS.get(self.columnType(column))
+            if converter is not None:
+                converters.append((index, converter))
+        return converters
+
+    def convert(self, batch, converters):
+        """
+        Convert cells of fetched batch which driver return in type not fit for keeping, e.g. memoryview
+        :param batch: list of row tuples
+        :param converters: [(column index, converter)]
+        :return: list of row tuples
+        """
+        if not converters or not batch:
+            return batch
+        columns = list(zip(*batch))
+        for index, converter in converters:
+            columns[index] = [None if value is None else converter(value) for value in columns[index]]
+        return list(zip(*columns))
+
+    def fetch(self, count=None):
+        """
+        Pull rows of last executed query from server in batches of server.fetchSize into ResultSet
+        :param count: number of rows to pull, None to pull all remaining rows
+        :return: number of rows pulled
+        """
+        fetched = 0
+        batch_size = self.context.server['fetchSize']
+        while not self.exhausted and not self.cancelled and (count is None or fetched < count):
+            size = batch_size if count is None else min(batch_size, count - fetched)
+            rows = self.pull(size)
+            self.result.append(rows)
+            fetched += len(rows)
+        return fetched
+
+    def pull(self, size):
+        """
+        Pull next batch of rows of last executed query from server without keeping them, export use it so ResultSet
+        shown in table is never changed from its thread
+        :param size: number of rows
+        :return: list of converted row tuples
+        """
+        start = time.perf_counter()
+        batch = self.cursor.fetchmany(size)
+        fetched_at = time.perf_counter()
+        if len(self.result) == 0 and not self.result.header and self.cursor.description:
+            # Server-side cursor describe its columns only after first fetch
+            self.describe(self.cursor.description)
+        rows = self.convert(batch, self.converters)
+        end = time.perf_counter()
+        if Tracer.enabled:
+            Tracer.complete('fetch batch', start, fetched_at, args={'rows': len(batch)})
+            Tracer.complete('convert', fetched_at, end, args={'rows': len(batch)})
+        if self.timing is not None:
+            # Remaining rows pulled later, e.g. by export, are added to same query
+            self.timing.add('fetch', fetched_at - start)
+            self.timing.add('convert', end - fetched_at)
+        if len(batch) < size:
+            self.exhausted = True
+        return rows
+
+    def stream(self, query):
+        """
+        Execute query on its own streaming cursor and yield row batches without keeping them, used by exports
+        :param query: read only SQL query
+        :return: generator, first item is cursor.description followed by lists of rows
+        """
+        self.log.info(r'Streaming {}'.format(query))
+        self.cancelled = False
+        self.timedOut = False
+        self.applyTimeout()
+        idle = not self.inTransaction()
+        batch_size = self.context.server['fetchSize']
+        cursor = self.record(self.openCursor(query, True), query)
+        try:
+            self.execute(cursor, query)
+            batch = cursor.fetchmany(batch_size) if self.hasRows(cursor) else []
+            converters = self.columnConverters(cursor.description)
+            yield cursor.description
+            while batch and not self.cancelled:
+                yield self.convert(batch, converters)
+                batch = cursor.fetchmany(batch_size) if len(batch) == batch_size else []
+        finally:
+            # Streaming cursor release rows which are not fetched on close
+            cursor.close()
+            if idle and self.inTransaction():
+                # Do not leave transaction opened by export, pool would pin connection for it
+                self.con.rollback()
+
+    def countRows(self, cursor):
+        """
+        Pull rows of executed statement of batch without keeping them
+        :param cursor: Cursor of executed statement
+        :return: number of rows returned or affected, None if driver does not know it
+        """
+        if not self.hasRows(cursor):
+            return cursor.rowcount if cursor.rowcount >= 0 else None
+        batch_size = self.context.server['fetchSize']
+        rows = 0
+        batch = cursor.fetchmany(batch_size)
+        while batch:
+            rows += len(batch)
+            batch = cursor.fetchmany(batch_size) if not self.cancelled else []
+        return rows
+
+    def batch(self, statements, transaction=False, stop_on_error=True, progress=None):
+        """
+        Run statements of `Run All` on this connection, called from worker thread. Statements are sent in chunks of
+        server.batch.size, each chunk in as few round trips as executeBatch of driver allow
+        :param statements: list of BatchStatement, status, timing and rows of each is filled
+        :param transaction: run all statements in single transaction, rolled back when any of them fail
+        :param stop_on_error: skip statements after failed statement
+        :param progress: callback receiving number of finished statements, None to not report progress
+        :return: True if every statement succeeded else False
+        """
+        self.discard()
+        self.error = None
+        self.cancelled = False
+        self.timedOut = False
+        self.applyTimeout()
+        size = max(1, self.context.server['batch.size'])
+        failed = False
+        position = 0
+        cursor = self.batchCursor()
+        # Inside transaction opened by user, e.g. while auto commit is off, batch is savepoint of that transaction
+        savepoint = transaction and self.inTransaction()
+        try:
+            if savepoint:
+                cursor.execute('SAVEPOINT xpqe_run_all')
+            elif transaction:
+                self.begin(cursor)
+            while position < len(statements) and not self.cancelled:
+                chunk = statements[position:position + size]
+                failure = None
+                with Tracer.span('execute batch', profile=self.profile.profile, statements=len(chunk)):
+                    try:
+                        results = self.executeBatch(cursor, [statement.sql for statement in chunk])
+                    except BatchError as e:
+                        results, failure = e.results, e.error
+                for statement, (seconds, rows) in zip(chunk, results):
+                    self.finish(statement, 'OK', seconds, rows, len(chunk))
+                position += len(results)
+
+                if failure is not None:
+                    self.log.error(failure)
+                    failed = True
+                    if self.cancelled:
+                        status = 'CANCELLED'
+                    elif self.isCancelError(failure):
+                        # Statement timeout stop only its own statement
+                        status = 'TIMEOUT'
+                    else:
+                        status = 'ERROR'
+                        self.error = failure
+                    self.finish(statements[position], status, None, None, len(chunk), failure)
+                    if status != 'ERROR':
+                        self.afterCancel()
+                    position += 1
+                    if stop_on_error:
+                        break
+                if progress is not None:
+                    progress(position)
+
+            if transaction and (failed or self.cancelled):
+                self.endBatch(cursor, savepoint, False)
+                for statement in statements[:position]:
+                    if statement.status == 'OK':
+                        statement.status = 'ROLLED BACK'
+            elif transaction:
+                self.endBatch(cursor, savepoint, True)
+        except Exception:
+            if transaction:
+                try:
+                    self.endBatch(cursor, savepoint, False)
+                except Exception as e:
+                    self.log.error('Unable to rollback batch, {}'.format(e))
+            raise
+        finally:
+            if cursor is not None:
+                cursor.close()
+        return not failed and not self.cancelled
+
+    def endBatch(self, cursor, savepoint, commit):
+        """
+        Commit or rollback transaction of batch
+        :param cursor: Cursor of batch
+        :param savepoint: True if batch is savepoint of transaction opened before it
+        :param commit: True to keep changes of batch
+        :return: None
+        """
+        if savepoint:
+            if not commit:
+                cursor.execute('ROLLBACK TO SAVEPOINT xpqe_run_all')
+            cursor.execute('RELEASE SAVEPOINT xpqe_run_all')
+        elif commit:
+            self.commit()
+        else:
+            self.rollback()
+
+    def finish(self, statement, status, seconds, rows, batch, error=None):
+        """
+        :param statement: object of BatchStatement class
+        :param status: OK / ERROR / TIMEOUT / CANCELLED
+        :param seconds: time taken by statement, None if not known
+        :param rows: rows returned or affected, None if not known
+        :param batch: number of statements sent in same round trip
+        :param error: Exception raised by statement
+        :return: None
+        """
+        statement.status = status
+        statement.seconds = seconds
+        statement.rows = rows
+        statement.batch = batch
+        statement.error = None if error is None else str(error)
+        statement.timing = QueryTiming(self.profile.profile, self.profile.type, statement.sql)
+        statement.timing.add('execute', seconds or 0.0)
+        statement.timing.rows = rows or 0
+        statement.timing.status = status
+        statement.timing.error = statement.error
+
+    def discard(self):
+        """
+        Close cursor of previous query, rows which are not fetched are discarded
+        :return: None
+        """
+        if self.cursor is not None and not self.exhausted:
+            self.cursor.close()
+        self.exhausted = True
+
+    def feed(self):
+        """
+        Populate table with result of executed query
+        :return: None
+        """
+        # Context is written on GUI thread, other profiles may be running queries at same time
+        self.context.xpqe['execute.sql'] = self.query
+        self.context.xpqe['execute.header'] = self.result.header
+        self.context.xpqe['execute.result'] = self.result
+        self.context.xpqe['execute.engine'] = self
+        self.context.xpqe['execute.server'] = self.profile.type
+        self.context.xpqe['execute.host'] = self.profile.host
+        self.context.xpqe['execute.timestamp'] = self.timestamp
+        start = time.monotonic()
+        try:
+            # Table model read cells lazily from result buffer, nothing is copied here
+            self.resultTable.setResult(self.context.xpqe['execute.header'], self.result)
+
+            if self.cancelled:
+                self.resultTable.resultCount.setText('{}, showing {:,} records fetched before it'.format(
+                    'Timed out' if self.timedOut else 'Cancelled',
+                    min(self.resultTable.maxRenderRecords, len(self.result))
+                ))
+            elif self.exhausted:
+                self.resultTable.resultCount.setText('Showing {:,} of {:,} records'.format(
+                    min(self.resultTable.maxRenderRecords, len(self.result)),
+                    len(self.result)
+                ))
+            else:
+                self.resultTable.resultCount.setText('Showing {:,} records, more available on server'.format(
+                    min(self.resultTable.maxRenderRecords, len(self.result))
+                ))
+        except Exception as e:
+            self.log.error(e)
+        finally:
+            if self.timing is not None:
+                self.timing.add('render', time.monotonic() - start)
@@ -1,27 +1,24 @@
-from PyQt5.QtWidgets import QTableWidgetItem, QMessageBox
+import time
 
-from logger import log
+from Engines.BaseEngine import BaseEngine
+from modules.Batch import BatchError
 
-from datetime import datetime
 
+class MySQLEngine(BaseEngine):
+    # ER_QUERY_INTERRUPTED, ER_QUERY_TIMEOUT
+    CANCEL_ERRORS = (1317, 3024)
 
-class MySQLEngine:
-    def __init__(self, context, profile, result_table=None):
-        """
-        Query Engine of MySQL database
-        :param context: shared properties in application
-        :param profile: object of Profile class, contain all information regarding server connection
-        :param result_table: object of ResultTable class, to populate result into table
-        """
-        self.log = log.getLogger(self.__class__.__name__)
-
-        self.context = context
-        self.profile = profile
-        self.resultTable = result_table
-
-        self.con = None
-        self.cursor = None     # Cursor
-        self.result = None
+    # FieldType -> logical type, BLOB kinds are binary only when BINARY_FLAG is set
+    TYPES = {
+        0: 'decimal', 1: 'int64', 2: 'int64', 3: 'int64', 4: 'float32', 5: 'float64', 7: 'timestamp', 8: 'int64',
+        9: 'int64', 10: 'date', 11: 'duration', 12: 'timestamp', 13: 'int64', 14: 'date', 15: 'string', 16: 'int64',
+        245: 'string', 246: 'decimal', 247: 'string', 248: 'string', 249: 'blob', 250: 'blob', 251: 'blob',
+        252: 'blob', 253: 'blob', 254: 'blob', 255: 'binary'
+    }
+    BINARY_FLAG = 128
+    UNSIGNED_FLAG = 32
+    # TINYINT, SMALLINT, INT, BIGINT, MEDIUMINT
+    INTEGER_TYPES = (1, 2, 3, 8, 9)
 
     def test_connection(self):
         """
@@ -39,7 +36,9 @@ class MySQLEngine:
                 port=self.profile.port,
                 database=self.profile.database,
                 user=self.profile.username,
-                password=self.profile.password
+                password=self.profile.password,
+                # Unread rows of streaming cursor are discarded when next query is executed
+                consume_results=True
             )
             self.con.autocommit = self.context.server['autoCommit']
             if self.con.is_connected():
@@ -47,7 +46,7 @@ class MySQLEngine:
                 self.log.info('Connect to MySQL server, server version: {}'.format(db_info))
                 test_info['status'] = True
                 test_info['version'] = str(db_info)
-                self.cursor = self.con.cursor(dictionary=True)
+                self.cursor = self.con.cursor()
                 self.log.info('Cursor is Created')
         except Error as e:
             test_info['status'] = False
@@ -55,88 +54,138 @@ class MySQLEngine:
 
         return test_info
 
-    def connect(self):
+    def openCursor(self, query, streaming):
         """
-        Build connection with server
-        :return: self
+        :param query: MySQL query
+        :param streaming: True if rows should stay on server until they are fetched
+        :return: Cursor
         """
-        self.test_connection()
-        return self
+        # Unbuffered cursor keep rows on server until they are fetched
+        return self.con.cursor(buffered=not streaming)
 
-    def displayError(self, error):
+    def isCancelError(self, error):
         """
-        :param error: Exception occurred while running XSQL
-        :return: self
+        :param error: Exception raised by execute/fetch
+        :return: True if query was cancelled by user or by max_execution_time
         """
-        error_dialog = QMessageBox()
-        error_dialog.setIcon(QMessageBox.Critical)
-        error_dialog.setWindowTitle('SQL Error')
-        error_dialog.setText(str(error))
-        error_dialog.exec_()
-        return self
+        return self.cancelled or getattr(error, 'errno', None) in self.CANCEL_ERRORS
 
-    def sql(self, query):
+    @classmethod
+    def columnType(cls, column):
         """
-        Query executor
-        :param query: MySQL query
-        :return: self
+        :param column: item of cursor.description
+        :return: logical type name, None if type code is unknown
+        """
+        name = cls.TYPES.get(column[1])
+        flags = column[7] if len(column) > 7 else 0
+        if name == 'blob':
+            name = 'binary' if flags and flags & cls.BINARY_FLAG else 'string'
+        elif column[1] in cls.INTEGER_TYPES and flags and flags & cls.UNSIGNED_FLAG:
+            # BIGINT UNSIGNED go past int64
+            name = 'uint64'
+        return name
+
+    def applyTimeout(self):
         """
-        self.log.info(r'{}'.format(query))
+        Enforce statement timeout on server side, only sent when timeout is changed
+        :return: None
+        """
+        timeout = self.context.statementTimeout(self.profile.profile)
+        if timeout != self.appliedTimeout:
+            cursor = self.con.cursor()
+            try:
+                # Applied to SELECT statements by MySQL 5.7.8+
+                cursor.execute('SET SESSION max_execution_time = {:d}'.format(int(timeout * 1000)))
+            except Exception as e:
+                self.log.warning('Server-side timeout is not supported, {}'.format(e))
+            finally:
+                cursor.close()
+            self.appliedTimeout = timeout
+
+    def cancel(self, timed_out=False):
+        """
+        Cancel running query with KILL QUERY over side connection, called from any thread
+        :param timed_out: True when cancelled by client-side timeout
+        :return: None
+        """
+        import mysql.connector
+
+        self.timedOut = timed_out
+        self.cancelled = True
+        if self.con is None:
+            return
+        self.log.info('Cancelling query on {}'.format(self.profile.profile))
+        side_con = mysql.connector.connect(
+            host=self.profile.host,
+            port=self.profile.port,
+            user=self.profile.username,
+            password=self.profile.password
+        )
         try:
-            self.cursor.execute(query)
-            self.result = self.cursor.fetchall()
-            self.context.xpqe['execute.sql'] = query
-            self.context.xpqe['execute.header'] = self.result[0].keys()
-            self.context.xpqe['execute.result'] = [tuple([cell[1] for cell in row.items()]) for row in self.result]
-            self.context.xpqe['execute.server'] = self.profile.type
-            self.context.xpqe['execute.host'] = self.profile.host
-            self.context.xpqe['execute.timestamp'] = str(datetime.fromtimestamp(datetime.now().timestamp()).isoformat())
+            cursor = side_con.cursor()
+            cursor.execute('KILL QUERY {:d}'.format(self.con.connection_id))
+            cursor.close()
+        finally:
+            side_con.close()
+
+    def ping(self):
+        """
+        Check connection is still alive
+        :return: True if server responded else False
+        """
+        try:
+            self.con.ping(reconnect=False)
+            return True
         except Exception as e:
-            self.log.error(e)
-            self.displayError(e)
-            return None
-        return self
+            self.log.warning('Ping failed, {}'.format(e))
+            return False
 
-    def feed(self):
+    def inTransaction(self):
         """
-        Populate table with result of executed query
-        :return: None
+        :return: True if connection has uncommitted transaction else False
         """
-        self.resultTable.clear()
-        self.resultTable.maxRenderRecords = self.context.editor['result.renderCount']
         try:
-            self.resultTable.setColumnCount(len(self.context.xpqe['execute.header']))
-            self.resultTable.setRowCount(min(self.resultTable.maxRenderRecords, len(self.result)))
-            self.resultTable.setHorizontalHeaderLabels(self.context.xpqe['execute.header'])
-            self.resultTable.setSortingEnabled(True)
-
-            for itr, column in enumerate(self.context.xpqe['execute.header']):
-                self.resultTable.horizontalHeaderItem(itr).setToolTip(column)
-
-            for itr_r, row in enumerate(self.result[:self.resultTable.maxRenderRecords]
-                                        if len(self.result) >= self.resultTable.maxRenderRecords else self.result):
-                self.resultTable.setRowHeight(itr_r, 18)
-                for itr_c, cell in enumerate(row.items()):
-                    cell_value = str('' if cell[1] is None else cell[1])
-                    cell_value_4tooltip = str('NULL' if cell[1] is None else cell[1])
-                    item = QTableWidgetItem(cell_value)
-                    item.setToolTip(cell_value_4tooltip)
-                    self.resultTable.setItem(itr_r, itr_c, item)
-
-            self.resultTable.resultCount.setText('Showing {:,} of {:,} records'.format(
-                self.resultTable.maxRenderRecords if self.cursor.rowcount > self.resultTable.maxRenderRecords else self.cursor.rowcount,
-                self.cursor.rowcount
-            ))
+            return bool(self.con.in_transaction)
+        except Exception:
+            return False
 
+    def begin(self, cursor):
+        """
+        Start transaction of batch, called only when connection has no open transaction
+        :param cursor: Cursor of batch
+        :return: None
+        """
+        self.con.start_transaction()
+
+    def executeBatch(self, cursor, queries):
+        """
+        Send statements as one multi-statement query, server run them in order and stream result of each back in
+        same round trip. Server stop at first failed statement
+        :param cursor: Cursor of batch
+        :param queries: list of SQL statements
+        :return: [(seconds, rows)] of each statement, time of statement is measured between arrival of results
+        :raise BatchError: when statement fail, carrying results of statements executed before it
+        """
+        if len(queries) == 1:
+            return super().executeBatch(cursor, queries)
+        results = list()
+        start = time.monotonic()
+        try:
+            for result in cursor.execute(';\n'.join(queries), multi=True):
+                rows = len(result.fetchall()) if result.with_rows else result.rowcount
+                now = time.monotonic()
+                results.append((now - start, rows if rows is None or rows >= 0 else None))
+                start = now
         except Exception as e:
-            self.log.error(e)
+            raise BatchError(e, results)
+        return results
 
     def close(self):
         """
         Close MySQL connection
         :return: True if connection is closed else False
         """
-        if self.con.is_connected():
+        if self.con is not None and self.con.is_connected():
             if self.cursor:
                 self.cursor.close()
             self.con.close()
@@ -1,12 +1,21 @@
-from PyQt5.QtWidgets import QTableWidgetItem, QMessageBox
+import time
+
 import psycopg2
+import psycopg2.extensions
 
-from logger import log
+from Engines.BaseEngine import BaseEngine
+from modules.Batch import BatchError
 
-from datetime import datetime
 
+class PostgreSQLEngine(BaseEngine):
+    # Type OID -> logical type
+    TYPES = {
+        16: 'bool', 17: 'binary', 18: 'string', 19: 'string', 20: 'int64', 21: 'int16', 23: 'int32', 25: 'string',
+        26: 'int64', 114: 'string', 700: 'float32', 701: 'float64', 1042: 'string', 1043: 'string', 1082: 'date',
+        1083: 'time', 1114: 'timestamp', 1184: 'timestamptz', 1186: 'duration', 1700: 'decimal', 2950: 'string',
+        3802: 'string'
+    }
 
-class PostgreSQLEngine:
     def __init__(self, context, profile, result_table=None):
         """
         Query Engine of PostgreSQL database
@@ -14,15 +23,9 @@ class PostgreSQLEngine:
         :param profile: object of Profile class, contain all information regarding server connection
         :param result_table: object of ResultTable class, to populate result into table
         """
-        self.log = log.getLogger(self.__class__.__name__)
-
-        self.context = context
-        self.profile = profile
-        self.resultTable = result_table
-
-        self.con = None
-        self.cursor = None     # Cursor
-        self.result = None
+        super().__init__(context, profile, result_table)
+        self.cursorCount = 0   # used to give unique name to server-side cursors
+        self.batchAutoCommit = None     # autocommit of connection before transaction of batch
 
     def test_connection(self):
         """
@@ -54,86 +57,231 @@ class PostgreSQLEngine:
 
         return test_info
 
-    def connect(self):
+    def openCursor(self, query, streaming):
+        """
+        :param query: PostgreSQL query
+        :param streaming: True if rows should stay on server until they are fetched
+        :return: Cursor
+        """
+        if streaming and self.isRowQuery(query):
+            # Named cursor is a server-side cursor, rows stay on server until they are fetched
+            self.cursorCount += 1
+            cursor = self.con.cursor(name='xpqe_cursor_{}'.format(self.cursorCount), withhold=self.con.autocommit)
+            cursor.itersize = self.context.server['fetchSize']
+            return cursor
+        return self.con.cursor()
+
+    def hasRows(self, cursor):
         """
-        Build connection with server
-        :return: self
+        :param cursor: Cursor of executed query
+        :return: True if query returns rows, server-side cursor describe its columns only after first fetch
         """
-        self.test_connection()
-        return self
+        return cursor.name is not None or cursor.description is not None
 
-    def displayError(self, error):
+    def isCancelError(self, error):
         """
-        :param error: Exception occurred while running XSQL
-        :return: self
+        :param error: Exception raised by execute/fetch
+        :return: True if query was cancelled by user or by statement_timeout
         """
-        error_dialog = QMessageBox()
-        error_dialog.setIcon(QMessageBox.Critical)
-        error_dialog.setWindowTitle('SQL Error')
-        error_dialog.setText(str(error))
-        error_dialog.exec_()
-        return self
+        return isinstance(error, psycopg2.extensions.QueryCanceledError)
 
-    def sql(self, query):
+    def afterCancel(self):
         """
-        Query executor
+        Failed transaction reject every following statement until it is rolled back
+        :return: None
+        """
+        if self.con.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_INERROR:
+            self.con.rollback()
+            self.appliedTimeout = None
+
+    @staticmethod
+    def isRowQuery(query):
+        """
+        Check given query can be declared as server-side cursor
         :param query: PostgreSQL query
-        :return: self
+        :return: True if query return rows else False
+        """
+        words = query.split(None, 1)
+        return len(words) > 0 and words[0].lower() in ('select', 'with', 'values', 'table')
+
+    def applyTimeout(self):
         """
-        self.log.info(r'{}'.format(query))
+        Enforce statement timeout on server side, only sent when timeout is changed
+        :return: None
+        """
+        timeout = self.context.statementTimeout(self.profile.profile)
+        if timeout == self.appliedTimeout:
+            return
+        if self.inTransaction():
+            # SET inside open transaction is undone by its rollback, it is sent again before next query
+            with self.con.cursor() as cursor:
+                cursor.execute('SET statement_timeout = %s', (int(timeout * 1000),))
+            self.appliedTimeout = None
+            return
+        # Applied in its own transaction, rollback of following statements does not revert it
+        autocommit = self.con.autocommit
+        self.con.autocommit = True
         try:
-            self.cursor.execute(query)
-            self.result = self.cursor.fetchall()
-            self.context.xpqe['execute.sql'] = query
-            self.context.xpqe['execute.header'] = [col[0] for col in self.cursor.description]
-            self.context.xpqe['execute.result'] = self.result
-            self.context.xpqe['execute.server'] = self.profile.type
-            self.context.xpqe['execute.host'] = self.profile.host
-            self.context.xpqe['execute.timestamp'] = str(datetime.fromtimestamp(datetime.now().timestamp()).isoformat())
+            with self.con.cursor() as cursor:
+                cursor.execute('SET statement_timeout = %s', (int(timeout * 1000),))
+        finally:
+            self.con.autocommit = autocommit
+        self.appliedTimeout = timeout
+
+    def cancel(self, timed_out=False):
+        """
+        Cancel running query, called from any thread
+        :param timed_out: True when cancelled by client-side timeout
+        :return: None
+        """
+        self.timedOut = timed_out
+        self.cancelled = True
+        if self.con is not None and not self.con.closed:
+            self.log.info('Cancelling query on {}'.format(self.profile.profile))
+            self.con.cancel()
+
+    def discard(self):
+        """
+        Close cursor of previous query, server-side cursor release rows which are not fetched
+        :return: None
+        """
+        if self.cursor is not None and not self.cursor.closed:
+            self.cursor.close()
+        self.exhausted = True
+
+    def ping(self):
+        """
+        Check connection is still alive
+        :return: True if server responded else False
+        """
+        if self.con is None or self.con.closed:
+            return False
+        try:
+            idle = self.con.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+            with self.con.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if idle and not self.con.autocommit:
+                # Do not leave transaction opened by ping
+                self.con.rollback()
+            return True
         except psycopg2.Error as e:
-            self.log.error(e)
-            self.displayError(e)
-            return None
-        return self
+            self.log.warning('Ping failed, {}'.format(e))
+            return False
+
+    def inTransaction(self):
+        """
+        :return: True if connection has uncommitted transaction else False
+        """
+        if self.con is None or self.con.closed:
+            return False
+        return self.con.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def begin(self, cursor):
+        """
+        Start transaction of batch, psycopg2 open it before first statement once autocommit is off
+        :param cursor: Cursor of batch
+        :return: None
+        """
+        if self.con.autocommit:
+            self.batchAutoCommit = True
+            self.con.autocommit = False
+
+    def commit(self):
+        """
+        :return: None
+        """
+        try:
+            self.con.commit()
+        finally:
+            self.restoreAutoCommit()
 
-    def feed(self):
+    def rollback(self):
         """
-        Populate table with result of executed query
         :return: None
         """
-        self.resultTable.clear()
-        self.resultTable.maxRenderRecords = self.context.editor['result.renderCount']
         try:
-            self.resultTable.setColumnCount(len(self.cursor.description))
-            self.resultTable.setRowCount(min(self.resultTable.maxRenderRecords, len(self.result)))
-            self.resultTable.setHorizontalHeaderLabels(self.context.xpqe['execute.header'])
-            self.resultTable.setSortingEnabled(True)
-
-            for itr, column in enumerate(self.context.xpqe['execute.header']):
-                self.resultTable.horizontalHeaderItem(itr).setToolTip(column)
-
-            for itr_r, row in enumerate(self.result[:self.resultTable.maxRenderRecords]
-                                        if len(self.result) >= self.resultTable.maxRenderRecords else self.result):
-                self.resultTable.setRowHeight(itr_r, 18)
-                for itr_c, cell in enumerate(row):
-                    cell_value = str('' if cell is None else cell)
-                    cell_value_4tooltip = str('NULL' if cell is None else cell)
-                    item = QTableWidgetItem(cell_value)
-                    item.setToolTip(cell_value_4tooltip)
-                    self.resultTable.setItem(itr_r, itr_c, item)
-
-            self.resultTable.resultCount.setText('Showing {:,} of {:,} records'.format(
-                self.resultTable.maxRenderRecords if self.cursor.rowcount > self.resultTable.maxRenderRecords else self.cursor.rowcount,
-                self.cursor.rowcount
-            ))
-        except Exception as e:
-            self.log.error(e)
+            self.con.rollback()
+        finally:
+            self.appliedTimeout = None
+            self.restoreAutoCommit()
+
+    def restoreAutoCommit(self):
+        """
+        Turn autocommit back on after transaction of batch
+        :return: None
+        """
+        if self.batchAutoCommit:
+            self.batchAutoCommit = None
+            self.con.autocommit = True
+
+    def executeBatch(self, cursor, queries):
+        """
+        Send statements joined into one query string, server run them in single round trip as one implicit
+        transaction (inside savepoint when transaction is already open) so failed query leave nothing behind. On
+        failure statements are run again one by one to find failed statement
+        :param cursor: Cursor of batch
+        :param queries: list of SQL statements
+        :return: [(seconds, rows)] of each statement, combined query report time shared equally between its statements
+                 and rows of its last statement only
+        :raise BatchError: when statement fail, carrying results of statements executed before it
+        """
+        if len(queries) > 1:
+            savepoint = self.inTransaction()
+            start = time.monotonic()
+            try:
+                if savepoint:
+                    cursor.execute('SAVEPOINT xpqe_batch')
+                cursor.execute(';\n'.join(queries))
+                rows = self.countRows(cursor)
+                if savepoint:
+                    cursor.execute('RELEASE SAVEPOINT xpqe_batch')
+                seconds = (time.monotonic() - start) / len(queries)
+                return [(seconds, None)] * (len(queries) - 1) + [(seconds, rows)]
+            except psycopg2.Error as e:
+                self.undo(cursor, savepoint)
+                if self.cancelled:
+                    # Nothing of combined query is applied
+                    raise BatchError(e, [])
+                self.log.info('Batch of {} statements failed, locating failed statement'.format(len(queries)))
+
+        results = list()
+        for query in queries:
+            savepoint = self.inTransaction()
+            start = time.monotonic()
+            try:
+                if savepoint:
+                    # Failed statement must not abort open transaction, following statements may still run
+                    cursor.execute('SAVEPOINT xpqe_batch')
+                cursor.execute(query)
+                rows = self.countRows(cursor)
+                if savepoint:
+                    cursor.execute('RELEASE SAVEPOINT xpqe_batch')
+            except psycopg2.Error as e:
+                self.undo(cursor, savepoint)
+                raise BatchError(e, results)
+            results.append((time.monotonic() - start, rows))
+        return results
+
+    def undo(self, cursor, savepoint):
+        """
+        Revert failed statement of batch
+        :param cursor: Cursor of batch
+        :param savepoint: True if savepoint was set before statement
+        :return: None
+        """
+        if savepoint:
+            cursor.execute('ROLLBACK TO SAVEPOINT xpqe_batch')
+        elif self.con.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_INERROR:
+            self.con.rollback()
+            self.appliedTimeout = None
 
     def close(self):
         """
         Close PostgreSQL connection
         :return: True if connection is closed else False
         """
-        self.cursor.close()
+        self.discard()
+        if self.con is not None and not self.con.closed:
+            self.con.close()
         self.log.info('PostgreSQL connection is closed')
-        return self.cursor.closed
+        return self.con is None or bool(self.con.closed)
@@ -0,0 +1,150 @@
+from collections import defaultdict
+from itertools import cycle
+from threading import Lock
+
+from Engines.BaseEngine import BaseEngine
+from modules.Batch import BatchError
+from modules.ResultCache import ResultCache
+from modules.Trace import ReplayCursor, TraceReader
+
+
+class ReplayEngine(BaseEngine):
+    # path -> (TraceReader, {normalized query: cycle of executions}), trace is read once for all connections
+    traces = dict()
+    tracesLock = Lock()
+
+    def test_connection(self):
+        """
+        Load trace recorded by `Record Trace`, Database of profile is path of trace file
+        :return: dict
+        """
+        test_info = dict()
+        try:
+            reader, _ = self.load(self.profile.database)
+            self.con = reader
+            test_info['status'] = True
+            test_info['version'] = '{} executions'.format(len(reader.executions))
+            self.log.info('Replaying {} executions of {}'.format(len(reader.executions), self.profile.database))
+        except Exception as e:
+            test_info['status'] = False
+            self.log.error('Error while loading trace, {}'.format(e))
+
+        return test_info
+
+    @classmethod
+    def load(cls, path):
+        """
+        :param path: location of trace file
+        :return: (TraceReader, {normalized query: cycle of executions})
+        """
+        with cls.tracesLock:
+            if path not in cls.traces:
+                reader = TraceReader(path)
+                executions = defaultdict(list)
+                for execution in reader.executions:
+                    executions[ResultCache.normalize(execution.query)].append(execution)
+                # Same query run many times is served from its recorded executions in turn
+                cls.traces[path] = reader, {query: cycle(items) for query, items in executions.items()}
+            return cls.traces[path]
+
+    def openCursor(self, query, streaming):
+        """
+        :param query: SQL query
+        :param streaming: not used, replayed batches are served as they were recorded
+        :return: ReplayCursor
+        :raise LookupError: when query is not in trace
+        """
+        _, executions = self.load(self.profile.database)
+        with self.tracesLock:
+            executions = executions.get(ResultCache.normalize(query))
+            if executions is None:
+                raise LookupError('Query is not recorded in {}'.format(self.profile.database))
+            execution = next(executions)
+        return ReplayCursor(execution, self.context.server['trace.speed'], lambda: self.cancelled)
+
+    def isCancelError(self, error):
+        """
+        :param error: Exception raised by execute/fetch
+        :return: True if replay was interrupted by cancel
+        """
+        return self.cancelled or isinstance(error, InterruptedError)
+
+    @classmethod
+    def columnType(cls, column):
+        """
+        :param column: TraceColumn
+        :return: logical type recorded from original engine
+        """
+        return getattr(column, 'logicalType', None)
+
+    def cancel(self, timed_out=False):
+        """
+        Interrupt replay, sleeping cursor notice it within ReplayCursor.SLEEP_STEP
+        :param timed_out: True when cancelled by client-side timeout
+        :return: None
+        """
+        self.timedOut = timed_out
+        self.cancelled = True
+
+    def ping(self):
+        """
+        :return: True, trace is always available once loaded
+        """
+        return self.con is not None
+
+    def inTransaction(self):
+        """
+        :return: False, replay never change anything
+        """
+        return False
+
+    def batchCursor(self):
+        """
+        :return: None, every replayed statement has its own cursor
+        """
+        return None
+
+    def begin(self, cursor):
+        """
+        :param cursor: not used, replay never change anything
+        :return: None
+        """
+        pass
+
+    def commit(self):
+        """
+        :return: None
+        """
+        pass
+
+    def rollback(self):
+        """
+        :return: None
+        """
+        pass
+
+    def executeBatch(self, cursor, queries):
+        """
+        Replay statements one by one, each on cursor of its recorded execution
+        :param cursor: not used
+        :param queries: list of SQL statements
+        :return: [(seconds, rows)] of each statement
+        :raise BatchError: when statement fail or is not in trace
+        """
+        results = list()
+        for query in queries:
+            try:
+                results += super().executeBatch(self.openCursor(query, False), [query])
+            except LookupError as e:
+                raise BatchError(e, results)
+            except BatchError as e:
+                raise BatchError(e.error, results)
+        return results
+
+    def close(self):
+        """
+        :return: True
+        """
+        self.con = None
+        self.log.info('Replay of {} is closed'.format(self.profile.database))
+        return True
@@ -0,0 +1,249 @@
+import re
+import sqlite3
+from threading import Lock
+
+from Engines.BaseEngine import BaseEngine
+
+
+class SQLiteEngine(BaseEngine):
+    # Database of built-in `@local:` profile, in-memory database shared by all connections of the pool
+    MEMORY = ':memory:'
+    SHARED_MEMORY = 'file:xpqe_{}?mode=memory&cache=shared'
+
+    # `GENERATE TABLE name ROWS n COLUMNS m`, synthetic table for offline testing and benchmarks
+    GENERATE = re.compile(
+        r'^\s*GENERATE\s+TABLE\s+(\w+)\s+ROWS\s+(\d+)\s+COLUMNS\s+(\d+)\s*;?\s*$', re.IGNORECASE
+    )
+    # Rows inserted per executemany while generating
+    GENERATE_BATCH = 10000
+
+    # Shared in-memory database is dropped when its last connection is closed, pool prunes idle connections so
+    # one connection per database is kept open for lifetime of application
+    keepers = dict()
+    keepersLock = Lock()
+
+    def test_connection(self):
+        """
+        Open database file of profile, `:memory:` is in-memory database shared by connections of same profile
+        :return: dict
+        """
+        test_info = dict()
+        try:
+            self.con = self.open(self.profile.database or self.MEMORY)
+            test_info['status'] = True
+            test_info['version'] = self.version()
+            self.log.info('Opened {} database {}, version: {}'.format(
+                self.profile.type, self.profile.database or self.MEMORY, test_info['version']
+            ))
+            self.cursor = self.con.cursor()
+        except Exception as e:
+            test_info['status'] = False
+            self.log.error('Error while opening {} database, {}'.format(self.profile.type, e))
+
+        return test_info
+
+    def open(self, database):
+        """
+        :param database: path of database file or `:memory:`
+        :return: connection
+        """
+        uri = False
+        if database == self.MEMORY:
+            database = self.SHARED_MEMORY.format(self.profile.profile)
+            uri = True
+            with self.keepersLock:
+                if database not in self.keepers:
+                    self.keepers[database] = sqlite3.connect(database, uri=True, check_same_thread=False)
+        # Engine is created on one worker thread and used by others, pool makes sure only one use it at a time
+        con = sqlite3.connect(database, uri=uri, check_same_thread=False)
+        if self.context.server['autoCommit']:
+            con.isolation_level = None
+        return con
+
+    def version(self):
+        """
+        :return: version of database library
+        """
+        return sqlite3.sqlite_version
+
+    def openCursor(self, query, streaming):
+        """
+        Rows of sqlite cursor are produced while they are fetched, every cursor is streaming
+        :param query: SQL query
+        :param streaming: not used
+        :return: Cursor
+        """
+        return self.con.cursor()
+
+    def execute(self, cursor, query):
+        """
+        Execute query, `GENERATE TABLE` statement is run here and return summary of generated table
+        :param cursor: Cursor created by openCursor
+        :param query: SQL query
+        :return: None
+        """
+        match = self.GENERATE.match(query)
+        if match is None:
+            cursor.execute(query)
+            return
+        name, rows, columns = match.group(1), int(match.group(2)), int(match.group(3))
+        # Statements of generating run on own cursor, cursor of query only see summary as result of query
+        self.generate(self.con.cursor(), name, rows, columns)
+        cursor.execute('SELECT ? AS "table", ? AS "rows", ? AS "columns"', (name, rows, columns))
+
+    def generate(self, cursor, name, rows, columns):
+        """
+        Replace table with deterministic synthetic data, `id` followed by integer, real and text columns in turn.
+        Text columns have low cardinality like real-world codes and labels
+        :param cursor: Cursor
+        :param name: table name
+        :param rows: number of rows
+        :param columns: number of columns besides `id`
+        :return: None
+        """
+        kinds = [('INTEGER', 'REAL', 'TEXT')[index % 3] for index in range(columns)]
+        definition = ', '.join(['id INTEGER PRIMARY KEY'] + [
+            'c{} {}'.format(index + 1, kind) for index, kind in enumerate(kinds)
+        ])
+        self.log.info('Generating {} with {:,} rows and {} columns'.format(name, rows, columns))
+        cursor.execute('DROP TABLE IF EXISTS {}'.format(name))
+        cursor.execute('CREATE TABLE {} ({})'.format(name, definition))
+
+        # Single transaction, autocommit would sync every inserted row
+        own = not self.con.in_transaction
+        if own:
+            cursor.execute('BEGIN')
+        insert = 'INSERT INTO {} VALUES ({})'.format(name, ', '.join(['?'] * (columns + 1)))
+        for start in range(0, rows, self.GENERATE_BATCH):
+            if self.cancelled:
+                break
+            cursor.executemany(insert, (
+                self.generateRow(row, kinds) for row in range(start, min(start + self.GENERATE_BATCH, rows))
+            ))
+        if own and self.cancelled:
+            self.con.rollback()
+        elif own:
+            self.con.commit()
+
+    @staticmethod
+    def generateRow(row, kinds):
+        """
+        :param row: row number
+        :param kinds: SQL type of each generated column
+        :return: tuple of row values
+        """
+        values = [row]
+        for index, kind in enumerate(kinds):
+            if kind == 'INTEGER':
+                values.append((row * 2654435761 + index) % 1000003)
+            elif kind == 'REAL':
+                values.append(row / (index + 1))
+            else:
+                values.append('v{}'.format((row * 31 + index) % 997))
+        return tuple(values)
+
+    def isCancelError(self, error):
+        """
+        :param error: Exception raised by execute/fetch
+        :return: True if query was interrupted by cancel
+        """
+        return self.cancelled or 'interrupt' in str(error).lower()
+
+    def cancel(self, timed_out=False):
+        """
+        Interrupt running query, called from any thread
+        :param timed_out: True when cancelled by client-side timeout
+        :return: None
+        """
+        self.timedOut = timed_out
+        self.cancelled = True
+        if self.con is not None:
+            self.log.info('Cancelling query on {}'.format(self.profile.profile))
+            self.con.interrupt()
+
+    def ping(self):
+        """
+        :return: True if database responded else False
+        """
+        try:
+            self.con.execute('SELECT 1').fetchall()
+            return True
+        except Exception as e:
+            self.log.warning('Ping failed, {}'.format(e))
+            return False
+
+    def inTransaction(self):
+        """
+        :return: True if connection has uncommitted transaction else False
+        """
+        try:
+            return bool(self.con.in_transaction)
+        except Exception:
+            return False
+
+    def close(self):
+        """
+        Close database connection
+        :return: True if connection is closed else False
+        """
+        if self.con is None:
+            return False
+        self.con.close()
+        self.con = None
+        self.log.info('{} connection is closed'.format(self.profile.type))
+        return True
+
+
+class DuckDBEngine(SQLiteEngine):
+    # path -> database connection, engines open their own connection on it with cursor()
+    databases = dict()
+
+    def open(self, database):
+        """
+        DuckDB allow one process to open database once, engines are cursors of single database connection
+        :param database: path of database file or `:memory:`
+        :return: connection
+        """
+        import duckdb
+
+        key = self.profile.profile if database == self.MEMORY else database
+        with self.keepersLock:
+            if key not in self.databases:
+                self.databases[key] = duckdb.connect(database)
+            return self.databases[key].cursor()
+
+    def version(self):
+        """
+        :return: version of database library
+        """
+        import duckdb
+        return duckdb.__version__
+
+    def generate(self, cursor, name, rows, columns):
+        """
+        Same data as SQLiteEngine.generate, generated by DuckDB itself
+        :param cursor: Cursor
+        :param name: table name
+        :param rows: number of rows
+        :param columns: number of columns besides `id`
+        :return: None
+        """
+        expressions = ['i AS id']
+        for index in range(columns):
+            kind = ('INTEGER', 'REAL', 'TEXT')[index % 3]
+            if kind == 'INTEGER':
+                expressions.append('(i * 2654435761 + {0}) % 1000003 AS c{1}'.format(index, index + 1))
+            elif kind == 'REAL':
+                expressions.append('i / {0}.0 AS c{1}'.format(index + 1, index + 1))
+            else:
+                expressions.append("'v' || ((i * 31 + {0}) % 997) AS c{1}".format(index, index + 1))
+        self.log.info('Generating {} with {:,} rows and {} columns'.format(name, rows, columns))
+        cursor.execute('CREATE OR REPLACE TABLE {} AS SELECT {} FROM range({:d}) t(i)'.format(
+            name, ', '.join(expressions), rows
+        ))
+
+    def inTransaction(self):
+        """
+        :return: False, DuckDB statements are committed by default
+        """
+        return False
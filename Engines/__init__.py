@@ -0,0 +1,47 @@
+import importlib
+from threading import Lock
+
+from logger import log
+
+# Server type of profile -> (module, class) of its engine. Engine module, and so its database driver, is only
+# imported first time profile of that type is used
+ENGINES = {
+    'mysql': ('Engines.MySQLEngine', 'MySQLEngine'),
+    'postgresql': ('Engines.PostgreSQLEngine', 'PostgreSQLEngine'),
+    'sqlite': ('Engines.SQLiteEngine', 'SQLiteEngine'),
+    'duckdb': ('Engines.SQLiteEngine', 'DuckDBEngine'),
+    'replay': ('Engines.ReplayEngine', 'ReplayEngine'),
+}
+
+_loaded = dict()
+_lock = Lock()
+
+
+def register_engine(server_type, module, class_name):
+    """
+    Register engine for server type, used by engines living outside of this package
+    :param server_type: server type of profile ex: mysql
+    :param module: dotted path of module holding engine
+    :param class_name: name of engine class in module
+    :return: None
+    """
+    ENGINES[server_type.lower()] = (module, class_name)
+    _loaded.pop(server_type.lower(), None)
+
+
+def get_engine_class(server_type):
+    """
+    Import engine of server type on first use, engines are created from worker threads so import is serialized
+    :param server_type: server type of profile ex: MySQL
+    :return: engine class, None if server type is unknown
+    :raise ImportError: when engine or its database driver is not installed
+    """
+    server_type = server_type.lower()
+    if server_type not in ENGINES:
+        return None
+    with _lock:
+        if server_type not in _loaded:
+            module, class_name = ENGINES[server_type]
+            log.getLogger(__name__).info('Loading {} engine'.format(server_type))
+            _loaded[server_type] = getattr(importlib.import_module(module), class_name)
+        return _loaded[server_type]
@@ -52,6 +52,13 @@ if __name__ == '__main__':
     # EDITOR
     editor = CodeEditor(context)
     highlight = CodePainter(editor.document(), STYLES)
+    editor.setPainter(highlight)
+    file_manager.attach(editor.document())
+    # Untitled edits of previous session which was not closed cleanly
+    recover_journal(editor, file_manager)
+    app.aboutToQuit.connect(file_manager.close)
+    if engine_manager.history is not None:
+        app.aboutToQuit.connect(engine_manager.history.waitForDone)
 
     window = Main(context, app, editor, engine_manager, file_manager, profiler, result_table)
     if context.window['maximized']:
@@ -0,0 +1,141 @@
+"""
+Per-keystroke cost of syntax highlighter on large script
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/highlighter.py --lines 20000 --keystrokes 200
+
+Runs from repository root, reports full highlight time, average/worst time taken by a single
+keystroke typed in middle of script and part of keystroke spent in highlightBlock. `--legacy` run same benchmark with previous rule-per-keyword
+QRegExp highlighter for comparison.
+"""
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtCore import QRegExp, Qt
+from PyQt5.QtGui import QSyntaxHighlighter, QTextCharFormat, QTextCursor, QTextDocument
+from PyQt5.QtWidgets import QApplication
+
+from modules.CodePainter import CodePainter
+
+SAMPLE = [
+    "@profile1:SELECT id, name, created_at FROM users WHERE id > 100 AND name LIKE 'a%' -- recent users",
+    "  LEFT JOIN orders o ON (o.user_id = users.id) AND o.total >= 10.5e2",
+    "/* monthly report",
+    "   spans multiple lines with 'quotes' inside */",
+    "GROUP BY 1, 2 HAVING count(*) <> 0 ORDER BY created_at DESC LIMIT 50;",
+    "INSERT INTO audit (msg) VALUES ('it''s done'), (\"double quoted\");",
+]
+
+
+class RegExpPainter(QSyntaxHighlighter):
+    """
+    Previous highlighter, one QRegExp scan of whole line per keyword, operator and brace
+    """
+    def __init__(self, document, style):
+        QSyntaxHighlighter.__init__(self, document)
+        rules = [(r'\b%s\b' % w, style['keyword']) for w in CodePainter.keywords]
+        rules += [(QRegExp.escape(o), style['operator']) for o in CodePainter.operators]
+        rules += [(QRegExp.escape(b), style['brace']) for b in CodePainter.braces]
+        rules += [
+            (r'\b[+-]?[0-9]+[lL]?\b', style['numbers']),
+            (r'\b[+-]?0[xX][0-9A-Fa-f]+[lL]?\b', style['numbers']),
+            (r'\b[+-]?[0-9]+(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?\b', style['numbers']),
+            (r'"[^"\\]*(\\.[^"\\]*)*"', style['string']),
+            (r"'[^'\\]*(\\.[^'\\]*)*'", style['string']),
+            (r'\-\- [^\n]*', style['comment']),
+        ]
+        self.rules = [(QRegExp(pattern, cs=Qt.CaseInsensitive), fmt) for pattern, fmt in rules]
+
+    def highlightBlock(self, text):
+        for exp, fmt in self.rules:
+            index = exp.indexIn(text, 0)
+            while index >= 0:
+                length = len(exp.cap(0))
+                self.setFormat(index, length, fmt)
+                index = exp.indexIn(text, index + length)
+        self.setCurrentBlockState(0)
+
+
+def run(painter_class, styles, lines, keystrokes):
+    """
+    :param painter_class: QSyntaxHighlighter subclass taking (document, style)
+    :param styles: syntax highlighter styles
+    :param lines: number of lines in script
+    :param keystrokes: number of characters typed
+    :return: dict of timings in milliseconds
+    """
+    document = QTextDocument()
+    document.setPlainText('\n'.join(SAMPLE[index % len(SAMPLE)] for index in range(lines)))
+    # Layout exists for document shown in editor, highlighter is driven by its contents changes
+    document.documentLayout()
+
+    class Timed(painter_class):
+        # Time spent in highlightBlock only, rest of keystroke cost is document layout
+        spent = 0.0
+
+        def highlightBlock(self, text):
+            begin = time.perf_counter()
+            super().highlightBlock(text)
+            Timed.spent += time.perf_counter() - begin
+
+    painter = Timed(document, styles)
+    start = time.perf_counter()
+    painter.rehighlight()
+    full = time.perf_counter() - start
+
+    cursor = QTextCursor(document.findBlockByNumber(lines // 2))
+    cursor.movePosition(QTextCursor.EndOfBlock)
+    costs = list()
+    Timed.spent = 0.0
+    for index in range(keystrokes):
+        start = time.perf_counter()
+        cursor.insertText('x' if index % 8 else ' ')
+        costs.append(time.perf_counter() - start)
+    highlight = Timed.spent / keystrokes
+
+    # Opening a block comment re-highlight every following line until state settles
+    cursor = QTextCursor(document.findBlockByNumber(lines // 2))
+    start = time.perf_counter()
+    cursor.insertText('/*')
+    cascade = time.perf_counter() - start
+
+    painter.setDocument(None)
+    return {
+        'full': full * 1000,
+        'avg': sum(costs) / len(costs) * 1000,
+        'max': max(costs) * 1000,
+        'highlight': highlight * 1000,
+        'cascade': cascade * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--lines', type=int, default=20000)
+    parser.add_argument('--keystrokes', type=int, default=200)
+    parser.add_argument('--legacy', action='store_true', help='also run previous QRegExp highlighter')
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    # Colors do not change cost, Launcher.STYLES is not imported to keep database drivers out of benchmark
+    styles = {key: QTextCharFormat() for key in ('keyword', 'operator', 'brace', 'string', 'comment', 'numbers')}
+
+    painters = [CodePainter] + ([RegExpPainter] if args.legacy else [])
+    print('{:<16} {:>10} {:>14} {:>14} {:>16} {:>13}'.format(
+        'highlighter', 'full (ms)', 'keystroke avg', 'keystroke max', 'highlight avg', 'open /* (ms)'
+    ))
+    for painter_class in painters:
+        result = run(painter_class, styles, args.lines, args.keystrokes)
+        print('{:<16} {:>10.1f} {:>14.3f} {:>14.3f} {:>16.3f} {:>13.1f}'.format(
+            painter_class.__name__, result['full'], result['avg'], result['max'], result['highlight'],
+            result['cascade']
+        ))
+    del app
+
+
+if __name__ == '__main__':
+    main()
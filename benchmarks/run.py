@@ -0,0 +1,518 @@
+"""
+Benchmark suite of hot paths, timings are compared with baseline and regressions fail the run
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/run.py
+    QT_QPA_PLATFORM=offscreen python benchmarks/run.py --save            # record new baseline
+    QT_QPA_PLATFORM=offscreen python benchmarks/run.py --filter 'feed.*' --repeat 5
+
+Runs from repository root without database server, rows come from fake cursors serving generated rows through
+ReplayCursor. Settings and profiles are written into temporary directory. Every benchmark is run once to warm up,
+then --repeat times, each run is divided by time of fixed calibration loop timed right before it. Median of these
+ratios is compared with benchmarks/baseline.json, exit with 1 if any benchmark is slower than baseline by more than
+--threshold. Calibration cancels out overall speed of machine and its load at the moment, not differences of CPU
+caches, Qt or Python builds. Baseline must be recorded again with --save on every machine it is compared on, and
+again after Python / PyQt5 / pyarrow upgrade.
+"""
+import argparse
+import fnmatch
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Settings of benchmark never touch settings of user
+HOME = tempfile.mkdtemp(prefix='xpqe-bench-')
+os.environ['HOME'] = HOME
+os.environ['XDG_CONFIG_HOME'] = HOME
+
+from PyQt5.QtGui import QTextCharFormat, QTextDocument
+from PyQt5.QtWidgets import QApplication, QLabel
+
+BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+# Differences below this many seconds are noise of timer, scheduler and file system (profiler.load jitter by few ms
+# even relative to calibration), never reported as regression
+MIN_DELTA = 0.005
+# Runs of calibration loop before each timed run, fastest of them is taken
+CALIBRATION_REPEAT = 3
+
+# Column kinds of generated rows, same as `GENERATE TABLE`
+KINDS = ('INTEGER', 'REAL', 'TEXT', 'INTEGER', 'REAL', 'TEXT', 'INTEGER')
+LOGICAL_TYPES = {'INTEGER': 'int64', 'REAL': 'float64', 'TEXT': 'string'}
+
+BENCHMARKS = list()     # [(name, setup)], setup return callable which is timed
+
+
+def benchmark(name, repeat=None):
+    """
+    Register benchmark, decorated function prepare state and return callable to be timed
+    :param name: name of benchmark, `group.case`
+    :param repeat: runs of slow benchmark, overrides --repeat when smaller
+    :return: decorator
+    """
+    def register(setup):
+        BENCHMARKS.append((name, setup, repeat))
+        return setup
+    return register
+
+
+class Fixture:
+    # rows -> list of generated rows, shared by benchmarks of same size
+    rows = dict()
+
+    def __init__(self):
+        """
+        Application objects shared by benchmarks, created once
+        """
+        from gui.ResultTable import ResultTable
+        from modules.Context import Context
+        from modules.EngineManager import EngineManager
+        from modules.Profiler import Profiler
+
+        self.workdir = tempfile.mkdtemp(prefix='data-', dir=HOME)
+        self.context = Context()
+        self.context.server['cache.enabled'] = False
+        self.context.server['trace.record'] = ''
+        # Profiler keep its file in working directory
+        cwd = os.getcwd()
+        os.chdir(self.workdir)
+        try:
+            self.profiler = Profiler()
+        finally:
+            os.chdir(cwd)
+        self.resultTable = ResultTable(self.context)
+        self.resultTable.resultCount = QLabel()
+        self.engineManager = EngineManager(self.context, self.profiler, self.resultTable)
+
+    @classmethod
+    def generate(cls, count):
+        """
+        :param count: number of rows
+        :return: list of deterministic rows
+        """
+        if count not in cls.rows:
+            from Engines.SQLiteEngine import SQLiteEngine
+            cls.rows[count] = [SQLiteEngine.generateRow(row, KINDS) for row in range(count)]
+        return cls.rows[count]
+
+    def engine(self, count):
+        """
+        Engine serving generated rows from fake cursor
+        :param count: number of rows returned by every query
+        :return: FakeEngine
+        """
+        from modules.Profiler import Profile
+
+        return FakeEngine(self.context, Profile('bench', 'SQLite'), self.resultTable, self.generate(count))
+
+    def path(self, name):
+        """
+        :param name: file name
+        :return: location in temporary directory of benchmark
+        """
+        return os.path.join(self.workdir, name)
+
+
+def fake_engine_class():
+    """
+    :return: engine class built on BaseEngine with cursor serving rows from memory
+    """
+    from Engines.BaseEngine import BaseEngine
+    from modules.Trace import ReplayCursor, TraceExecution
+
+    class Engine(BaseEngine):
+        def __init__(self, context, profile, result_table, rows):
+            """
+            :param rows: rows returned by every query
+            """
+            super().__init__(context, profile, result_table)
+            description = [('id', None, None, None, None, None, None)] + [
+                ('c{}'.format(index + 1), None, None, None, None, None, None) for index in range(len(KINDS))
+            ]
+            self.execution = TraceExecution(
+                'bench', 'SQLite', 'SELECT * FROM bench', description,
+                ['int64'] + [LOGICAL_TYPES[kind] for kind in KINDS], 0
+            )
+            # Cursor hand out rows in batches it was given, batch of fetchSize is what driver buffer
+            size = context.server['fetchSize']
+            self.execution.batches = [(0, rows[index:index + size]) for index in range(0, len(rows), size)]
+            self.execution.rows = len(rows)
+
+        def openCursor(self, query, streaming):
+            return ReplayCursor(self.execution, speed=0)
+
+        def inTransaction(self):
+            return False
+
+    return Engine
+
+
+FakeEngine = None
+
+
+########################################################################################################################
+# Benchmarks
+
+def highlighter_styles():
+    return {key: QTextCharFormat() for key in ('keyword', 'operator', 'brace', 'string', 'comment', 'numbers')}
+
+
+@benchmark('highlight.full.20k')
+def bench_highlight_full(fixture):
+    from highlighter import SAMPLE
+    from modules.CodePainter import CodePainter
+
+    document = QTextDocument()
+    document.setPlainText('\n'.join(SAMPLE[index % len(SAMPLE)] for index in range(20000)))
+    document.documentLayout()
+    painter = CodePainter(document, highlighter_styles())
+    fixture.keep = document, painter
+    return painter.rehighlight
+
+
+@benchmark('highlight.keystrokes.100')
+def bench_highlight_keystrokes(fixture):
+    from PyQt5.QtGui import QTextCursor
+    from highlighter import SAMPLE
+    from modules.CodePainter import CodePainter
+
+    document = QTextDocument()
+    document.setPlainText('\n'.join(SAMPLE[index % len(SAMPLE)] for index in range(20000)))
+    document.documentLayout()
+    painter = CodePainter(document, highlighter_styles())
+    fixture.keep = document, painter
+    cursor = QTextCursor(document.findBlockByNumber(10000))
+    cursor.movePosition(QTextCursor.EndOfBlock)
+
+    def run():
+        for index in range(100):
+            cursor.insertText('x' if index % 8 else ' ')
+    return run
+
+
+def feed(fixture, count):
+    engine = fixture.engine(count)
+
+    def run():
+        engine.sql('SELECT * FROM bench')
+        engine.fetch()
+        engine.feed()
+    return run
+
+
+@benchmark('feed.1k')
+def bench_feed_1k(fixture):
+    return feed(fixture, 1000)
+
+
+@benchmark('feed.100k')
+def bench_feed_100k(fixture):
+    return feed(fixture, 100000)
+
+
+@benchmark('feed.1m', repeat=3)
+def bench_feed_1m(fixture):
+    return feed(fixture, 1000000)
+
+
+def prepare_result(fixture, count):
+    """
+    Fully fetched result of `count` rows shown in table, as it is before export
+    :param fixture: Fixture
+    :param count: number of rows
+    :return: None
+    """
+    engine = fixture.engine(count)
+    engine.sql('SELECT * FROM bench')
+    engine.fetch()
+    engine.feed()
+
+
+def export_worker(fixture, writer, name):
+    """
+    Export is run by ExportWorker on thread pool, it is run here on calling thread so only writing is timed
+    :return: callable
+    """
+    from modules.Exporter import ExportWorker
+
+    path = fixture.path(name)
+
+    def run():
+        worker = ExportWorker(fixture.engineManager, writer(), path)
+        errors = list()
+        worker.signals.failed.connect(lambda _, error: errors.append(error))
+        worker.run()
+        if errors:
+            raise errors[0]
+    return run
+
+
+@benchmark('export.csv.100k')
+def bench_export_csv(fixture):
+    from modules.Exporter import CsvWriter
+
+    prepare_result(fixture, 100000)
+    return export_worker(fixture, CsvWriter, 'export.csv')
+
+
+@benchmark('export.parquet.100k')
+def bench_export_parquet(fixture):
+    from modules.Exporter import ArrowWriter
+
+    prepare_result(fixture, 100000)
+    return export_worker(fixture, lambda: ArrowWriter(ArrowWriter.PARQUET, 'SQLite'), 'export.parquet')
+
+
+@benchmark('export.feather.100k')
+def bench_export_feather(fixture):
+    from modules.Exporter import ArrowWriter
+
+    prepare_result(fixture, 100000)
+    return export_worker(fixture, lambda: ArrowWriter(ArrowWriter.FEATHER, 'SQLite'), 'export.feather')
+
+
+@benchmark('export.html.100k')
+def bench_export_html(fixture):
+    from modules.Exporter import HtmlWriter
+
+    prepare_result(fixture, 100000)
+    return export_worker(fixture, lambda: HtmlWriter('SELECT * FROM bench', 'SELECT * FROM bench'), 'export.html')
+
+
+@benchmark('export.pdf.1k', repeat=3)
+def bench_export_pdf(fixture):
+    import pylatex  # noqa: F401, PDF export is skipped when pylatex is not installed
+
+    from modules.Exporter import PdfWriter
+
+    prepare_result(fixture, 1000)
+    return export_worker(fixture, lambda: PdfWriter(fixture.context), 'export.pdf')
+
+
+@benchmark('copy.cells.200k')
+def bench_copy_cells(fixture):
+    # 25,000 rows of 8 columns selected in table
+    fixture.context.editor['result.renderCount'] = 25000
+    prepare_result(fixture, 25000)
+    model = fixture.resultTable.resultModel
+    cells = [model.index(row, column) for row in range(model.rowCount()) for column in range(model.columnCount())]
+    copy = getattr(fixture.resultTable, '_ResultTable__copy_select_cells')
+    return lambda: copy(cells)
+
+
+@benchmark('profiler.load.5k')
+def bench_profiler_load(fixture):
+    from modules.Profiler import Profile, Profiler
+
+    directory = tempfile.mkdtemp(prefix='profiles-', dir=HOME)
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        profiler = Profiler()
+        for index in range(5000):
+            profiler.addProfile(Profile(
+                'shard{:04d}'.format(index), ('MySQL', 'PostgreSQL')[index % 2], host='db{}.example'.format(index),
+                port=3306, database='app', username='reader', password='secret'
+            ))
+        profiler.save()
+    finally:
+        os.chdir(cwd)
+    fixture.profilesDirectory = directory
+
+    def run():
+        os.chdir(directory)
+        try:
+            fixture.profiles = Profiler()
+        finally:
+            os.chdir(cwd)
+    return run
+
+
+@benchmark('profiler.lookup.5k')
+def bench_profiler_lookup(fixture):
+    if getattr(fixture, 'profiles', None) is None:
+        bench_profiler_load(fixture)()
+    profiler = fixture.profiles
+    names = list(profiler.names)
+
+    def run():
+        for name in names:
+            profiler.getProfile(name)
+            profiler.getProfileIndex(profile_name=name)
+            profiler.checkProfileName(profile_name=name)
+        for index in range(100):
+            profiler.findProfiles(['shard{:02d}*'.format(index), 'shard0001'])
+    return run
+
+
+@benchmark('parse.statements.2k')
+def bench_parse(fixture):
+    from modules.EngineManager import EngineManager
+
+    class DispatchManager(EngineManager):
+        # Parsing only, queries are not executed
+        def executeEngine(self, profile_name, xsql, bypass_cache=False):
+            self.dispatched += 1
+
+        def executeFanOut(self, profile_names, xsql):
+            self.dispatched += 1
+
+    manager = DispatchManager(fixture.context, fixture.profiler, fixture.resultTable)
+    manager.dispatched = 0
+    fixture.keep = manager
+    statements = [
+        "@local: SELECT id, c1, c3 FROM orders WHERE c3 = 'v{0};' AND id > {0}; -- statement {0}\n"
+        "/* report of\n   order {0} */\n".format(index)
+        for index in range(2000)
+    ]
+    xsql = '\n'.join(statements)
+    return lambda: manager.parse(xsql)
+
+
+########################################################################################################################
+# Runner
+
+def calibration():
+    """
+    Fixed pure Python work of string, dict and list operations similar to hot paths of application
+    :return: None
+    """
+    counts = dict()
+    cells = list()
+    for index in range(20000):
+        text = 'v{}'.format(index % 997)
+        counts[text] = counts.get(text, 0) + 1
+        cells.append(text.upper())
+    ','.join(sorted(cells[:5000]))
+
+
+def timed(run):
+    """
+    :param run: callable
+    :return: seconds taken by run
+    """
+    start = time.perf_counter()
+    run()
+    seconds = time.perf_counter() - start
+    QApplication.processEvents()
+    return seconds
+
+
+def measure(run, repeat):
+    """
+    Each timed run is paired with calibration loop timed right before it, so load of machine during that run is
+    cancelled out
+    :param run: callable
+    :param repeat: number of runs, first run is warm up and not timed
+    :return: (median seconds, median ratio of run to calibration)
+    """
+    run()
+    QApplication.processEvents()
+    timings = list()
+    ratios = list()
+    for _ in range(repeat):
+        unit = min(timed(calibration) for _ in range(CALIBRATION_REPEAT))
+        seconds = timed(run)
+        timings.append(seconds)
+        ratios.append(seconds / unit)
+    return statistics.median(timings), statistics.median(ratios)
+
+
+def load_baseline(path):
+    """
+    :param path: location of baseline file
+    :return: {name: ratio to calibration}, empty if there is no baseline
+    """
+    if not os.path.exists(path):
+        return dict()
+    with open(path) as file:
+        baseline = json.load(file)
+    if baseline.get('unit') != 'calibration':
+        print('Baseline {} has absolute timings, record it again with --save\n'.format(path))
+        return dict()
+    return baseline['benchmarks']
+
+
+def save_baseline(path, results, baseline):
+    """
+    :param path: location of baseline file
+    :param results: {name: ratio to calibration}
+    :param baseline: {name: ratio to calibration} loaded from file, benchmarks not run keep it
+    :return: None
+    """
+    benchmarks = dict(baseline)
+    benchmarks.update({name: round(ratio, 4) for name, ratio in results.items()})
+    with open(path, 'w') as file:
+        json.dump({
+            'python': platform.python_version(),
+            'machine': '{} {}'.format(platform.system(), platform.machine()),
+            'recorded': time.strftime('%Y-%m-%d'),
+            'unit': 'calibration',
+            'benchmarks': dict(sorted(benchmarks.items())),
+        }, file, indent=2)
+        file.write('\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--filter', default='*', help='glob of benchmark names to run')
+    parser.add_argument('--repeat', type=int, default=11, help='timed runs, median of them is compared')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed slow down, 0.25 is 25%%')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save', action='store_true', help='record results as baseline')
+    args = parser.parse_args()
+
+    global FakeEngine
+    logging.disable(logging.WARNING)
+    app = QApplication(sys.argv)
+    FakeEngine = fake_engine_class()
+    fixture = Fixture()
+    baseline = load_baseline(args.baseline)
+
+    results = dict()
+    failed = list()
+    print('{:<26} {:>12} {:>9} {:>9} {:>9}'.format('benchmark', 'median (ms)', 'ratio', 'base', 'change'))
+    try:
+        for name, setup, repeat in BENCHMARKS:
+            if not fnmatch.fnmatchcase(name, args.filter):
+                continue
+            try:
+                run = setup(fixture)
+            except ImportError as e:
+                print('{:<26} {:>12}   {}'.format(name, 'skipped', e))
+                continue
+            seconds, ratio = measure(run, min(args.repeat, repeat or args.repeat))
+            results[name] = ratio
+            base = baseline.get(name)
+            if base is None:
+                print('{:<26} {:>12.2f} {:>9.2f} {:>9} {:>9}'.format(name, seconds * 1000, ratio, '-', ''))
+                continue
+            change = ratio / base - 1 if base else 0.0
+            # Baseline time under present load is seconds / ratio * base
+            regressed = change > args.threshold and seconds - seconds / ratio * base > MIN_DELTA
+            if regressed:
+                failed.append(name)
+            print('{:<26} {:>12.2f} {:>9.2f} {:>9.2f} {:>+8.1f}%{}'.format(
+                name, seconds * 1000, ratio, base, change * 100, '  REGRESSION' if regressed else ''
+            ))
+    finally:
+        shutil.rmtree(HOME, ignore_errors=True)
+
+    if args.save:
+        save_baseline(args.baseline, results, baseline)
+        print('\nBaseline saved to {}'.format(args.baseline))
+    elif failed:
+        print('\nFAIL slower than baseline by more than {:.0%}: {}'.format(args.threshold, ', '.join(failed)))
+    del app
+    sys.exit(1 if failed and not args.save else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Cold start cost of XPQE, time from interpreter start to first paint of main window
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/startup.py --runs 5 --budget 1500
+
+Runs from repository root. Every run start Launcher in fresh interpreter with `-X importtime`, with empty
+settings directory so no dialog is shown, and stop it at first paint of main window. Reports median time to first
+paint, import time of modules imported on the way and slowest of them. Exit with 1 if time to first paint is over
+budget or a database driver / export library is imported before first paint.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Must be imported only when they are used, not to show the window
+LAZY_MODULES = ('psycopg2', 'mysql', 'pylatex', 'pyarrow', 'duckdb')
+
+# Launcher is run as __main__, QApplication is replaced by subclass which stop at first paint of main window
+DRIVER = '''
+import runpy, sys, time
+from PyQt5 import QtWidgets
+from PyQt5.QtCore import QEvent
+
+
+class FirstPaintApplication(QtWidgets.QApplication):
+    def notify(self, receiver, event):
+        result = super().notify(receiver, event)
+        if event.type() == QEvent.Paint and isinstance(receiver, QtWidgets.QMainWindow):
+            sys.stdout.write('first-paint {:.6f}\\n'.format(time.perf_counter()))
+            sys.stdout.flush()
+            self.exit(0)
+        return result
+
+
+QtWidgets.QApplication = FirstPaintApplication
+sys.stdout.write('start {:.6f}\\n'.format(time.perf_counter()))
+sys.argv = ['Launcher.py']
+runpy.run_path('Launcher.py', run_name='__main__')
+'''
+
+IMPORT_TIME = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$')
+
+
+def run_once(timeout):
+    """
+    Start Launcher once in fresh interpreter
+    :param timeout: seconds before run is abandoned
+    :return: (milliseconds to first paint, {module: (self us, cumulative us)} of top level imports)
+    """
+    with tempfile.TemporaryDirectory() as home:
+        env = dict(os.environ)
+        env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+        # Fresh settings, no journal to recover and no stored window state
+        env['HOME'] = home
+        env['XDG_CONFIG_HOME'] = home
+        # Interpreter start is part of cold start
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', DRIVER], cwd=ROOT, env=env, timeout=timeout,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True
+        )
+
+    marks = dict(line.split() for line in process.stdout.splitlines() if line.startswith(('start', 'first-paint')))
+    if 'first-paint' not in marks:
+        sys.stderr.write(process.stderr[-4000:])
+        raise RuntimeError('Main window was never painted, exit code {}'.format(process.returncode))
+
+    modules = dict()
+    total = 0
+    for line in process.stderr.splitlines():
+        match = IMPORT_TIME.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules[name] = (int(self_us), int(cumulative_us))
+            if len(indent) == 1:
+                total += int(cumulative_us)
+    # Driver start mark is taken after interpreter start up, imports of interpreter start up are added to it
+    paint = (float(marks['first-paint']) - float(marks['start'])) * 1000
+    return paint, total / 1000, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=None, help='maximum median time to first paint in ms')
+    parser.add_argument('--top', type=int, default=10, help='number of slowest modules to report')
+    parser.add_argument('--timeout', type=float, default=60)
+    args = parser.parse_args()
+
+    paints = list()
+    imports = list()
+    modules = dict()
+    for _ in range(args.runs):
+        paint, total, modules = run_once(args.timeout)
+        paints.append(paint)
+        imports.append(total)
+
+    paint = statistics.median(paints)
+    print('time to first paint  {:>9.1f} ms (median of {}, min {:.1f}, max {:.1f})'.format(
+        paint, args.runs, min(paints), max(paints)
+    ))
+    print('import time          {:>9.1f} ms (median)'.format(statistics.median(imports)))
+    print('modules imported     {:>9}'.format(len(modules)))
+    print()
+    print('{:<48} {:>10} {:>12}'.format('slowest modules (last run)', 'self (ms)', 'cumul. (ms)'))
+    for name, (self_us, cumulative_us) in sorted(modules.items(), key=lambda item: -item[1][0])[:args.top]:
+        print('{:<48} {:>10.1f} {:>12.1f}'.format(name, self_us / 1000, cumulative_us / 1000))
+
+    failed = False
+    eager = sorted({name for name in modules if name.split('.')[0] in LAZY_MODULES})
+    if eager:
+        print('\nFAIL imported before first paint: {}'.format(', '.join(eager)))
+        failed = True
+    if args.budget is not None and paint > args.budget:
+        print('\nFAIL time to first paint {:.1f} ms is over budget of {:.1f} ms'.format(paint, args.budget))
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,9 +2,12 @@ from PyQt5.QtGui import QColor, QTextFormat, QPainter, QFont
 
 from logger import log
 
-from PyQt5.QtCore import QSize, QRect, Qt
+from PyQt5.QtCore import QSize, QRect, Qt, QTimer
 from PyQt5.QtWidgets import QWidget, QPlainTextEdit, QTextEdit
 
+from modules.FileLoader import FileLoader
+from modules.StatementIndex import StatementIndex
+
 
 class LineNumberArea(QWidget):
     def __init__(self, editor):
@@ -29,7 +32,6 @@ class LineNumberArea(QWidget):
         :param event: object of event
         :return: None
         """
-        self.log.debug('paintEvent()')
         self.editor.lineNumberAreaPaintEvent(event)
 
 
@@ -47,6 +49,11 @@ class CodeEditor(QPlainTextEdit):
         self.cursorLocation = None
         self.setUndoRedoEnabled(True)
 
+        self.painter = None         # CodePainter, set by Launcher
+        self.largeFile = False      # highlight only viewport and do not wrap lines
+        self.loader = None          # FileLoader of file being loaded
+        self.lineNumberWidth = None
+
         font = QFont()
         font.setPointSize(self.context.editor['font.pointSize'])
         font.setFamily(self.context.editor['font.family'])
@@ -55,13 +62,132 @@ class CodeEditor(QPlainTextEdit):
         self.setFont(font)
 
         self.lineNumberArea = LineNumberArea(self)
+        # Statements of text, Ctrl+Enter run statement under cursor
+        self.statementIndex = StatementIndex(self.document(), self)
+
+        # Status bar is updated at most once per interval, not on every cursor move or repaint
+        self.statusTimer = QTimer(self)
+        self.statusTimer.setSingleShot(True)
+        self.statusTimer.setInterval(100)
+        self.statusTimer.timeout.connect(self.updateCursorLocation)
+
+        # Viewport highlighting of large file mode
+        self.paintTimer = QTimer(self)
+        self.paintTimer.setSingleShot(True)
+        self.paintTimer.setInterval(30)
+        self.paintTimer.timeout.connect(self.paintViewport)
 
         self.blockCountChanged.connect(self.updateLineNumberAreaWidth)
         self.updateRequest.connect(self.updateLineNumberArea)
         self.cursorPositionChanged.connect(self.highlightCurrentLine)
+        self.cursorPositionChanged.connect(self.scheduleCursorLocation)
+        self.selectionChanged.connect(self.scheduleCursorLocation)
 
         self.updateLineNumberAreaWidth(0)
 
+    def setPainter(self, painter):
+        """
+        :param painter: object of CodePainter class attached to document of editor
+        :return: None
+        """
+        self.painter = painter
+
+    def setLargeFileMode(self, enabled):
+        """
+        Large file mode detach syntax highlighter from document, only blocks in viewport are painted
+        :param enabled: True/False
+        :return: None
+        """
+        if enabled == self.largeFile:
+            return
+        self.log.info('Large file mode: {}'.format(enabled))
+        self.largeFile = enabled
+        self.setLineWrapMode(QPlainTextEdit.NoWrap if enabled else QPlainTextEdit.WidgetWidth)
+        if self.painter is not None:
+            self.painter.setDocument(None if enabled else self.document())
+        if enabled:
+            self.paintTimer.start()
+
+    def openLargeFile(self, location):
+        """
+        Load file incrementally in large file mode
+        :param location: path of file
+        :return: object of FileLoader class, finished signal is emitted when whole file is loaded
+        """
+        if self.loader is not None:
+            self.loader.cancel()
+        self.setLargeFileMode(True)
+        self.loader = FileLoader(self, location)
+        self.loader.progress.connect(self.showLoadProgress)
+        self.loader.finished.connect(self.onLoaded)
+        return self.loader.start()
+
+    def setPlainText(self, text):
+        """
+        Replace whole text, loading of large file is stopped and normal mode is restored
+        :param text: content of editor
+        :return: None
+        """
+        if self.loader is not None:
+            self.loader.cancel()
+            self.loader = None
+        self.setLargeFileMode(False)
+        super().setPlainText(text)
+
+    def showLoadProgress(self, loaded, total):
+        """
+        :param loaded: bytes loaded
+        :param total: size of file
+        :return: None
+        """
+        if self.cursorLocation is not None:
+            self.cursorLocation.setText('Loading {:.0f}%'.format(100 * loaded / total if total else 100))
+        self.paintTimer.start()
+
+    def onLoaded(self, location, digest):
+        """
+        :param location: path of loaded file
+        :param digest: MD5 of loaded text
+        :return: None
+        """
+        self.loader = None
+        self.updateCursorLocation()
+
+    def paintViewport(self):
+        """
+        Highlight blocks visible in viewport, used in large file mode
+        :return: None
+        """
+        if not self.largeFile or self.painter is None:
+            return
+        first = self.firstVisibleBlock()
+        last = self.cursorForPosition(self.viewport().rect().bottomRight()).block()
+        if first.isValid() and last.isValid():
+            self.painter.paintBlocks(first, last)
+
+    def scheduleCursorLocation(self):
+        """
+        Throttle status bar update while cursor is moving or selection is growing
+        :return: None
+        """
+        if not self.statusTimer.isActive():
+            self.statusTimer.start()
+
+    def updateCursorLocation(self):
+        """
+        Show cursor position and selection size in status bar, selected text is not copied to measure it
+        :return: None
+        """
+        if self.cursorLocation is None or self.loader is not None:
+            return
+        cursor = self.textCursor()
+        selected = cursor.selectionEnd() - cursor.selectionStart()
+        self.cursorLocation.setText('Ln {}, Col {}{}'.format(
+            cursor.blockNumber(),
+            cursor.columnNumber(),
+            ' ({} selected)'.format(selected) if selected else ''
+        ))
+
     def highlightCurrentLine(self):
         """
         Highlight current line with different background color
@@ -98,8 +224,10 @@ class CodeEditor(QPlainTextEdit):
         :param _: event
         :return: None
         """
-        self.log.debug('updateLineNumberAreaWidth(): margin = {}'.format(self.lineNumberAreaWidth()))
-        self.setViewportMargins(self.lineNumberAreaWidth(), 0, 0, 0)
+        width = self.lineNumberAreaWidth()
+        if width != self.lineNumberWidth:
+            self.lineNumberWidth = width
+            self.setViewportMargins(width, 0, 0, 0)
 
     def updateLineNumberArea(self, rect, dy):
         """
@@ -108,36 +236,24 @@ class CodeEditor(QPlainTextEdit):
         :param dy: Scroll location
         :return: None
         """
-        self.log.debug('updateLineNumberArea(): rect = {}, dy = {}'.format(rect, dy))
-
-        cursor = self.textCursor()
-        selected_text_details = '' if len(cursor.selectedText()) == 0 else ' ({} selected)'.format(
-            len(cursor.selectedText())
-        )
-        self.cursorLocation.setText('Ln {}, Col {}{}'.format(
-            cursor.blockNumber(),
-            cursor.columnNumber(),
-            selected_text_details)
-        )
-
+        # Called on every repaint of editor, must stay cheap
         if dy:
             self.lineNumberArea.scroll(0, dy)
         else:
             self.lineNumberArea.update(0, rect.y(), self.lineNumberArea.width(), rect.height())
 
-        self.log.debug('updateLineNumberArea(): rect.contains(self.viewport().rect()) = {}'.format(
-            rect.contains(self.viewport().rect()))
-        )
         if rect.contains(self.viewport().rect()):
             self.updateLineNumberAreaWidth(0)
 
+        if self.largeFile and not self.paintTimer.isActive():
+            self.paintTimer.start()
+
     def lineNumberAreaPaintEvent(self, event):
         """
         Paint line number on editor event on editor
         :param event: object of event
         :return: None
         """
-        self.log.debug('lineNumberAreaPaintEvent()')
         painter = QPainter(self.lineNumberArea)
         painter.fillRect(event.rect(), Qt.lightGray)
 
@@ -152,7 +268,7 @@ class CodeEditor(QPlainTextEdit):
             if block.isVisible() and (bottom >= event.rect().top()):
                 number = str(block_number + 1) + ' '
                 painter.setPen(Qt.black)
-                painter.drawText(0, top, self.lineNumberArea.width(), height, Qt.AlignRight, number)
+                painter.drawText(0, int(top), self.lineNumberArea.width(), height, Qt.AlignRight, number)
 
             block = block.next()
             top = bottom
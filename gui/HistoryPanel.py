@@ -0,0 +1,170 @@
+from datetime import datetime
+
+from PyQt5.QtGui import *
+from PyQt5.QtWidgets import *
+from PyQt5.QtCore import *
+
+# Custom Imports
+from logger import log
+from modules.Metrics import format_seconds
+
+
+class HistoryPanel(QDockWidget):
+    # Milliseconds search wait after last keystroke
+    SEARCH_DELAY = 150
+    # Entries listed at once
+    LIMIT = 200
+
+    HEADER = ['Started', 'Profile', 'Status', 'Seconds', 'Rows', 'Query']
+
+    def __init__(self, history, editor, parent=None):
+        """
+        Searchable list of executed queries, double click put query into editor
+        :param history: object of History class
+        :param editor: object of CodeEditor class
+        :param parent: main window
+        """
+        super().__init__('History', parent)
+        self.log = log.getLogger(self.__class__.__name__)
+
+        self.history = history
+        self.editor = editor
+
+        self.search_input = None
+        self.result_list = None
+        self.stats_label = None
+        self.statements = list()    # statement id of each listed entry
+
+        self.searchTimer = QTimer(self)
+        self.searchTimer.setSingleShot(True)
+        self.searchTimer.setInterval(self.SEARCH_DELAY)
+        self.searchTimer.timeout.connect(self.search)
+
+        self.setObjectName('historyPanel')
+        self.ui()
+
+        self.history.written.connect(self.onWritten)
+        self.visibilityChanged.connect(self.onVisibilityChanged)
+
+    def ui(self):
+        """
+        UI of History Panel
+        :return: None
+        """
+        frame = QWidget()
+        layout = QVBoxLayout()
+        layout.setContentsMargins(4, 4, 4, 4)
+
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText('Search history')
+        self.search_input.setClearButtonEnabled(True)
+        self.search_input.textChanged.connect(self.searchTimer.start)
+        layout.addWidget(self.search_input)
+
+        self.result_list = QTableWidget(0, len(self.HEADER))
+        self.result_list.setHorizontalHeaderLabels(self.HEADER)
+        self.result_list.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.result_list.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.result_list.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.result_list.verticalHeader().hide()
+        self.result_list.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.result_list.verticalHeader().setDefaultSectionSize(18)
+        self.result_list.horizontalHeader().setStretchLastSection(True)
+        self.result_list.itemSelectionChanged.connect(self.showStats)
+        self.result_list.cellDoubleClicked.connect(self.useEntry)
+        layout.addWidget(self.result_list)
+
+        self.stats_label = QLabel()
+        self.stats_label.setWordWrap(True)
+        self.stats_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        stats_font = QFontDatabase.systemFont(QFontDatabase.FixedFont)
+        stats_font.setPointSize(8)
+        self.stats_label.setFont(stats_font)
+        layout.addWidget(self.stats_label)
+
+        frame.setLayout(layout)
+        self.setWidget(frame)
+
+    def search(self):
+        """
+        List entries matching search text
+        :return: None
+        """
+        try:
+            rows = self.history.search(self.search_input.text(), self.LIMIT)
+        except Exception as e:
+            self.log.error('History search failed, {}'.format(e))
+            rows = list()
+
+        self.result_list.setRowCount(len(rows))
+        self.statements = list()
+        for index, (entry_id, started, profile, status, seconds, row_count, xsql, statement) in enumerate(rows):
+            query = ' '.join(xsql.split())
+            values = [
+                datetime.fromtimestamp(started).strftime('%Y-%m-%d %H:%M:%S'), profile or '', status or '',
+                format_seconds(seconds), '{:,}'.format(row_count or 0), query[:200]
+            ]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if column == 0:
+                    item.setData(Qt.UserRole, entry_id)
+                if column == 5:
+                    item.setToolTip(xsql[:2000])
+                self.result_list.setItem(index, column, item)
+            self.statements.append(statement)
+        self.result_list.resizeColumnsToContents()
+        self.stats_label.setText('{} entries'.format(len(rows)) if len(rows) < self.LIMIT else
+                                 'Latest {} entries, refine search to see more'.format(self.LIMIT))
+
+    def showStats(self):
+        """
+        Latency percentiles of statement of selected entry
+        :return: None
+        """
+        row = self.result_list.currentRow()
+        if row < 0 or row >= len(self.statements) or self.statements[row] is None:
+            return
+        stats = self.history.stats(self.statements[row])
+        if stats is None:
+            self.stats_label.setText('No successful run of this statement')
+            return
+        trend = ''
+        if stats['runs'] > stats['recent'] and stats['p50']:
+            trend = ', last {} runs p50 {} ({:+.0%})'.format(
+                stats['recent'], format_seconds(stats['recentP50']), stats['recentP50'] / stats['p50'] - 1
+            )
+        self.stats_label.setText('{} runs: p50 {}s, p90 {}s, p99 {}s, max {}s{}'.format(
+            stats['runs'], format_seconds(stats['p50']), format_seconds(stats['p90']), format_seconds(stats['p99']),
+            format_seconds(stats['max']), trend
+        ))
+
+    def useEntry(self, row, column):
+        """
+        Put XSQL of entry at cursor of editor
+        :param row: row of double clicked cell
+        :param column: column of double clicked cell
+        :return: None
+        """
+        entry = self.history.entry(self.result_list.item(row, 0).data(Qt.UserRole))
+        if entry is None:
+            return
+        self.editor.textCursor().insertText(entry['xsql'])
+        self.editor.setFocus()
+
+    def onWritten(self, entry_id):
+        """
+        New query written into history, list is refreshed when panel is shown
+        :param entry_id: id of entry
+        :return: None
+        """
+        if self.isVisible() and not self.search_input.text():
+            self.searchTimer.start()
+
+    def onVisibilityChanged(self, visible):
+        """
+        :param visible: True when panel is shown
+        :return: None
+        """
+        if visible:
+            self.search()
+            self.search_input.setFocus()
@@ -0,0 +1,85 @@
+from PyQt5.QtGui import *
+from PyQt5.QtWidgets import *
+from PyQt5.QtCore import *
+
+# Custom Imports
+from logger import log
+from modules.Metrics import QueryTiming, format_bytes
+
+
+class LastRunDialog(QDialog):
+    def __init__(self, metrics):
+        """
+        Last Run Dialog, time taken by each phase of last query and statistics of all queries of session
+        :param metrics: object of MetricsRegistry class
+        """
+        super().__init__()
+        self.log = log.getLogger(self.__class__.__name__)
+
+        self.metrics = metrics
+
+        # noinspection PyTypeChecker
+        self.setWindowFlags(self.windowFlags() & ~ Qt.WindowContextHelpButtonHint)
+        self.setWindowTitle('Last Run')
+
+        self.ui()
+
+        self.exec()
+
+    def ui(self):
+        """
+        UI of Last Run Dialog
+        :return: None
+        """
+        frame = QVBoxLayout()
+        fixed_font = QFontDatabase.systemFont(QFontDatabase.FixedFont)
+
+        timing = self.metrics.last
+        if timing is None:
+            frame.addWidget(QLabel('No query executed yet'))
+        else:
+            # Query
+            query_label = QLabel('{} on {} ({}), {}'.format(
+                timing.status, timing.profile, timing.server,
+                QDateTime.fromSecsSinceEpoch(int(timing.timestamp)).toString(Qt.ISODate)
+            ))
+            query_label.setStyleSheet('font-weight:bold;')
+            frame.addWidget(query_label)
+            query_text = QLabel(timing.query if len(timing.query) <= 500 else timing.query[:500] + '...')
+            query_text.setFont(fixed_font)
+            query_text.setWordWrap(True)
+            query_text.setTextInteractionFlags(Qt.TextSelectableByMouse)
+            frame.addWidget(query_text)
+            if timing.error:
+                frame.addWidget(QLabel(timing.error))
+
+            # Phases
+            phase_layout = QFormLayout()
+            total = timing.total or 1
+            for phase in QueryTiming.PHASES:
+                seconds = timing.phases[phase]
+                bar = QProgressBar()
+                bar.setRange(0, 1000)
+                bar.setValue(int(seconds / total * 1000))
+                bar.setFormat('{:.3f}s'.format(seconds))
+                phase_layout.addRow(QLabel(phase.capitalize()), bar)
+            phase_layout.addRow(QLabel('Total'), QLabel('{:.3f}s'.format(timing.total)))
+            phase_layout.addRow(QLabel('Rows'), QLabel('{:,}'.format(timing.rows)))
+            phase_layout.addRow(QLabel('Size'), QLabel(format_bytes(timing.bytes)))
+            frame.addLayout(phase_layout)
+
+        # Session statistics
+        session_header = QLabel('Session')
+        session_header.setStyleSheet('font-weight:bold;')
+        frame.addWidget(session_header)
+        session_text = QPlainTextEdit(self.metrics.reportText())
+        session_text.setReadOnly(True)
+        session_text.setFont(fixed_font)
+        session_text.setLineWrapMode(QPlainTextEdit.NoWrap)
+        session_text.setMinimumWidth(640)
+        frame.addWidget(session_text)
+
+        if self.metrics.logPath:
+            frame.addWidget(QLabel('Logged to {}'.format(self.metrics.logPath)))
+
+        self.setLayout(frame)
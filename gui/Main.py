@@ -8,6 +8,8 @@ from functools import partial
 from logger import log
 
 from modules.trigger_func import *
+from modules.Tracer import StallWatchdog
+from gui.HistoryPanel import HistoryPanel
 
 
 class Main(QMainWindow):
@@ -34,7 +36,9 @@ class Main(QMainWindow):
         self.result_table = result_table
 
         # APP INIT
-        self.setWindowTitle('XPQE')
+        self.setWindowTitle(self.file_manager.title('XPQE'))
+        self.file_manager.modifiedChanged.connect(self.updateWindowTitle)
+        self.file_manager.locationChanged.connect(self.updateWindowTitle)
         self.setWindowIcon(QIcon('assets/logo.png'))
         self.move(self.context.window['position'][0], self.context.window['position'][1])
         self.resize(self.context.window['size'][0], self.context.window['size'][1])
@@ -43,9 +47,20 @@ class Main(QMainWindow):
         # CUSTOM SHORTCUT
         self.runXSQL_sc = QShortcut(QKeySequence('Ctrl+Return'), self)
         self.runXSQL_sc.activated.connect(partial(run_xsql, self.editor, self.engine_manager))
+        self.runAllXSQL_sc = QShortcut(QKeySequence('Ctrl+Shift+Return'), self)
+        self.runAllXSQL_sc.activated.connect(partial(run_all_xsql, self.editor, self.engine_manager))
+        self.cancelXSQL_sc = QShortcut(QKeySequence('Ctrl+.'), self)
+        self.cancelXSQL_sc.activated.connect(partial(cancel_xsql, self.engine_manager))
 
         # CUSTOM VARIABLES
         self.status_bar = None
+        self.lazyIcons = dict()     # menu -> [(menu item, icon path)] not loaded yet
+        self.stallWatchdog = StallWatchdog(self)
+        self.historyPanel = None
+        if self.engine_manager.history is not None:
+            self.historyPanel = HistoryPanel(self.engine_manager.history, self.editor, self)
+            self.addDockWidget(Qt.RightDockWidgetArea, self.historyPanel)
+            self.historyPanel.hide()
 
         # UI-Build Functions call
         self.ui_status_bar()
@@ -85,6 +100,15 @@ class Main(QMainWindow):
         self.result_table.resultCount.setFont(statusFont)
         statusBarLayout.addWidget(self.result_table.resultCount, alignment=Qt.AlignLeft)
         statusBarLayout.addStretch()
+        self.engine_manager.cacheStatus = QLabel()
+        self.engine_manager.cacheStatus.setFont(statusFont)
+        self.engine_manager.showCacheStatus()
+        statusBarLayout.addWidget(self.engine_manager.cacheStatus, alignment=Qt.AlignRight)
+        statusBarLayout.addSpacing(16)
+        self.engine_manager.metricsStatus = QLabel()
+        self.engine_manager.metricsStatus.setFont(statusFont)
+        statusBarLayout.addWidget(self.engine_manager.metricsStatus, alignment=Qt.AlignRight)
+        statusBarLayout.addSpacing(16)
         self.editor.cursorLocation = QLabel(text='Ln 0, Col 0')
         self.editor.cursorLocation.setFont(statusFont)
         statusBarLayout.addWidget(self.editor.cursorLocation, alignment=Qt.AlignRight)
@@ -104,13 +128,13 @@ class Main(QMainWindow):
         fileMenu = menuBar.addMenu('&File')
         # New Menu Item
         newFileAction = QAction('&New', self)
-        newFileAction.setIcon(QIcon('assets/icons/icon_new-file_100.png'))
+        self.setLazyIcon(fileMenu, newFileAction, 'assets/icons/icon_new-file_100.png')
         newFileAction.setShortcut('Ctrl+N')
         newFileAction.triggered.connect(partial(new_file, self.editor, self.file_manager))
         fileMenu.addAction(newFileAction)
         # Open Menu Item
         openFileAction = QAction('&Open', self)
-        openFileAction.setIcon(QIcon('assets/icons/icon_open-file_100.png'))
+        self.setLazyIcon(fileMenu, openFileAction, 'assets/icons/icon_open-file_100.png')
         openFileAction.setShortcut('Ctrl+O')
         openFileAction.triggered.connect(partial(open_file, self.editor, self.file_manager))
         fileMenu.addAction(openFileAction)
@@ -118,13 +142,13 @@ class Main(QMainWindow):
         fileMenu.addSeparator()
         # Save Menu Item
         saveFileAction = QAction('&Save', self)
-        saveFileAction.setIcon(QIcon('assets/icons/icon_save_100.png'))
+        self.setLazyIcon(fileMenu, saveFileAction, 'assets/icons/icon_save_100.png')
         saveFileAction.setShortcut('Ctrl+S')
         saveFileAction.triggered.connect(partial(save_file, self.editor, self.file_manager))
         fileMenu.addAction(saveFileAction)
         # Save As Menu Item
         saveAsFileAction = QAction('&Save As', self)
-        saveAsFileAction.setIcon(QIcon('assets/icons/icon_save-as_100.png'))
+        self.setLazyIcon(fileMenu, saveAsFileAction, 'assets/icons/icon_save-as_100.png')
         saveAsFileAction.setShortcut('Ctrl+Shift+S')
         saveAsFileAction.triggered.connect(partial(save_as_file, self.editor, self.file_manager))
         fileMenu.addAction(saveAsFileAction)
@@ -132,7 +156,7 @@ class Main(QMainWindow):
         fileMenu.addSeparator()
         # Settings Menu Item
         settingsFileAction = QAction('&Settings', self)
-        settingsFileAction.setIcon(QIcon('assets/icons/icon_settings_100.png'))
+        self.setLazyIcon(fileMenu, settingsFileAction, 'assets/icons/icon_settings_100.png')
         settingsFileAction.setShortcut('Ctrl+,')
         settingsFileAction.triggered.connect(partial(open_settings_dialog, self.context, self.editor))
         fileMenu.addAction(settingsFileAction)
@@ -140,46 +164,60 @@ class Main(QMainWindow):
         fileMenu.addSeparator()
         # Export Sub-Menu
         exportFileSubMenu = QMenu('&Export', self)
-        exportFileSubMenu.setIcon(QIcon('assets/icons/icon_export_100.png'))
+        self.setLazyIcon(fileMenu, exportFileSubMenu, 'assets/icons/icon_export_100.png')
         fileMenu.addMenu(exportFileSubMenu)
         # Export As CSV Action
         csvExportFileAction = QAction('&As CSV', self)
-        csvExportFileAction.setIcon(QIcon('assets/icons/icon_csv_100.png'))
-        csvExportFileAction.triggered.connect(partial(export_result, self.context, 'csv', header=True))
+        self.setLazyIcon(exportFileSubMenu, csvExportFileAction, 'assets/icons/icon_csv_100.png')
+        csvExportFileAction.triggered.connect(
+            partial(export_result, self.context, self.engine_manager, 'csv', header=True)
+        )
         exportFileSubMenu.addAction(csvExportFileAction)
         # Export As CSV without header Action
         csvWoHeaderExportFileAction = QAction('&As CSV w/o Header', self)
-        csvWoHeaderExportFileAction.setIcon(QIcon('assets/icons/icon_csv_100.png'))
-        csvWoHeaderExportFileAction.triggered.connect(partial(export_result, self.context, 'csv', header=False))
+        self.setLazyIcon(exportFileSubMenu, csvWoHeaderExportFileAction, 'assets/icons/icon_csv_100.png')
+        csvWoHeaderExportFileAction.triggered.connect(
+            partial(export_result, self.context, self.engine_manager, 'csv', header=False)
+        )
         exportFileSubMenu.addAction(csvWoHeaderExportFileAction)
         # Export As HTML
         htmlExportFileAction = QAction('&As HTML', self)
-        htmlExportFileAction.setIcon(QIcon('assets/icons/icon_html_100.png'))
-        htmlExportFileAction.triggered.connect(partial(export_result, self.context, 'html'))
+        self.setLazyIcon(exportFileSubMenu, htmlExportFileAction, 'assets/icons/icon_html_100.png')
+        htmlExportFileAction.triggered.connect(partial(export_result, self.context, self.engine_manager, 'html'))
         exportFileSubMenu.addAction(htmlExportFileAction)
         # Export As PDF
         pdfExportFileAction = QAction('&As PDF', self)
-        pdfExportFileAction.setIcon(QIcon('assets/icons/icon_pdf_100.png'))
-        pdfExportFileAction.triggered.connect(partial(export_result, self.context, 'pdf'))
+        self.setLazyIcon(exportFileSubMenu, pdfExportFileAction, 'assets/icons/icon_pdf_100.png')
+        pdfExportFileAction.triggered.connect(partial(export_result, self.context, self.engine_manager, 'pdf'))
         exportFileSubMenu.addAction(pdfExportFileAction)
+        # Export As Parquet
+        parquetExportFileAction = QAction('As &Parquet', self)
+        self.setLazyIcon(exportFileSubMenu, parquetExportFileAction, 'assets/icons/icon_export_100.png')
+        parquetExportFileAction.triggered.connect(partial(export_result, self.context, self.engine_manager, 'parquet'))
+        exportFileSubMenu.addAction(parquetExportFileAction)
+        # Export As Arrow IPC / Feather
+        featherExportFileAction = QAction('As Arrow / &Feather', self)
+        self.setLazyIcon(exportFileSubMenu, featherExportFileAction, 'assets/icons/icon_export_100.png')
+        featherExportFileAction.triggered.connect(partial(export_result, self.context, self.engine_manager, 'feather'))
+        exportFileSubMenu.addAction(featherExportFileAction)
         # Separator
         fileMenu.addSeparator()
         # Exit Menu Item
         exitFileAction = QAction('&Exit', self)
-        exitFileAction.setIcon(QIcon('assets/icons/icon_exit_100.png'))
+        self.setLazyIcon(fileMenu, exitFileAction, 'assets/icons/icon_exit_100.png')
         exitFileAction.triggered.connect(self.app.quit)
         fileMenu.addAction(exitFileAction)
 
         editMenu = menuBar.addMenu('&Edit')
         # Undo Menu Item
         undoEditAction = QAction('&Undo', self)
-        undoEditAction.setIcon(QIcon('assets/icons/icon_undo_100.png'))
+        self.setLazyIcon(editMenu, undoEditAction, 'assets/icons/icon_undo_100.png')
         undoEditAction.setShortcut('Ctrl+Z')
         undoEditAction.triggered.connect(partial(undo_text, self.editor))
         editMenu.addAction(undoEditAction)
         # Redo Menu Item
         redoEditAction = QAction('&Redo', self)
-        redoEditAction.setIcon(QIcon('assets/icons/icon_redo_100.png'))
+        self.setLazyIcon(editMenu, redoEditAction, 'assets/icons/icon_redo_100.png')
         redoEditAction.setShortcut('Ctrl+Y')
         redoEditAction.triggered.connect(partial(redo_text, self.editor))
         editMenu.addAction(redoEditAction)
@@ -187,25 +225,25 @@ class Main(QMainWindow):
         editMenu.addSeparator()
         # Cut Menu Item
         cutEditAction = QAction('&Cut', self)
-        cutEditAction.setIcon(QIcon('assets/icons/icon_cut_100.png'))
+        self.setLazyIcon(editMenu, cutEditAction, 'assets/icons/icon_cut_100.png')
         cutEditAction.setShortcut('Ctrl+X')
         cutEditAction.triggered.connect(partial(cut_text, self.editor))
         editMenu.addAction(cutEditAction)
         # Copy Menu Item
         copyEditAction = QAction('&Copy', self)
-        copyEditAction.setIcon(QIcon('assets/icons/icon_copy_100.png'))
+        self.setLazyIcon(editMenu, copyEditAction, 'assets/icons/icon_copy_100.png')
         copyEditAction.setShortcut('Ctrl+C')
         copyEditAction.triggered.connect(partial(copy_text, self.editor))
         editMenu.addAction(copyEditAction)
         # Paste Menu Item
         pasteEditAction = QAction('&Paste', self)
-        pasteEditAction.setIcon(QIcon('assets/icons/icon_paste_100.png'))
+        self.setLazyIcon(editMenu, pasteEditAction, 'assets/icons/icon_paste_100.png')
         pasteEditAction.setShortcut('Ctrl+V')
         pasteEditAction.triggered.connect(partial(paste_text, self.editor))
         editMenu.addAction(pasteEditAction)
         # Delete Menu Item
         deleteEditAction = QAction('&Delete', self)
-        deleteEditAction.setIcon(QIcon('assets/icons/icon_delete_100.png'))
+        self.setLazyIcon(editMenu, deleteEditAction, 'assets/icons/icon_delete_100.png')
         deleteEditAction.setShortcut('Delete')
         deleteEditAction.triggered.connect(partial(delete_text, self.editor))
         editMenu.addAction(deleteEditAction)
@@ -213,7 +251,7 @@ class Main(QMainWindow):
         editMenu.addSeparator()
         # Toggle Line-Comment Menu Item
         toggleCommentEditAction = QAction('&Toggle Line Comment', self)
-        toggleCommentEditAction.setIcon(QIcon('assets/icons/icon_comment_100.png'))
+        self.setLazyIcon(editMenu, toggleCommentEditAction, 'assets/icons/icon_comment_100.png')
         toggleCommentEditAction.setShortcut('Ctrl+/')
         toggleCommentEditAction.triggered.connect(partial(toggle_line_comment, self.editor))
         editMenu.addAction(toggleCommentEditAction)
@@ -221,9 +259,18 @@ class Main(QMainWindow):
         queryMenu = menuBar.addMenu('&Query')
         # Execute Menu Item
         executeQueryAction = QAction('&Execute', self)
-        executeQueryAction.setIcon(QIcon('assets/icons/icon_play_100.png'))
+        self.setLazyIcon(queryMenu, executeQueryAction, 'assets/icons/icon_play_100.png')
         executeQueryAction.triggered.connect(partial(run_xsql, self.editor, self.engine_manager))
         queryMenu.addAction(executeQueryAction)
+        # Run All Menu Item
+        runAllQueryAction = QAction('Run A&ll', self)
+        runAllQueryAction.triggered.connect(partial(run_all_xsql, self.editor, self.engine_manager))
+        queryMenu.addAction(runAllQueryAction)
+        # Cancel Menu Item
+        cancelQueryAction = QAction('&Cancel', self)
+        self.setLazyIcon(queryMenu, cancelQueryAction, 'assets/icons/icon_stop_100.png')
+        cancelQueryAction.triggered.connect(partial(cancel_xsql, self.engine_manager))
+        queryMenu.addAction(cancelQueryAction)
         # Separator
         queryMenu.addSeparator()
         # Toggle Auto-Commit Menu Item
@@ -232,11 +279,40 @@ class Main(QMainWindow):
         toggleAutoCommitQueryAction.setChecked(self.context.server['autoCommit'])
         toggleAutoCommitQueryAction.triggered.connect(partial(toggle_auto_commit, self.context))
         queryMenu.addAction(toggleAutoCommitQueryAction)
+        # Toggle Streaming Fetch Menu Item
+        # noinspection PyArgumentList
+        toggleStreamingQueryAction = QAction('&Streaming Fetch', self, checkable=True)
+        toggleStreamingQueryAction.setChecked(self.context.server['streaming'])
+        toggleStreamingQueryAction.triggered.connect(partial(toggle_streaming, self.context))
+        queryMenu.addAction(toggleStreamingQueryAction)
+        # Toggle Batch Transaction Menu Item
+        # noinspection PyArgumentList
+        toggleBatchTransactionQueryAction = QAction('Run All in Tra&nsaction', self, checkable=True)
+        toggleBatchTransactionQueryAction.setChecked(self.context.server['batch.transaction'])
+        toggleBatchTransactionQueryAction.triggered.connect(partial(toggle_batch_transaction, self.context))
+        queryMenu.addAction(toggleBatchTransactionQueryAction)
+        # Toggle Batch Stop on Error Menu Item
+        # noinspection PyArgumentList
+        toggleBatchStopQueryAction = QAction('Run All Sto&p on Error', self, checkable=True)
+        toggleBatchStopQueryAction.setChecked(self.context.server['batch.stopOnError'])
+        toggleBatchStopQueryAction.triggered.connect(partial(toggle_batch_stop_on_error, self.context))
+        queryMenu.addAction(toggleBatchStopQueryAction)
+        # Toggle Result Cache Menu Item
+        # noinspection PyArgumentList
+        toggleCacheQueryAction = QAction('&Result Cache', self, checkable=True)
+        toggleCacheQueryAction.setChecked(self.context.server['cache.enabled'])
+        toggleCacheQueryAction.triggered.connect(partial(toggle_result_cache, self.context, self.engine_manager))
+        queryMenu.addAction(toggleCacheQueryAction)
+        # Toggle Trace Recording Menu Item
+        # noinspection PyArgumentList
+        toggleTraceQueryAction = QAction('Record &Trace', self, checkable=True)
+        toggleTraceQueryAction.triggered.connect(partial(toggle_trace_recording, self.context, toggleTraceQueryAction))
+        queryMenu.addAction(toggleTraceQueryAction)
 
         profileMenu = menuBar.addMenu('&Profile')
         # Manage Menu Item
         manageProfileAction = QAction('&Manage', self)
-        manageProfileAction.setIcon(QIcon('assets/icons/icon_manage_100.png'))
+        self.setLazyIcon(profileMenu, manageProfileAction, 'assets/icons/icon_manage_100.png')
         manageProfileAction.triggered.connect(partial(open_profile_manager, self.context, self.profiler))
         profileMenu.addAction(manageProfileAction)
 
@@ -247,14 +323,57 @@ class Main(QMainWindow):
         statusBarViewAction.setChecked(True)
         statusBarViewAction.triggered.connect(partial(toggle_check, self.status_bar))
         viewMenu.addAction(statusBarViewAction)
+        # Last Run Menu Item
+        lastRunViewAction = QAction('&Last Run', self)
+        lastRunViewAction.triggered.connect(partial(open_last_run_dialog, self.engine_manager))
+        viewMenu.addAction(lastRunViewAction)
+        # History Panel Menu Item
+        if self.historyPanel is not None:
+            historyViewAction = self.historyPanel.toggleViewAction()
+            historyViewAction.setText('&History')
+            historyViewAction.setShortcut('Ctrl+H')
+            viewMenu.addAction(historyViewAction)
+        # Separator
+        viewMenu.addSeparator()
+        # Toggle Tracing Menu Item
+        # noinspection PyArgumentList
+        toggleTracingViewAction = QAction('&Tracing', self, checkable=True)
+        toggleTracingViewAction.triggered.connect(partial(toggle_tracing, self.stallWatchdog))
+        viewMenu.addAction(toggleTracingViewAction)
+        # Export Trace Menu Item
+        exportTraceViewAction = QAction('&Export Trace...', self)
+        exportTraceViewAction.triggered.connect(export_trace)
+        viewMenu.addAction(exportTraceViewAction)
 
         helpMenu = menuBar.addMenu('&Help')
         # About Menu Item
         aboutHelpAction = QAction('&About', self)
-        aboutHelpAction.setIcon(QIcon('assets/icons/icon_about_100.png'))
+        self.setLazyIcon(helpMenu, aboutHelpAction, 'assets/icons/icon_about_100.png')
         aboutHelpAction.triggered.connect(open_about_dialog)
         helpMenu.addAction(aboutHelpAction)
 
+    def setLazyIcon(self, menu, item, location):
+        """
+        Icon of menu item is read from disk first time menu is shown, so window appear without loading all icons
+        :param menu: object of QMenu class showing item
+        :param item: object of QAction/QMenu class
+        :param location: path of icon
+        :return: None
+        """
+        if menu not in self.lazyIcons:
+            self.lazyIcons[menu] = list()
+            menu.aboutToShow.connect(partial(self.loadIcons, menu))
+        self.lazyIcons[menu].append((item, location))
+
+    def loadIcons(self, menu):
+        """
+        Load pending icons of menu items
+        :param menu: object of QMenu class
+        :return: None
+        """
+        for item, location in self.lazyIcons.pop(menu, []):
+            item.setIcon(QIcon(location))
+
     def resizeEvent(self, event):
         """
         Event function called when window is resized
@@ -264,6 +383,14 @@ class Main(QMainWindow):
         size = self.size()
         self.context.window['size'] = [size.width(), size.height()]
 
+    def updateWindowTitle(self, *_):
+        """
+        Show file name and modified marker of current file in window title
+        :param _: value of signal, not used
+        :return: None
+        """
+        self.setWindowTitle(self.file_manager.title('XPQE'))
+
     def moveEvent(self, event):
         """
         Event function called when window position is changed
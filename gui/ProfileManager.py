@@ -3,8 +3,7 @@ from PyQt5.QtWidgets import *
 from PyQt5.QtCore import *
 
 # Custom Imports
-from Engines.MySQLEngine import MySQLEngine
-from Engines.PostgreSQLEngine import PostgreSQLEngine
+from Engines import get_engine_class
 from logger import log
 from modules.Profiler import Profile
 
@@ -204,13 +203,14 @@ class AddEditProfile(QDialog):
         self.profile = profile
 
         self.profile_name_input = None
-        self.server_type_items = ['MySQL', 'PostgreSQL']
+        self.server_type_items = ['MySQL', 'PostgreSQL', 'SQLite', 'DuckDB', 'Replay']
         self.server_type_combobox = None
         self.host_input = None
         self.port_input = None
         self.database_input = None
         self.username_input = None
         self.password_input = None
+        self.timeout_input = None
 
         # noinspection PyTypeChecker
         self.setWindowFlags(self.windowFlags() & ~ Qt.WindowContextHelpButtonHint)
@@ -253,6 +253,11 @@ class AddEditProfile(QDialog):
         self.password_input = QLineEdit()
         self.password_input.setEchoMode(QLineEdit.Password)
         container_layout.addRow(password_label, self.password_input)
+        timeout_label = QLabel('Timeout (s)')
+        self.timeout_input = QLineEdit()
+        self.timeout_input.setValidator(QIntValidator(0, 86400))
+        self.timeout_input.setPlaceholderText('Default ({}s)'.format(self.context.server['statementTimeout']))
+        container_layout.addRow(timeout_label, self.timeout_input)
 
         if self.mode == 'edit':
             try:
@@ -264,6 +269,8 @@ class AddEditProfile(QDialog):
                 self.database_input.setText(self.profile.database if self.profile.database else '')
                 self.username_input.setText(self.profile.username)
                 self.password_input.setText(self.profile.password)
+                timeout = self.context.server['statementTimeout.profiles'].get(self.profile.profile)
+                self.timeout_input.setText('' if timeout is None else str(timeout))
             except Exception as e:
                 print(e)
 
@@ -301,34 +308,27 @@ class AddEditProfile(QDialog):
             password=self.password_input.text()
         )
 
+        try:
+            engine_class = get_engine_class(server_type)
+        except ImportError as e:
+            self.log.error(e)
+            QMessageBox.critical(self, 'Error', 'Driver of {} is not installed\n{}'.format(server_type, e))
+            return
+
         dialog = QMessageBox()
-        if server_type == 'mysql':
-            engine = MySQLEngine(self.context, profile)
-            test_info = engine.test_connection()
-            if test_info['status']:
-                dialog.setIcon(QMessageBox.Information)
-                dialog.setWindowTitle('Success')
-                dialog.setText('Connection successful')
-                dialog.setInformativeText("MySQL " + test_info['version'])
-            else:
-                dialog.setIcon(QMessageBox.Critical)
-                dialog.setWindowTitle('Error')
-                dialog.setText('Unable to connect')
-                dialog.setInformativeText("Please check you detail, it seems something is wrong.")
-        elif server_type == 'postgresql':
-            dialog = QMessageBox()
-            engine = PostgreSQLEngine(self.context, profile)
-            test_info = engine.test_connection()
-            if test_info['status']:
-                dialog.setIcon(QMessageBox.Information)
-                dialog.setWindowTitle('Success')
-                dialog.setText('Connection successful')
-                dialog.setInformativeText("PostgreSQL " + str(test_info['version']))
-            else:
-                dialog.setIcon(QMessageBox.Critical)
-                dialog.setWindowTitle('Error')
-                dialog.setText('Unable to connect')
-                dialog.setInformativeText("Please check you detail, it seems something is wrong.")
+        engine = engine_class(self.context, profile)
+        test_info = engine.test_connection()
+        engine.close()
+        if test_info['status']:
+            dialog.setIcon(QMessageBox.Information)
+            dialog.setWindowTitle('Success')
+            dialog.setText('Connection successful')
+            dialog.setInformativeText('{} {}'.format(self.server_type_combobox.currentText(), test_info['version']))
+        else:
+            dialog.setIcon(QMessageBox.Critical)
+            dialog.setWindowTitle('Error')
+            dialog.setText('Unable to connect')
+            dialog.setInformativeText("Please check you detail, it seems something is wrong.")
         dialog.exec_()
 
     def __save_profile(self):
@@ -346,9 +346,19 @@ class AddEditProfile(QDialog):
             password=self.password_input.text()
         )
         if self.mode == 'add':
-            self.profiler.addProfile(profile)
-        elif self.mode == 'edit':
-            self.profiler.editProfile(self.profile.profile, profile)
+            saved = self.profiler.addProfile(profile)
+        else:
+            saved = self.profiler.editProfile(self.profile.profile, profile)
+        if not saved:
+            QMessageBox.critical(self, 'Error', 'Profile {} already exists, choose other name'.format(profile.profile))
+            return
+
+        # Per profile statement timeout is kept with other server settings
+        timeouts = self.context.server['statementTimeout.profiles']
+        if self.mode == 'edit':
+            timeouts.pop(self.profile.profile, None)
+        if self.timeout_input.text():
+            timeouts[profile.profile] = int(self.timeout_input.text())
         self.close()
 
     def __server_type_change(self, index):
@@ -365,3 +375,15 @@ class AddEditProfile(QDialog):
             self.database_input.setText(
                 'postgres' if self.database_input.text() == '' else self.database_input.text()
             )
+        elif server_type == 'replay':
+            # Database is path of trace file recorded by Query > Record Trace
+            self.port_input.setText('')
+            self.database_input.setText(
+                '' if self.database_input.text() in ('postgres', ':memory:') else self.database_input.text()
+            )
+        elif server_type in ('sqlite', 'duckdb'):
+            # Embedded database, Database is path of database file or :memory:
+            self.port_input.setText('')
+            self.database_input.setText(
+                ':memory:' if self.database_input.text() in ('', 'postgres') else self.database_input.text()
+            )
@@ -1,12 +1,129 @@
 from functools import partial
 
 from logger import log
+from modules.ResultSet import ResultSet
 
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QVariant
 from PyQt5.QtGui import QFontDatabase, QCursor
-from PyQt5.QtWidgets import QTableWidget, QMenu, QAction, QApplication
+from PyQt5.QtWidgets import QTableView, QMenu, QAction, QApplication, QHeaderView
 
 
-class ResultTable(QTableWidget):
+class ResultModel(QAbstractTableModel):
+    def __init__(self, parent=None):
+        """
+        Model of result table, cells are read lazily from result buffer when view ask for them
+        :param parent: parent QObject
+        """
+        super().__init__(parent)
+        self.header = list()
+        self.rows = ResultSet([])
+        self.order = None       # row index permutation when table is sorted
+        self.renderCount = 0
+
+    def setResult(self, header, rows, render_count):
+        """
+        Point model to new result buffer, no cell is copied
+        :param header: list of column names
+        :param rows: object of ResultSet class
+        :param render_count: maximum rows shown in table
+        :return: None
+        """
+        self.beginResetModel()
+        self.header = list(header)
+        self.rows = rows
+        self.order = None
+        self.renderCount = render_count
+        self.endResetModel()
+
+    def appendRows(self, rows, batch):
+        """
+        Append rows into result buffer, view is notified of rows which fall into rendered range
+        :param rows: object of ResultSet class
+        :param batch: list of row tuples
+        :return: None
+        """
+        if rows is not self.rows:
+            rows.append(batch)
+            return
+        first = self.rowCount()
+        last = min(self.renderCount, len(self.rows) + len(batch)) - 1
+        if last < first:
+            self.rows.append(batch)
+            return
+        self.beginInsertRows(QModelIndex(), first, last)
+        self.rows.append(batch)
+        if self.order is not None:
+            # Sorted table show new rows after sorted ones
+            self.order.extend(range(first, last + 1))
+        self.endInsertRows()
+
+    def cell(self, row, column):
+        """
+        Raw value of cell in result buffer
+        :param row: row number in view
+        :param column: column number
+        :return: cell value
+        """
+        if self.order is not None:
+            row = self.order[row]
+        return self.rows.value(row, column)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return min(self.renderCount, len(self.rows))
+
+    def columnCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.header)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return QVariant()
+        if role == Qt.DisplayRole:
+            value = self.cell(index.row(), index.column())
+            return '' if value is None else str(value)
+        if role == Qt.ToolTipRole:
+            value = self.cell(index.row(), index.column())
+            return 'NULL' if value is None else str(value)
+        return QVariant()
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal and role in (Qt.DisplayRole, Qt.ToolTipRole):
+            return self.header[section]
+        if orientation == Qt.Vertical and role == Qt.DisplayRole:
+            return section + 1
+        return QVariant()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """
+        Sort rendered rows by column, only row index permutation is sorted
+        :param column: column number
+        :param order: Qt.SortOrder
+        :return: None
+        """
+        if column < 0 or column >= len(self.header):
+            return
+        self.layoutAboutToBeChanged.emit()
+        count = self.rowCount()
+        rows = self.rows
+
+        def key(row):
+            value = rows.value(row, column)
+            return (value is None, value)
+
+        try:
+            self.order = sorted(range(count), key=key, reverse=order == Qt.DescendingOrder)
+        except TypeError:
+            # Mixed types in column, fallback to string comparison
+            self.order = sorted(range(count), key=lambda row: (rows.value(row, column) is None,
+                                                               str(rows.value(row, column))),
+                                reverse=order == Qt.DescendingOrder)
+        self.layoutChanged.emit()
+
+
+class ResultTable(QTableView):
     def __init__(self, context):
         """
         Table used to display result of executed query
@@ -19,42 +136,73 @@ class ResultTable(QTableWidget):
         self.maxRenderRecords = self.context.editor['result.renderCount']
         self.resultCount = None
 
+        self.resultModel = ResultModel(self)
+        self.setModel(self.resultModel)
+
         # Set Font Style and Size
         table_font = QFontDatabase.systemFont(QFontDatabase.FixedFont)
         table_font.setPointSize(8)
         self.setFont(table_font)
 
+        # Fixed row height let view compute geometry without asking each row
+        self.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.verticalHeader().setDefaultSectionSize(18)
+        self.setSortingEnabled(True)
+        self.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+
         self.setStyleSheet('''
 QHeaderView::section {
     background-color: #EEEEEE;
     border: 1px solid #DDDDDD;
 }''')
 
+    def setResult(self, header, rows):
+        """
+        Show result of executed query
+        :param header: list of column names
+        :param rows: object of ResultSet class
+        :return: None
+        """
+        self.maxRenderRecords = self.context.editor['result.renderCount']
+        self.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.resultModel.setResult(header, rows, self.maxRenderRecords)
+
+    def appendRows(self, rows, batch):
+        """
+        Rows fetched after result is shown, e.g. remaining rows pulled by export
+        :param rows: object of ResultSet class
+        :param batch: list of row tuples
+        :return: None
+        """
+        self.resultModel.appendRows(rows, batch)
+
+    def clear(self):
+        """
+        Remove result from table
+        :return: None
+        """
+        self.resultModel.setResult([], ResultSet([]), 0)
+
     def __copy_select_cells(self, cells):
         """
         Copy data of selected cells into clipboard in CSV format
         :param cells: List of all selected cells of result table
         :return: self
         """
-        selected_text = ''
-        track = {
-            'row': -1,
-            'col': -1
-        }
-        for cell in cells:
-            if track['row'] == -1 or track['col'] == -1:
-                track['row'] = cell.row()
-                track['col'] = cell.column()
-                selected_text += cell.text()
-            else:
-                if track['row'] == cell.row():
-                    track['col'] = cell.column()
-                    selected_text += ',' + cell.text()
-                else:
-                    track['row'] = cell.row()
-                    track['col'] = cell.column()
-                    selected_text += '\n' + cell.text()
-        QApplication.clipboard().setText(selected_text)
+        lines = list()
+        line = list()
+        current_row = -1
+        for cell in sorted(cells, key=lambda index: (index.row(), index.column())):
+            if cell.row() != current_row and current_row != -1:
+                lines.append(','.join(line))
+                line = list()
+            current_row = cell.row()
+            # Read value straight from ResultSet behind the model
+            value = self.resultModel.cell(cell.row(), cell.column())
+            line.append('' if value is None else str(value))
+        if line:
+            lines.append(','.join(line))
+        QApplication.clipboard().setText('\n'.join(lines))
         return self
 
     def contextMenuEvent(self, event):
@@ -63,7 +211,7 @@ QHeaderView::section {
         :param event: object of QEvent class
         :return: None
         """
-        cells = self.selectedItems()
+        cells = self.selectedIndexes()
 
         popMenu = QMenu()
         copyPopAction = QAction('&Copy')
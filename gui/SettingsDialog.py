@@ -50,7 +50,12 @@ class SettingsDialog(QDialog):
         self.auto_close_quotes_types = [
             'Always', 'Never'
         ]
+        self.large_file_threshold_input = None
         self.result_render_count_input = None
+        self.result_fetch_size_input = None
+        self.statement_timeout_input = None
+        self.cache_ttl_input = None
+        self.cache_size_input = None
 
         # noinspection PyTypeChecker
         self.setWindowFlags(self.windowFlags() & ~ Qt.WindowContextHelpButtonHint)
@@ -122,15 +127,51 @@ class SettingsDialog(QDialog):
         auto_close_layout.addRow(auto_close_quotes_label, self.auto_close_quotes_input)
         auto_close_group.setLayout(auto_close_layout)
         editor_layout.addWidget(auto_close_group)
+        # Large File Group
+        large_file_group = QGroupBox('Large File')
+        large_file_layout = QFormLayout()
+        large_file_threshold_label = QLabel('Large file mode above (MB)')
+        self.large_file_threshold_input = QSpinBox()
+        self.large_file_threshold_input.setMinimum(1)
+        self.large_file_threshold_input.setMaximum(65536)
+        self.large_file_threshold_input.setValue(self.context.editor['largeFile.threshold'])
+        large_file_layout.addRow(large_file_threshold_label, self.large_file_threshold_input)
+        large_file_group.setLayout(large_file_layout)
+        editor_layout.addWidget(large_file_group)
         # Result Group
         result_group = QGroupBox('Result')
         result_layout = QFormLayout()
         result_render_count_label = QLabel('Max records render')
         self.result_render_count_input = QSpinBox()
         self.result_render_count_input.setMinimum(10)
-        self.result_render_count_input.setMaximum(100000)
+        self.result_render_count_input.setMaximum(10000000)
         self.result_render_count_input.setValue(self.context.editor['result.renderCount'])
         result_layout.addRow(result_render_count_label, self.result_render_count_input)
+        result_fetch_size_label = QLabel('Fetch batch size')
+        self.result_fetch_size_input = QSpinBox()
+        self.result_fetch_size_input.setMinimum(10)
+        self.result_fetch_size_input.setMaximum(100000)
+        self.result_fetch_size_input.setValue(self.context.server['fetchSize'])
+        result_layout.addRow(result_fetch_size_label, self.result_fetch_size_input)
+        statement_timeout_label = QLabel('Statement timeout (s)')
+        self.statement_timeout_input = QSpinBox()
+        self.statement_timeout_input.setMinimum(0)
+        self.statement_timeout_input.setMaximum(86400)
+        self.statement_timeout_input.setSpecialValueText('None')
+        self.statement_timeout_input.setValue(self.context.server['statementTimeout'])
+        result_layout.addRow(statement_timeout_label, self.statement_timeout_input)
+        cache_ttl_label = QLabel('Result cache TTL (s)')
+        self.cache_ttl_input = QSpinBox()
+        self.cache_ttl_input.setMinimum(1)
+        self.cache_ttl_input.setMaximum(86400)
+        self.cache_ttl_input.setValue(self.context.server['cache.ttl'])
+        result_layout.addRow(cache_ttl_label, self.cache_ttl_input)
+        cache_size_label = QLabel('Result cache size (MB)')
+        self.cache_size_input = QSpinBox()
+        self.cache_size_input.setMinimum(1)
+        self.cache_size_input.setMaximum(16384)
+        self.cache_size_input.setValue(self.context.server['cache.maxSize'])
+        result_layout.addRow(cache_size_label, self.cache_size_input)
         result_group.setLayout(result_layout)
         editor_layout.addWidget(result_group)
         editor_layout.addStretch()
@@ -174,7 +215,12 @@ class SettingsDialog(QDialog):
             self.context.editor['font.family'] = self.font_family_temp_select
             self.context.editor['font.weight'] = self.font_weight_types[self.font_weight_input.currentIndex()]
             self.context.editor['font.stretch'] = self.font_stretch_types[self.font_stretch_input.currentIndex()]
+            self.context.editor['largeFile.threshold'] = self.large_file_threshold_input.value()
             self.context.editor['result.renderCount'] = self.result_render_count_input.value()
+            self.context.server['fetchSize'] = self.result_fetch_size_input.value()
+            self.context.server['statementTimeout'] = self.statement_timeout_input.value()
+            self.context.server['cache.ttl'] = self.cache_ttl_input.value()
+            self.context.server['cache.maxSize'] = self.cache_size_input.value()
             self.__save_settings(terminate=False)
         elif current_tab.lower() == 'export':
             print('Exp')
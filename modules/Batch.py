@@ -0,0 +1,150 @@
+import threading
+import time
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+from logger import log
+from modules.Tracer import Tracer
+
+
+class BatchStatement:
+    __slots__ = ('index', 'profile', 'sql', 'xsql', 'status', 'seconds', 'rows', 'error', 'batch', 'timing')
+
+    def __init__(self, index, profile_name, sql, xsql):
+        """
+        Statement of `Run All`, status and timing are filled by engine which run it
+        :param index: position of statement in script, starting from 1
+        :param profile_name: name of profile
+        :param sql: SQL sent to server
+        :param xsql: XSQL of statement as written in editor
+        """
+        self.index = index
+        self.profile = profile_name
+        self.sql = sql
+        self.xsql = xsql
+        self.status = None      # OK / ERROR / TIMEOUT / CANCELLED / SKIPPED / ROLLED BACK, None while pending
+        self.seconds = None
+        self.rows = None
+        self.error = None
+        self.batch = None       # number of statements sent in same round trip
+        self.timing = None      # QueryTiming, None if statement was not sent
+
+
+class BatchError(Exception):
+    def __init__(self, error, results):
+        """
+        Statement of batch failed, statements before it are executed
+        :param error: Exception raised by failed statement
+        :param results: [(seconds, rows)] of executed statements, failed statement is at len(results)
+        """
+        super().__init__(str(error))
+        self.error = error
+        self.results = results
+
+
+class BatchWorkerSignals(QObject):
+    """
+    Signals emitted by BatchWorker, delivered on GUI thread through queued connections
+    """
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(object, float)
+
+
+class BatchWorker(QRunnable):
+    def __init__(self, engine_manager, groups, transaction=False, stop_on_error=True):
+        """
+        Run statements of `Run All` in order away from GUI thread, consecutive statements of same profile are run by
+        one engine in round trips of server.batch.size statements
+        :param engine_manager: object of EngineManager class, provide engines for profile
+        :param groups: list of (profile name, [BatchStatement])
+        :param transaction: run statements of each group in single transaction, rolled back when any of them fail
+        :param stop_on_error: skip statements after failed statement
+        """
+        super().__init__()
+        self.log = log.getLogger(self.__class__.__name__)
+
+        self.engineManager = engine_manager
+        self.groups = groups
+        self.transaction = transaction
+        self.stopOnError = stop_on_error
+        self.statements = [statement for _, statements in groups for statement in statements]
+        self.engine = None
+        self.cancelRequested = False
+        self.queuedAt = time.perf_counter()
+
+        self.signals = BatchWorkerSignals()
+
+    def run(self):
+        """
+        Executed by QThreadPool on worker thread
+        :return: None
+        """
+        Tracer.complete('queued', self.queuedAt, time.perf_counter())
+        with Tracer.span('run all', statements=len(self.statements)):
+            self.__run()
+
+    def __run(self):
+        """
+        :return: None
+        """
+        start = time.monotonic()
+        done = 0
+        stopped = False
+        for profile_name, statements in self.groups:
+            if stopped or self.cancelRequested:
+                break
+            engine = None
+            try:
+                with Tracer.span('connect', profile=profile_name):
+                    engine = self.engineManager.acquireEngine(profile_name)
+                if engine is None:
+                    raise RuntimeError('Unable to create engine for profile: {}'.format(profile_name))
+                self.engine = engine
+                if self.cancelRequested:
+                    break
+                success = engine.batch(statements, self.transaction, self.stopOnError, self.__progress(done))
+                stopped = engine.cancelled or (not success and self.stopOnError)
+            except Exception as e:
+                self.log.error(e)
+                pending = [statement for statement in statements if statement.status is None]
+                if pending:
+                    pending[0].status = 'ERROR'
+                    pending[0].error = str(e)
+                stopped = self.stopOnError
+            finally:
+                self.engine = None
+                self.engineManager.releaseEngine(engine)
+            done += len(statements)
+            self.signals.progress.emit(done, len(self.statements))
+
+        for statement in self.statements:
+            if statement.status is None:
+                statement.status = 'SKIPPED'
+        self.signals.finished.emit(self.statements, time.monotonic() - start)
+
+    def __progress(self, done):
+        """
+        :param done: statements of groups before running group
+        :return: callback receiving number of finished statements of running group
+        """
+        return lambda count: self.signals.progress.emit(done + count, len(self.statements))
+
+    def cancel(self):
+        """
+        Cancel running statement and skip remaining ones, called from GUI thread
+        :return: None
+        """
+        self.cancelRequested = True
+        engine = self.engine
+        if engine is not None:
+            threading.Thread(target=self.__cancelEngine, args=(engine,), daemon=True).start()
+
+    def __cancelEngine(self, engine):
+        """
+        :param engine: engine running batch
+        :return: None
+        """
+        try:
+            engine.cancel()
+        except Exception as e:
+            self.log.error('Unable to cancel batch, {}'.format(e))
@@ -1,5 +1,18 @@
-from PyQt5.QtCore import QRegExp, Qt
-from PyQt5.QtGui import QSyntaxHighlighter
+import re
+
+from PyQt5.QtGui import QSyntaxHighlighter, QTextBlockUserData, QTextLayout
+
+
+class PaintedBlock(QTextBlockUserData):
+    def __init__(self, revision, state):
+        """
+        Remember what viewport painting already did for a block
+        :param revision: revision of block when it was painted
+        :param state: block state at end of previous line used to paint it
+        """
+        super().__init__()
+        self.revision = revision
+        self.state = state
 
 
 class CodePainter(QSyntaxHighlighter):
@@ -69,10 +82,35 @@ class CodePainter(QSyntaxHighlighter):
     ]
 
     operators = [
-        '+', '-', '*', '/', '%', '<', '>', '=', '!=', '>=', '<=', '!<', '!>', '<>', '!!=', '!~', r'\|\|'
+        '+', '-', '*', '/', '%', '<', '>', '=', '!=', '>=', '<=', '!<', '!>', '<>', '!!=', '!~', '||'
     ]
 
-    braces = [r'\{', r'\}', r'\(', r'\)', r'\[', r'\]']
+    braces = ['{', '}', '(', ')', '[', ']']
+
+    # Block states carried from one line to next
+    NORMAL = 0
+    BLOCK_COMMENT = 1
+    SINGLE_QUOTE = 2
+    DOUBLE_QUOTE = 3
+
+    KEYWORDS = frozenset(keywords)
+
+    # Single alternation scanned once per line, keywords are words found in KEYWORDS set
+    TOKEN = re.compile('|'.join([
+        r'(?P<comment>--[^\n]*)',
+        r"(?P<open>/\*|'|\")",
+        r'(?P<number>\b0[xX][0-9A-Fa-f]+[lL]?\b|\b[0-9]+(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?[lL]?\b)',
+        r'(?P<word>[A-Za-z_][A-Za-z0-9_$]*)',
+        r'(?P<operator>{})'.format('|'.join(re.escape(o) for o in sorted(operators, key=len, reverse=True))),
+        r'(?P<brace>[{}])'.format(re.escape(''.join(braces))),
+    ]))
+    OPEN_STATE = {'/*': BLOCK_COMMENT, "'": SINGLE_QUOTE, '"': DOUBLE_QUOTE}
+    # Rest of comment/string after its opening, quote is escaped by backslash or by doubling it
+    CLOSE = {
+        BLOCK_COMMENT: re.compile(r'(?:[^*]|\*(?!/))*\*/'),
+        SINGLE_QUOTE: re.compile(r"(?:[^'\\]|\\.|'')*'"),
+        DOUBLE_QUOTE: re.compile(r'(?:[^"\\]|\\.|"")*"'),
+    }
 
     def __init__(self, document, style):
         """
@@ -82,42 +120,105 @@ class CodePainter(QSyntaxHighlighter):
         """
         QSyntaxHighlighter.__init__(self, document)
 
-        rules = []
-
-        # Keyword, operator and brace rules
-        rules += [(r'\b%s\b' % w, 0, style['keyword']) for w in CodePainter.keywords]
-        rules += [(r'%s' % o, 0, style['operator']) for o in CodePainter.operators]
-        rules += [(r'%s' % b, 0, style['brace']) for b in CodePainter.braces]
-
-        # Other rules
-        rules += [
-            # Numeric values
-            (r'\b[+-]?[0-9]+[lL]?\b', 0, style['numbers']),
-            (r'\b[+-]?0[xX][0-9A-Fa-f]+[lL]?\b', 0, style['numbers']),
-            (r'\b[+-]?[0-9]+(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?\b', 0, style['numbers']),
-            # Double-Quote String
-            (r'"[^"\\]*(\\.[^"\\]*)*"', 0, style['string']),
-            # Single-Quote String
-            (r"'[^'\\]*(\\.[^'\\]*)*'", 0, style['string']),
-            # Single line Comment
-            (r'\-\- [^\n]*', 0, style['comment']),
-        ]
-
-        self.rules = [(QRegExp(pattern, cs=Qt.CaseInsensitive), index, fmt) for (pattern, index, fmt) in rules]
+        self.formats = {
+            'keyword': style['keyword'],
+            'operator': style['operator'],
+            'brace': style['brace'],
+            'number': style['numbers'],
+            'string': style['string'],
+            'comment': style['comment'],
+        }
+
+    @classmethod
+    def tokenize(cls, text, state=NORMAL):
+        """
+        Split single line into highlighted tokens in one pass
+        :param text: line of editor text
+        :param state: block state at end of previous line
+        :return: (list of (start, length, kind), block state at end of line)
+        """
+        tokens = list()
+        size = len(text)
+        pos = 0
+        start = 0
+        while True:
+            if state != cls.NORMAL:
+                # Inside comment/string opened at `start` or on previous line
+                match = cls.CLOSE[state].match(text, pos)
+                kind = 'comment' if state == cls.BLOCK_COMMENT else 'string'
+                if match is None:
+                    if size > start:
+                        tokens.append((start, size - start, kind))
+                    return tokens, state
+                tokens.append((start, match.end() - start, kind))
+                pos = match.end()
+                state = cls.NORMAL
+
+            match = cls.TOKEN.search(text, pos)
+            if match is None:
+                return tokens, state
+            kind = match.lastgroup
+            start, pos = match.span()
+            if kind == 'open':
+                state = cls.OPEN_STATE[match.group()]
+            elif kind != 'word':
+                tokens.append((start, pos - start, kind))
+            elif match.group().upper() in cls.KEYWORDS:
+                tokens.append((start, pos - start, 'keyword'))
 
     def highlightBlock(self, text):
         """
-        This functions paints all colors on editor text according to rules
+        This functions paints all colors on editor text according to rules. QSyntaxHighlighter highlight next
+        line again only when block state of this line is changed, so typing re-highlight single line unless
+        comment or string is opened/closed
         :param text: object of QTextBlock class
         :return: None
         """
-        for exp, nth, fmt in self.rules:
-            index = exp.indexIn(text, 0)
+        tokens, state = self.tokenize(text, max(self.previousBlockState(), self.NORMAL))
+        formats = self.formats
+        for start, length, kind in tokens:
+            self.setFormat(start, length, formats[kind])
+        self.setCurrentBlockState(state)
 
-            while index >= 0:
-                index = exp.pos(nth)
-                length = len(exp.cap(nth))
-                self.setFormat(index, length, fmt)
-                index = exp.indexIn(text, index+length)
+    def paintBlocks(self, first, last):
+        """
+        Large file mode: highlighter is detached from document and only blocks in viewport are painted, line
+        before viewport which was never painted is treated as normal state
+        :param first: first visible QTextBlock
+        :param last: last visible QTextBlock
+        :return: True if any block got new formats else False
+        """
+        previous = first.previous()
+        state = max(previous.userState(), self.NORMAL) if previous.isValid() else self.NORMAL
+        formats = self.formats
+        dirty_from = None
+        dirty_to = None
+        block = first
+        while block.isValid():
+            painted = block.userData()
+            if not isinstance(painted, PaintedBlock) or painted.revision != block.revision() \
+                    or painted.state != state:
+                tokens, end_state = self.tokenize(block.text(), state)
+                ranges = list()
+                for start, length, kind in tokens:
+                    format_range = QTextLayout.FormatRange()
+                    format_range.start = start
+                    format_range.length = length
+                    format_range.format = formats[kind]
+                    ranges.append(format_range)
+                block.layout().setFormats(ranges)
+                block.setUserData(PaintedBlock(block.revision(), state))
+                block.setUserState(end_state)
+                if dirty_from is None:
+                    dirty_from = block.position()
+                dirty_to = block.position() + block.length()
+            state = max(block.userState(), self.NORMAL)
+            if block == last:
+                break
+            block = block.next()
 
-            self.setCurrentBlockState(0)
+        if dirty_from is None:
+            return False
+        document = first.document()
+        document.markContentsDirty(dirty_from, min(dirty_to, document.characterCount()) - dirty_from)
+        return True
@@ -0,0 +1,209 @@
+import time
+from threading import Condition
+
+from logger import log
+
+
+class ConnectionPool:
+    def __init__(self, profile, factory, min_size=1, max_size=4, idle_timeout=300, retries=3, backoff=0.5):
+        """
+        Pool of connected engines of single profile
+        :param profile: object of Profile class
+        :param factory: callable which create connected engine from profile, raise ConnectionError on failure
+        :param min_size: number of idle engines kept open even after idle timeout
+        :param max_size: maximum number of engines open at same time
+        :param idle_timeout: seconds after which idle engine is closed
+        :param retries: number of connect attempts before giving up
+        :param backoff: seconds to wait before first retry, doubled on every retry
+        """
+        self.log = log.getLogger(self.__class__.__name__)
+
+        self.profile = profile
+        self.factory = factory
+        self.minSize = max(0, min_size)
+        self.maxSize = max(1, max_size)
+        self.idleTimeout = idle_timeout
+        self.retries = max(1, retries)
+        self.backoff = backoff
+
+        self.condition = Condition()
+        self.idle = list()      # [engine, last used time], most recently used at the end
+        self.inUse = set()
+        self.opening = 0        # engines being connected, counted against max_size
+        self.pinned = None      # engine holding an open transaction, reused by next checkout
+        self.closed = False
+
+    @property
+    def size(self):
+        """
+        :return: number of engines open or being opened
+        """
+        return len(self.idle) + len(self.inUse) + self.opening
+
+    def acquire(self, timeout=None):
+        """
+        Checkout engine from pool, called from worker thread as it can block on connect/ping
+        :param timeout: seconds to wait for free engine, None to wait forever
+        :return: engine
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            engine = None
+            with self.condition:
+                while True:
+                    if self.closed:
+                        raise ConnectionError('Connection pool of profile {} is closed'.format(self.profile.profile))
+                    if self.pinned is not None:
+                        # Open transaction must continue on same connection
+                        if self.pinned not in self.inUse:
+                            engine = self.pinned
+                            self.idle = [entry for entry in self.idle if entry[0] is not engine]
+                            break
+                    elif self.idle:
+                        engine = self.idle.pop()[0]
+                        break
+                    elif self.size < self.maxSize:
+                        self.opening += 1
+                        break
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError('No free connection in pool of profile {}'.format(self.profile.profile))
+                    self.condition.wait(remaining)
+                if engine is not None:
+                    self.inUse.add(engine)
+
+            if engine is None:
+                try:
+                    engine = self.__connect()
+                finally:
+                    with self.condition:
+                        self.opening -= 1
+                        if engine is not None:
+                            self.inUse.add(engine)
+                        self.condition.notify_all()
+                return engine
+
+            # Pre-ping before handing out engine, dead connection is replaced by new one
+            if engine.ping():
+                return engine
+            self.log.warning('Connection of profile {} is dead, reconnecting'.format(self.profile.profile))
+            self.__close(engine)
+            with self.condition:
+                self.inUse.discard(engine)
+                if self.pinned is engine:
+                    self.pinned = None
+                self.condition.notify_all()
+
+    def release(self, engine):
+        """
+        Return engine into pool
+        :param engine: engine checked out by acquire
+        :return: None
+        """
+        conflict = False
+        with self.condition:
+            if self.closed:
+                self.inUse.discard(engine)
+                close = True
+            else:
+                close = False
+                in_transaction = engine.inTransaction()
+                if in_transaction and self.pinned is not None and self.pinned is not engine:
+                    # Only one transaction can be continued by next checkout, engine stays checked out until rolled back
+                    conflict = True
+                else:
+                    self.inUse.discard(engine)
+                    self.pinned = engine if in_transaction else (None if self.pinned is engine else self.pinned)
+                    self.idle.append([engine, time.monotonic()])
+            self.condition.notify_all()
+        if conflict:
+            close = not self.__rollback(engine)
+            with self.condition:
+                self.inUse.discard(engine)
+                if not close and not self.closed:
+                    self.idle.append([engine, time.monotonic()])
+                else:
+                    close = True
+                self.condition.notify_all()
+        if close:
+            self.__close(engine)
+
+    def __rollback(self, engine):
+        """
+        Roll back transaction of engine released while other engine of pool hold open transaction
+        :param engine: engine with open transaction
+        :return: True if transaction is rolled back, False if engine must be closed
+        """
+        self.log.warning('Profile {} already has open transaction on other connection, rolling back second '
+                         'transaction'.format(self.profile.profile))
+        try:
+            engine.rollback()
+            return not engine.inTransaction()
+        except Exception as e:
+            self.log.error('Unable to rollback transaction, closing connection: {}'.format(e))
+            return False
+
+    def prune(self):
+        """
+        Close engines which are idle for more than idle timeout, keeping min_size engines
+        :return: None
+        """
+        now = time.monotonic()
+        expired = list()
+        with self.condition:
+            keep = list()
+            # Oldest engines are at the start of idle list
+            for engine, last_used in self.idle:
+                if now - last_used > self.idleTimeout and engine is not self.pinned \
+                        and self.size - len(expired) > self.minSize:
+                    expired.append(engine)
+                else:
+                    keep.append([engine, last_used])
+            self.idle = keep
+        for engine in expired:
+            self.__close(engine)
+
+    def close(self):
+        """
+        Invalidate pool, idle engines are closed now and checked out engines on release
+        :return: None
+        """
+        with self.condition:
+            self.closed = True
+            idle = [engine for engine, _ in self.idle]
+            self.idle = list()
+            self.pinned = None
+            self.condition.notify_all()
+        for engine in idle:
+            self.__close(engine)
+
+    def __connect(self):
+        """
+        Create new engine, retry with exponential backoff
+        :return: engine
+        """
+        delay = self.backoff
+        error = None
+        for attempt in range(self.retries):
+            try:
+                return self.factory(self.profile)
+            except ConnectionError as e:
+                error = e
+                self.log.warning('Connect attempt {} of profile {} failed: {}'.format(
+                    attempt + 1, self.profile.profile, e
+                ))
+                if attempt + 1 < self.retries:
+                    time.sleep(delay)
+                    delay *= 2
+        raise error
+
+    def __close(self, engine):
+        """
+        Close engine ignoring errors of already dead connection
+        :param engine: engine to be closed
+        :return: None
+        """
+        try:
+            engine.close()
+        except Exception as e:
+            self.log.error(e)
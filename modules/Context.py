@@ -33,10 +33,31 @@ class Context:
         self.editor['font.pointSize'] = self.settings.value('editor.font.pointSize', 9, int)
         self.editor['font.stretch'] = self.settings.value('editor.font.stretch', 0, int)
         self.editor['font.weight'] = self.settings.value('editor.font.weight', 50, int)
+        self.editor['largeFile.threshold'] = self.settings.value('editor.largeFile.threshold', 8, int)
         self.editor['result.renderCount'] = self.settings.value('editor.result.renderCount', 1000, int)
 
         # SERVER
         self.server['autoCommit'] = self.settings.value('server.autoCommit', False, bool)
+        self.server['batch.size'] = self.settings.value('server.batch.size', 100, int)
+        self.server['batch.stopOnError'] = self.settings.value('server.batch.stopOnError', True, bool)
+        self.server['batch.transaction'] = self.settings.value('server.batch.transaction', False, bool)
+        self.server['cache.enabled'] = self.settings.value('server.cache.enabled', False, bool)
+        self.server['cache.maxSize'] = self.settings.value('server.cache.maxSize', 64, int)
+        self.server['cache.ttl'] = self.settings.value('server.cache.ttl', 300, int)
+        self.server['fanOut.concurrency'] = self.settings.value('server.fanOut.concurrency', 8, int)
+        self.server['fetchSize'] = self.settings.value('server.fetchSize', 500, int)
+        self.server['history.enabled'] = self.settings.value('server.history.enabled', True, bool)
+        self.server['history.maxEntries'] = self.settings.value('server.history.maxEntries', 500000, int)
+        self.server['metrics.log'] = self.settings.value('server.metrics.log', '', str)
+        self.server['pool.idleTimeout'] = self.settings.value('server.pool.idleTimeout', 300, int)
+        self.server['pool.maxSize'] = self.settings.value('server.pool.maxSize', 4, int)
+        self.server['pool.minSize'] = self.settings.value('server.pool.minSize', 1, int)
+        self.server['pool.retries'] = self.settings.value('server.pool.retries', 3, int)
+        self.server['statementTimeout'] = self.settings.value('server.statementTimeout', 0, int)
+        self.server['statementTimeout.profiles'] = self.settings.value('server.statementTimeout.profiles', {}, dict)
+        self.server['streaming'] = self.settings.value('server.streaming', True, bool)
+        self.server['trace.record'] = ''   # trace file while `Record Trace` is on, not kept between sessions
+        self.server['trace.speed'] = self.settings.value('server.trace.speed', 1.0, float)
 
         # WINDOW
         self.window['maximized'] = self.settings.value('window.maximized', False, bool)
@@ -44,6 +65,7 @@ class Context:
         self.window['size'] = self.settings.value('window.size', [480, 320], int)
 
         # XPQE
+        self.xpqe['execute.engine'] = None
         self.xpqe['execute.host'] = None
         self.xpqe['execute.header'] = None
         self.xpqe['execute.result'] = None
@@ -65,12 +87,41 @@ class Context:
         self.settings.setValue('editor.font.pointSize', self.editor['font.pointSize'])
         self.settings.setValue('editor.font.stretch', self.editor['font.stretch'])
         self.settings.setValue('editor.font.weight', self.editor['font.weight'])
+        self.settings.setValue('editor.largeFile.threshold', self.editor['largeFile.threshold'])
         self.settings.setValue('editor.result.renderCount', self.editor['result.renderCount'])
 
         # SERVER
         self.settings.setValue('server.autoCommit', self.server['autoCommit'])
+        self.settings.setValue('server.batch.size', self.server['batch.size'])
+        self.settings.setValue('server.batch.stopOnError', self.server['batch.stopOnError'])
+        self.settings.setValue('server.batch.transaction', self.server['batch.transaction'])
+        self.settings.setValue('server.cache.enabled', self.server['cache.enabled'])
+        self.settings.setValue('server.cache.maxSize', self.server['cache.maxSize'])
+        self.settings.setValue('server.cache.ttl', self.server['cache.ttl'])
+        self.settings.setValue('server.fanOut.concurrency', self.server['fanOut.concurrency'])
+        self.settings.setValue('server.fetchSize', self.server['fetchSize'])
+        self.settings.setValue('server.history.enabled', self.server['history.enabled'])
+        self.settings.setValue('server.history.maxEntries', self.server['history.maxEntries'])
+        self.settings.setValue('server.metrics.log', self.server['metrics.log'])
+        self.settings.setValue('server.pool.idleTimeout', self.server['pool.idleTimeout'])
+        self.settings.setValue('server.pool.maxSize', self.server['pool.maxSize'])
+        self.settings.setValue('server.pool.minSize', self.server['pool.minSize'])
+        self.settings.setValue('server.pool.retries', self.server['pool.retries'])
+        self.settings.setValue('server.statementTimeout', self.server['statementTimeout'])
+        self.settings.setValue('server.statementTimeout.profiles', self.server['statementTimeout.profiles'])
+        self.settings.setValue('server.streaming', self.server['streaming'])
+        self.settings.setValue('server.trace.speed', self.server['trace.speed'])
 
         # WINDOW
         self.settings.setValue('window.maximized', self.window['maximized'])
         self.settings.setValue('window.position', self.window['position'])
         self.settings.setValue('window.size', self.window['size'])
+
+    def statementTimeout(self, profile_name):
+        """
+        Statement timeout of profile, profile override is used if set else global timeout
+        :param profile_name: name of profile
+        :return: timeout in seconds, 0 means no timeout
+        """
+        timeout = self.server['statementTimeout.profiles'].get(profile_name)
+        return self.server['statementTimeout'] if timeout is None else int(timeout)
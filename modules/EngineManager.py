@@ -1,11 +1,30 @@
-import re
+import time
+from collections import deque
+from datetime import datetime
+from threading import Lock
 
-from Engines.MySQLEngine import MySQLEngine
-from Engines.PostgreSQLEngine import PostgreSQLEngine
+from PyQt5.QtCore import QObject, QThreadPool, QTimer, pyqtSlot
+from PyQt5.QtWidgets import QMessageBox, QProgressDialog
+
+from Engines import get_engine_class
 from logger import log
+from modules.Batch import BatchStatement, BatchWorker
+from modules.ConnectionPool import ConnectionPool
+from modules.Exporter import ExportWorker
+from modules.FanOut import FanOutRun
+from modules.History import History
+from modules.Metrics import MetricsRegistry, QueryTiming
+from modules.QueryWorker import QueryWorker
+from modules.ResultCache import CacheEntry, ResultCache
+from modules.ResultSet import ResultSet
+from modules.StatementIndex import split_statements
+from modules.Tracer import Tracer
+
 
+class EngineManager(QObject):
+    # Columns of `Run All` report
+    BATCH_HEADER = ['#', 'Profile', 'Status', 'Seconds', 'Rows', 'Batch', 'Statement', 'Error']
 
-class EngineManager:
     def __init__(self, context, profiler, result_table):
         """
         Engine Identifier
@@ -13,80 +32,711 @@ class EngineManager:
         :param profiler: object of Profiler class
         :param result_table: object of ResultTable class
         """
+        super().__init__()
         self.log = log.getLogger(self.__class__.__name__)
         self.context = context
         self.profiler = profiler
         self.resultTable = result_table
 
-        self.engines = dict()
+        self.resultCache = ResultCache(self.context.server['cache.ttl'],
+                                       self.context.server['cache.maxSize'] * 1024 * 1024)
+        self.cacheStatus = None     # QLabel in status bar, set by Main window
+        self.metrics = MetricsRegistry(self.context.server['metrics.log'])
+        self.metricsStatus = None   # QLabel in status bar, set by Main window
+        self.history = History(max_entries=self.context.server['history.maxEntries'], parent=self) \
+            if self.context.server['history.enabled'] else None
+
+        self.pools = dict()     # profile_name -> ConnectionPool
+        self.poolsLock = Lock()
+        self.resultEngine = None    # engine checked out while its streaming result is shown in table
+
+        # Queries are executed on worker threads, GUI thread only receive signals
+        self.threadPool = QThreadPool()
+        self.running = dict()   # worker signals -> [profile_name, stage, start time, worker]
+        self.fanOuts = list()   # running FanOutRun objects
+        self.exports = dict()   # export worker signals -> [worker, QProgressDialog]
+        self.script = deque()   # statements waiting for running statement of script
+        self.scriptStep = None  # worker signals / FanOutRun of running statement of script
+
+        self.pruneTimer = QTimer(self)
+        self.pruneTimer.setInterval(30000)
+        self.pruneTimer.timeout.connect(self.prunePools)
+        self.pruneTimer.start()
 
-    def parse(self, xsql):
+        self.profiler.profileChanged.connect(self.invalidateProfile)
+
+        self.progressTimer = QTimer(self)
+        self.progressTimer.setInterval(100)
+        self.progressTimer.timeout.connect(self.showProgress)
+
+    def parse(self, xsql, profile_name=None):
         """
-        parse give XSQL
+        parse give XSQL, its statements are run one after another
         :param xsql: query need to execute
+        :param profile_name: profile of statements written before first `@profile:` prefix, None if XSQL must give it
         :return: None
         """
-        xsql = xsql.replace('\u2029', '\n')
+        with Tracer.span('parse'):
+            steps = self.__parse(xsql, profile_name)
+        self.runScript(steps)
 
-        self.context.xpqe['execute.xsql'] = xsql
+    def __parse(self, xsql, profile_name):
+        """
+        :param xsql: query need to execute
+        :param profile_name: profile of statements without prefix
+        :return: list of (profile name or list of fan-out profile names, bypass cache, SQL, XSQL of statement)
+        """
+        xsql = xsql.replace('\u2029', '\n')
 
-        # Identify profile from given XSQL
-        profiles = [profile.lower() for profile in re.findall(r'@.+?:', xsql, re.IGNORECASE)]
+        # Every statement run on profile of its `@profile:` prefix or on profile of statement before it
+        statements = split_statements(xsql, profile_name.lower() if profile_name else None)
+        profiles = list(dict.fromkeys(statement.profile for statement in statements))
         self.log.info('Query profile(s): {}'.format(profiles))
 
-        if len(set(profiles)) > 1:
-            # Currently support only single profile in given query
-            #       [FUTURE SCOOP]: if no profile given select default profile.
-            self.log.error('With current version we only support single profile query')
-        elif len(set(profiles)) == 1:
-            xsql = xsql.replace(profiles[0], '')
-            profile_name = (profiles[0][1:-1]).lower()
-            try:
-                # Check for engine already exists in self.engines if not create one and add it
-                if profile_name in self.engines.keys():
-                    # Use existing engine to run query
-                    self.executeEngine(profile_name, xsql)
-                else:
-                    # Check of profile exists in profiler
-                    self.log.info(profile_name)
-                    profile = self.profiler.getProfile(profile_name)
-                    if profile:
-                        self.createEngine(profile)
-                        self.executeEngine(profile_name, xsql)
-                    else:
-                        self.log.error('Wrong Profile given, Unable to execute query')
-            except Exception as e:
-                import sys, traceback
-                self.log.error(traceback.print_tb(sys.exc_info()[2]))
-        else:
+        if not statements or None in profiles:
             self.log.error('Invalid query')
+            return []
+
+        targets = dict()
+        for profile in profiles:
+            # `@profile!:` bypass result cache
+            name = profile.rstrip('!')
+            if ',' in name or any(char in name for char in '*?['):
+                # Fan-out: `@shard01,shard02:` or `@shards*:`
+                with Tracer.span('profile lookup', pattern=name):
+                    profile_names = self.profiler.findProfiles(name.split(','))
+                if not profile_names:
+                    self.log.error('No profile matched {}, Unable to execute query'.format(name))
+                    return []
+                targets[profile] = profile_names
+            # Check for pool already exists in self.pools, if not check profile exists in profiler
+            elif self.lookupProfile(name):
+                targets[profile] = name
+            else:
+                self.log.error('Wrong Profile given, Unable to execute query')
+                return []
+
+        return [
+            (targets[statement.profile], statement.profile.endswith('!'), statement.sql(xsql).strip(),
+             xsql[statement.begin:statement.end] if statement.body > statement.begin else
+             '@{}: {}'.format(statement.profile, statement.sql(xsql)))
+            for statement in statements
+        ]
 
-    def executeEngine(self, profile_name, xsql):
+    def runAll(self, xsql, profile_name=None):
         """
-        Run given XSQL on respective engine
+        Run all statements of XSQL as batch, consecutive statements of same profile are sent to server together in
+        round trips of server.batch.size statements. Report of every statement is shown in result table
+        :param xsql: query need to execute
+        :param profile_name: profile of statements written before first `@profile:` prefix, None if XSQL must give it
+        :return: signals of BatchWorker, None if XSQL can not be run
+        """
+        with Tracer.span('parse'):
+            steps = self.__parse(xsql, profile_name)
+        if not steps:
+            return None
+        if any(isinstance(target, list) for target, _, _, _ in steps):
+            self.log.error('Fan-out statement can not be part of Run All, run it on its own')
+            return None
+
+        groups = list()
+        for index, (target, _, sql, statement_xsql) in enumerate(steps, 1):
+            statement = BatchStatement(index, target, sql, statement_xsql)
+            if groups and groups[-1][0] == target:
+                groups[-1][1].append(statement)
+            else:
+                groups.append((target, [statement]))
+        self.log.info('Run All of {} statements in {} group(s)'.format(len(steps), len(groups)))
+
+        worker = BatchWorker(self, groups, self.context.server['batch.transaction'],
+                             self.context.server['batch.stopOnError'])
+        worker.signals.progress.connect(self.onBatchProgress)
+        worker.signals.finished.connect(self.onBatchFinished)
+
+        self.resultTable.resultCount.setToolTip('')
+        profiles = ', '.join(dict.fromkeys(target for target, _ in groups))
+        self.running[worker.signals] = [profiles, 'Run All 0/{}'.format(len(steps)), time.monotonic(), worker]
+        self.progressTimer.start()
+        self.showProgress()
+        self.threadPool.start(worker)
+        return worker.signals
+
+    def runScript(self, steps):
+        """
+        Run statements in order, next statement is started when previous one is finished, script stop at first
+        failed statement
+        :param steps: list of (target, bypass cache, SQL, XSQL) from parse
+        :return: None
+        """
+        self.script = deque(steps)
+        self.scriptStep = None
+        self.runNext()
+
+    def runNext(self):
+        """
+        Start next statement of script, statements served from cache are done at once
+        :return: None
+        """
+        while self.script and self.scriptStep is None:
+            target, bypass_cache, sql, xsql = self.script.popleft()
+            self.context.xpqe['execute.xsql'] = xsql
+            if isinstance(target, list):
+                self.scriptStep = self.executeFanOut(target, sql)
+            else:
+                self.scriptStep = self.executeEngine(target, sql, bypass_cache=bypass_cache)
+
+    def stopScript(self, step):
+        """
+        Statement of script failed, statements after it are not run
+        :param step: worker signals or FanOutRun of failed statement
+        :return: None
+        """
+        if step is not self.scriptStep:
+            return
+        self.scriptStep = None
+        if self.script:
+            self.log.warning('Script stopped, {} statement(s) not executed'.format(len(self.script)))
+            self.script.clear()
+
+    def lookupProfile(self, profile_name):
+        """
+        :param profile_name: name of profile
+        :return: True if profile exists else False
+        """
+        with Tracer.span('profile lookup', profile=profile_name):
+            return profile_name in self.pools.keys() or self.profiler.getProfile(profile_name) is not None
+
+    def executeEngine(self, profile_name, xsql, bypass_cache=False):
+        """
+        Run given XSQL on respective engine, connect/execute/fetch are done on worker thread
         :param profile_name: Name of profile to get engine
         :param xsql: passed XSQL which need to be executed
+        :param bypass_cache: True to always run query on server, result still refresh cache
+        :return: signals of QueryWorker, None if result is served from cache
+        """
+        if self.context.server['cache.enabled'] and not bypass_cache:
+            normalized = ResultCache.normalize(xsql)
+            if ResultCache.isCacheable(normalized):
+                entry = self.resultCache.get(profile_name, normalized)
+                self.showCacheStatus(entry is not None)
+                if entry is not None:
+                    Tracer.instant('cache hit', profile=profile_name)
+                    self.showCached(entry)
+                    return None
+
+        worker = QueryWorker(self, profile_name, xsql)
+        worker.signals.progress.connect(self.onProgress)
+        worker.signals.finished.connect(self.onFinished)
+        worker.signals.failed.connect(self.onFailed)
+
+        self.resultTable.resultCount.setToolTip('')
+        self.running[worker.signals] = [profile_name, 'Queued', time.monotonic(), worker]
+        self.progressTimer.start()
+        self.showProgress()
+        self.threadPool.start(worker)
+        return worker.signals
+
+    def executeFanOut(self, profile_names, xsql):
+        """
+        Run given XSQL on many profiles in parallel, results are combined in single table
+        :param profile_names: list of profile names
+        :param xsql: passed XSQL which need to be executed
+        :return: object of FanOutRun class
+        """
+        self.log.info('Fan-out on profiles: {}'.format(profile_names))
+        fan_out = FanOutRun(self, profile_names, xsql, self.context.server['fanOut.concurrency'])
+        fan_out.done.connect(self.onFanOutDone)
+        self.fanOuts.append(fan_out)
+        fan_out.start()
+        self.progressTimer.start()
+        self.showProgress()
+        return fan_out
+
+    def cancelAll(self):
+        """
+        Cancel every running query, rows streamed before cancel are kept, statements of script waiting to run are
+        dropped
         :return: None
         """
-        engine = self.engines[profile_name]
-        if engine.sql(xsql):
-            engine.feed()
+        self.script.clear()
+        for profile_name, _, _, worker in self.running.values():
+            self.log.info('Cancel requested on profile: {}'.format(profile_name))
+            worker.cancel()
+        for fan_out in self.fanOuts:
+            fan_out.cancel()
+
+    def export(self, writer, path):
+        """
+        Write result of last executed query into file on worker thread, progress dialog allow to cancel it
+        :param writer: object of CsvWriter class or other export writer
+        :param path: location of export file
+        :return: None
+        """
+        worker = ExportWorker(self, writer, path)
+        if worker.resultEngine is not None:
+            if worker.resultEngine is not self.resultEngine:
+                QMessageBox.information(None, 'Export', 'Remaining rows of this result are still being exported')
+                return
+            # Cursor is read by worker until export is done, next query must not discard it meanwhile
+            self.resultEngine = None
+        worker.signals.progress.connect(self.onExportProgress)
+        worker.signals.rows.connect(self.onExportRows)
+        worker.signals.finished.connect(self.onExportFinished)
+        worker.signals.failed.connect(self.onExportFailed)
+
+        progress_dialog = QProgressDialog('Exporting {}...'.format(path), 'Cancel', 0, worker.total)
+        progress_dialog.setWindowTitle('Export')
+        progress_dialog.setMinimumDuration(500)
+        # Row count is unknown for streamed export, dialog is closed by finished/failed slots only
+        progress_dialog.setAutoReset(False)
+        progress_dialog.setAutoClose(False)
+        progress_dialog.canceled.connect(worker.cancel)
+        self.exports[worker.signals] = [worker, progress_dialog]
+        progress_dialog.setValue(0)
+        self.threadPool.start(worker)
+
+    def cacheResult(self, profile_name, engine):
+        """
+        Keep complete result of read only query in cache, write query drop cached results of profile
+        :param profile_name: name of profile
+        :param engine: engine which executed query
+        :return: None
+        """
+        normalized = self.expireCache(profile_name, engine.query)
+        if not self.context.server['cache.enabled'] or not ResultCache.isCacheable(normalized):
+            return
+        if engine.exhausted and not engine.cancelled:
+            self.resultCache.ttl = self.context.server['cache.ttl']
+            self.resultCache.maxBytes = self.context.server['cache.maxSize'] * 1024 * 1024
+            self.resultCache.put(profile_name, normalized, CacheEntry(
+                engine.result, engine.query, engine.profile.type, engine.profile.host, engine.timestamp
+            ))
+
+    def expireCache(self, profile_name, query):
+        """
+        Statement ran on profile, write statement drop cached results of profile, USE / SET search_path switch
+        namespace of following cached results. Done even while cache is off, so it is right once turned on
+        :param profile_name: name of profile
+        :param query: SQL sent to server
+        :return: normalized SQL
+        """
+        normalized = ResultCache.normalize(query)
+        self.resultCache.track(profile_name, normalized)
+        if not ResultCache.isCacheable(normalized):
+            self.resultCache.invalidate(profile_name)
+        return normalized
+
+    def showCached(self, entry):
+        """
+        Show cached result without going to server
+        :param entry: object of CacheEntry class
+        :return: None
+        """
+        self.releaseResultEngine()
+        self.context.xpqe['execute.sql'] = entry.query
+        self.context.xpqe['execute.header'] = entry.result.header
+        self.context.xpqe['execute.result'] = entry.result
+        self.context.xpqe['execute.engine'] = None
+        self.context.xpqe['execute.server'] = entry.server
+        self.context.xpqe['execute.host'] = entry.host
+        self.context.xpqe['execute.timestamp'] = entry.timestamp
+        self.resultTable.setResult(entry.result.header, entry.result)
+        self.resultTable.resultCount.setToolTip('')
+        self.resultTable.resultCount.setText('Showing {:,} of {:,} records, cached {:.0f}s ago'.format(
+            min(self.resultTable.maxRenderRecords, len(entry.result)), len(entry.result),
+            time.monotonic() - entry.created
+        ))
+
+    def recordMetrics(self, engine):
+        """
+        Add timing of query executed by engine into metrics registry and show it in status bar
+        :param engine: engine which executed query
+        :return: None
+        """
+        timing = engine.timing
+        if timing is None:
+            return
+        timing.rows = len(engine.result)
+        timing.bytes = engine.result.nbytes
+        self.metrics.record(timing)
+        if self.history is not None:
+            self.history.add(timing, self.context.xpqe['execute.xsql'])
+        if self.metricsStatus is not None:
+            self.metricsStatus.setText('Last: {:.3f}s'.format(timing.total))
+            self.metricsStatus.setToolTip(timing.summaryText())
+
+    def recordFailure(self, profile_name, engine, error):
+        """
+        Count failed query in metrics registry and history
+        :param profile_name: name of profile
+        :param engine: engine which executed query, None if engine could not be created
+        :param error: Exception raised
+        :return: None
+        """
+        if engine is not None and engine.timing is not None and engine.timing.status == 'ERROR':
+            self.recordMetrics(engine)
+            return
+        # Failed before query reached server
+        self.metrics.increment('queries', profile_name)
+        self.metrics.increment('error', profile_name)
+        if self.history is not None:
+            timing = QueryTiming(profile_name, None, None)
+            timing.status = 'ERROR'
+            timing.error = str(error)
+            self.history.add(timing, self.context.xpqe['execute.xsql'])
+
+    def showCacheStatus(self, hit=None):
+        """
+        Update cache indicator and hit/miss counters in status bar
+        :param hit: True on cache hit, False on miss
+        :return: None
+        """
+        if self.cacheStatus is not None:
+            self.cacheStatus.setText(self.resultCache.statusText(hit))
+
+    def getPool(self, profile_name):
+        """
+        Get connection pool of profile, pool is created on first use
+        :param profile_name: name of profile
+        :return: object of ConnectionPool class
+        """
+        with self.poolsLock:
+            pool = self.pools.get(profile_name)
+            if pool is None:
+                profile = self.profiler.getProfile(profile_name)
+                if profile is None:
+                    raise KeyError('Profile {} does not exist'.format(profile_name))
+                pool = ConnectionPool(
+                    profile,
+                    self.createEngine,
+                    min_size=self.context.server['pool.minSize'],
+                    max_size=self.context.server['pool.maxSize'],
+                    idle_timeout=self.context.server['pool.idleTimeout'],
+                    retries=self.context.server['pool.retries']
+                )
+                self.pools[profile_name] = pool
+            return pool
+
+    def acquireEngine(self, profile_name, timeout=None):
+        """
+        Checkout connected engine of profile, called from worker thread
+        :param profile_name: name of profile
+        :param timeout: seconds to wait for free connection, None to wait forever
+        :return: engine
+        """
+        pool = self.getPool(profile_name)
+        engine = pool.acquire(timeout)
+        engine.pool = pool
+        return engine
+
+    def releaseEngine(self, engine):
+        """
+        Return engine to pool it was checked out from
+        :param engine: engine returned by acquireEngine
+        :return: None
+        """
+        if engine is not None and getattr(engine, 'pool', None) is not None:
+            pool, engine.pool = engine.pool, None
+            pool.release(engine)
+
+    def releaseResultEngine(self):
+        """
+        Result shown in table is replaced, unfetched rows of its engine are no longer needed
+        :return: None
+        """
+        if self.resultEngine is not None:
+            self.resultEngine.discard()
+            self.releaseEngine(self.resultEngine)
+            self.resultEngine = None
+
+    def returnResultEngine(self, worker):
+        """
+        Export which pulled remaining rows of result is done, keep its engine for table while rows are left
+        :param worker: object of ExportWorker class
+        :return: None
+        """
+        engine = getattr(worker, 'resultEngine', None)
+        if engine is None:
+            return
+        worker.resultEngine = None
+        shown = self.context.xpqe['execute.engine'] is engine
+        if not engine.exhausted and self.resultEngine is None and shown:
+            self.resultEngine = engine
+            return
+        if shown and engine.exhausted and not engine.cancelled:
+            self.resultTable.resultCount.setText('Showing {:,} of {:,} records'.format(
+                min(self.resultTable.maxRenderRecords, len(engine.result)), len(engine.result)
+            ))
+        engine.discard()
+        self.releaseEngine(engine)
+
+    def invalidateProfile(self, profile_name):
+        """
+        Profile is edited/removed, connections of old profile details must not be used again
+        :param profile_name: name of profile
+        :return: None
+        """
+        self.resultCache.invalidate(profile_name, scope=True)
+        with self.poolsLock:
+            pool = self.pools.pop(profile_name, None)
+        if pool is not None:
+            self.log.info('Connection pool of profile {} is invalidated'.format(profile_name))
+            pool.close()
+
+    def prunePools(self):
+        """
+        Close idle connections of all pools
+        :return: None
+        """
+        for pool in list(self.pools.values()):
+            pool.prune()
 
     def createEngine(self, profile):
         """
-        Create Engine if for given profile is not been created
+        Create and connect Engine for given profile, used by ConnectionPool
         :param profile: object of Profile
-        :return: None
+        :return: engine / None
         """
-        profile_type = profile.type
+        if profile is None:
+            return None
+
+        try:
+            engine_class = get_engine_class(profile.type)
+        except ImportError as e:
+            raise ConnectionError('Driver of {} profile: {} is not installed, {}'.format(
+                profile.type, profile.profile, e
+            ))
         engine = None
-        if profile_type.lower() == 'mysql':
-            engine = MySQLEngine(self.context, profile, self.resultTable)
-            engine.connect()
-        elif profile_type.lower() == 'postgresql':
-            engine = PostgreSQLEngine(self.context, profile, self.resultTable)
+        if engine_class is not None:
+            engine = engine_class(self.context, profile, self.resultTable)
             engine.connect()
 
-        # Add to engines list
+        if engine and engine.cursor is None:
+            # Do not cache engine which failed to connect, next query will try again
+            raise ConnectionError('Unable to connect to profile: {}'.format(profile.profile))
+
+        return engine
+
+    def showProgress(self):
+        """
+        Show stage and elapsed time of running queries in status bar
+        :return: None
+        """
+        if not self.running and not self.fanOuts:
+            self.progressTimer.stop()
+            return
+        now = time.monotonic()
+        self.resultTable.resultCount.setText(' | '.join(
+            ['{} on {}... {:.1f}s'.format(stage, profile_name, now - start)
+             for profile_name, stage, start, _ in self.running.values()] +
+            [fan_out.progressText() for fan_out in self.fanOuts]
+        ))
+
+    @pyqtSlot(str, str)
+    def onProgress(self, profile_name, stage):
+        """
+        Worker moved to next stage of execution
+        :param profile_name: name of profile
+        :param stage: name of stage
+        :return: None
+        """
+        if self.sender() in self.running:
+            self.running[self.sender()][1] = stage
+        self.showProgress()
+
+    @pyqtSlot(str, object, float)
+    def onFinished(self, profile_name, engine, elapsed):
+        """
+        Query executed successfully, populate result table on GUI thread
+        :param profile_name: name of profile
+        :param engine: engine which executed query
+        :param elapsed: seconds taken by worker
+        :return: None
+        """
+        self.running.pop(self.sender(), None)
+        self.releaseResultEngine()
+        with Tracer.span('render', 'ui', profile=profile_name, rows=len(engine.result)):
+            engine.feed()
+        self.recordMetrics(engine)
+        self.cacheResult(profile_name, engine)
+        if engine.exhausted:
+            self.releaseEngine(engine)
+        else:
+            # Keep connection checked out, export can still pull remaining rows from its cursor
+            self.resultEngine = engine
+        if self.sender() is self.scriptStep:
+            self.scriptStep = None
+            self.runNext()
+
+    @pyqtSlot(str, object, object, float)
+    def onFailed(self, profile_name, engine, error, elapsed):
+        """
+        Query failed on worker thread, show error on GUI thread
+        :param profile_name: name of profile
+        :param engine: engine which executed query, None if engine could not be created
+        :param error: Exception raised by engine
+        :param elapsed: seconds taken by worker
+        :return: None
+        """
+        self.running.pop(self.sender(), None)
+        self.resultTable.resultCount.setText('Query failed on {}'.format(profile_name))
+        self.recordFailure(profile_name, engine, error)
+        self.stopScript(self.sender())
         if engine:
-            self.engines[profile.profile] = engine
+            engine.displayError(error)
+        else:
+            self.log.error(error)
+
+    @pyqtSlot(int, int)
+    def onBatchProgress(self, done, total):
+        """
+        Statements of Run All finished so far
+        :param done: number of finished statements
+        :param total: number of statements
+        :return: None
+        """
+        if self.sender() in self.running:
+            self.running[self.sender()][1] = 'Run All {}/{}'.format(done, total)
+        self.showProgress()
+
+    @pyqtSlot(object, float)
+    def onBatchFinished(self, statements, elapsed):
+        """
+        Run All is finished, show status and timing of every statement
+        :param statements: list of BatchStatement
+        :param elapsed: seconds taken by worker
+        :return: None
+        """
+        self.running.pop(self.sender(), None)
+        self.releaseResultEngine()
+
+        for statement in statements:
+            if statement.timing is None:
+                continue
+            self.metrics.record(statement.timing)
+            if self.history is not None:
+                self.history.add(statement.timing, statement.xsql)
+            self.expireCache(statement.profile, statement.sql)
+
+        result = ResultSet(self.BATCH_HEADER)
+        result.append([
+            (statement.index, statement.profile, statement.status,
+             None if statement.seconds is None else round(statement.seconds, 6), statement.rows, statement.batch,
+             statement.sql, statement.error)
+            for statement in statements
+        ])
+        servers = [statement.timing.server for statement in statements if statement.timing is not None]
+        self.context.xpqe['execute.sql'] = ';\n'.join(statement.sql for statement in statements)
+        self.context.xpqe['execute.header'] = result.header
+        self.context.xpqe['execute.result'] = result
+        self.context.xpqe['execute.engine'] = None
+        self.context.xpqe['execute.server'] = ', '.join(dict.fromkeys(servers))
+        self.context.xpqe['execute.host'] = ', '.join(dict.fromkeys(statement.profile for statement in statements))
+        self.context.xpqe['execute.timestamp'] = str(datetime.fromtimestamp(datetime.now().timestamp()).isoformat())
+
+        counts = dict()
+        for statement in statements:
+            counts[statement.status] = counts.get(statement.status, 0) + 1
+        self.resultTable.setResult(result.header, result)
+        self.resultTable.resultCount.setText('Run All of {} statements in {:.1f}s: {}'.format(
+            len(statements), elapsed, ', '.join('{:,} {}'.format(count, status) for status, count in counts.items())
+        ))
+        failed = [statement for statement in statements if statement.status in ('ERROR', 'TIMEOUT')]
+        if failed:
+            error_dialog = QMessageBox()
+            error_dialog.setIcon(QMessageBox.Warning)
+            error_dialog.setWindowTitle('Run All Errors')
+            error_dialog.setText('{} of {} statements failed, first at #{}: {}'.format(
+                len(failed), len(statements), failed[0].index, failed[0].error
+            ))
+            error_dialog.setDetailedText('\n\n'.join(
+                '#{} @{}: {}\n{}'.format(statement.index, statement.profile, statement.sql, statement.error)
+                for statement in failed
+            ))
+            error_dialog.exec_()
+
+    @pyqtSlot(object)
+    def onFanOutDone(self, fan_out):
+        """
+        All profiles of fan-out run are finished, report failed profiles
+        :param fan_out: object of FanOutRun class
+        :return: None
+        """
+        self.fanOuts.remove(fan_out)
+        fan_out.deleteLater()
+        self.releaseResultEngine()
+        failed = [name for name, entry in fan_out.report.items() if entry['status'] != 'OK']
+        if not failed and fan_out is self.scriptStep:
+            self.scriptStep = None
+            self.runNext()
+        if failed:
+            self.stopScript(fan_out)
+            error_dialog = QMessageBox()
+            error_dialog.setIcon(QMessageBox.Warning)
+            error_dialog.setWindowTitle('Fan-out Errors')
+            error_dialog.setText('Query failed on {} of {} profiles: {}'.format(
+                len(failed), len(fan_out.profileNames), ', '.join(failed)
+            ))
+            error_dialog.setDetailedText(fan_out.reportText())
+            error_dialog.exec_()
+
+    @pyqtSlot(int)
+    def onExportProgress(self, rows):
+        """
+        Rows written by export worker so far
+        :param rows: number of rows written
+        :return: None
+        """
+        if self.sender() in self.exports:
+            worker, progress_dialog = self.exports[self.sender()]
+            if worker.total:
+                progress_dialog.setValue(min(rows, worker.total))
+            progress_dialog.setLabelText('Exported {:,} rows into {}'.format(rows, worker.path))
+
+    @pyqtSlot(object, object)
+    def onExportRows(self, result, rows):
+        """
+        Remaining rows of result pulled by export worker, kept in result on GUI thread
+        :param result: object of ResultSet class
+        :param rows: list of row tuples
+        :return: None
+        """
+        self.resultTable.appendRows(result, rows)
+
+    @pyqtSlot(str, int, float)
+    def onExportFinished(self, path, rows, elapsed):
+        """
+        Export file is completely written
+        :param path: location of export file
+        :param rows: number of rows written
+        :param elapsed: seconds taken by export
+        :return: None
+        """
+        worker, progress_dialog = self.exports.pop(self.sender(), (None, None))
+        if progress_dialog is not None:
+            progress_dialog.hide()
+            progress_dialog.deleteLater()
+        self.returnResultEngine(worker)
+        self.log.info('Result Exported @ {}, {:,} rows in {:.1f}s'.format(path, rows, elapsed))
+
+    @pyqtSlot(str, object)
+    def onExportFailed(self, path, error):
+        """
+        Export failed or cancelled, partially written file is already removed by worker
+        :param path: location of export file
+        :param error: Exception raised
+        :return: None
+        """
+        worker, progress_dialog = self.exports.pop(self.sender(), (None, None))
+        if progress_dialog is not None:
+            progress_dialog.hide()
+            progress_dialog.deleteLater()
+        self.returnResultEngine(worker)
+        if worker is not None and worker.cancelRequested:
+            self.log.info('Export @ {} cancelled'.format(path))
+            return
+        error_dialog = QMessageBox()
+        error_dialog.setIcon(QMessageBox.Critical)
+        error_dialog.setWindowTitle('Export Error')
+        error_dialog.setText('Unable to export result @ {}\n{}'.format(path, error))
+        error_dialog.exec_()
@@ -0,0 +1,674 @@
+import csv
+import datetime
+import decimal
+import gzip
+import html
+import json
+import os
+import threading
+import time
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+from Engines import get_engine_class
+from logger import log
+from modules.ResultCache import ResultCache
+from modules.Tracer import Tracer
+
+
+class CsvWriter:
+    # File dialog filter, `.gz` suffix compress output
+    FILTER = 'Comma Separated Value (*.csv);;Gzip Compressed CSV (*.csv.gz)'
+
+    def __init__(self, header=True):
+        """
+        RFC 4180 CSV writer, rows are written as they arrive so export never hold whole result
+        :param header: write column names as first record (True/False)
+        """
+        self.header = header
+        self.file = None
+        self.writer = None
+
+    def open(self, path, header, description=None):
+        """
+        :param path: location of export file, gzip compressed when it ends with `.gz`
+        :param header: list of column names
+        :param description: cursor.description of query, None when rows come from ResultSet
+        :return: None
+        """
+        if path.lower().endswith('.gz'):
+            self.file = gzip.open(path, 'wt', encoding='utf-8', newline='')
+        else:
+            self.file = open(path, 'w', encoding='utf-8', newline='')
+        # csv module quote fields having separator, quote or line break and write NULL as empty field
+        self.writer = csv.writer(self.file, lineterminator='\r\n')
+        if self.header:
+            self.writer.writerow(header)
+
+    def write(self, rows):
+        """
+        :param rows: list of row tuples
+        :return: None
+        """
+        self.writer.writerows(rows)
+
+    def close(self, discard=False):
+        """
+        :param discard: export failed, file is removed after it is closed
+        :return: None
+        """
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class ArrowWriter:
+    PARQUET = 'parquet'
+    FEATHER = 'feather'     # Arrow IPC file format, same as Feather V2
+
+    FILTER = {
+        PARQUET: 'Apache Parquet (*.parquet)',
+        FEATHER: 'Arrow IPC / Feather (*.arrow *.feather)'
+    }
+
+    # Rows buffered before they are written, each flush become one Parquet row group / IPC record batch
+    ROW_GROUP_SIZE = 65536
+
+    def __init__(self, file_format, server=None):
+        """
+        Typed columnar writer of Parquet and Arrow IPC files, needs optional pyarrow package
+        :param file_format: ArrowWriter.PARQUET / ArrowWriter.FEATHER
+        :param server: server type of profile (mysql/postgresql), decides meaning of cursor type codes
+        """
+        self.log = log.getLogger(self.__class__.__name__)
+
+        self.format = file_format
+        self.server = (server or '').lower()
+        self.pa = None
+        self.path = None
+        self.header = None
+        self.description = None
+        self.declared = None    # arrow type of each column from cursor description, None where not known
+        self.schema = None
+        self.writer = None
+        self.sink = None
+        self.buffer = list()
+
+    def open(self, path, header, description=None):
+        """
+        :param path: location of export file
+        :param header: list of column names
+        :param description: cursor.description of query, None when rows come from ResultSet
+        :return: None
+        """
+        try:
+            import pyarrow
+        except ImportError:
+            raise RuntimeError('{} export needs pyarrow package, install it with `pip install pyarrow`'.format(
+                self.format.capitalize()
+            ))
+        self.pa = pyarrow
+        self.path = path
+        self.header = list(header)
+        self.description = description
+
+    def write(self, rows):
+        """
+        :param rows: list of row tuples
+        :return: None
+        """
+        self.buffer.extend(rows)
+        if len(self.buffer) >= self.ROW_GROUP_SIZE:
+            self.__flush()
+
+    def close(self, discard=False):
+        """
+        Write buffered rows and footer, empty result still produce file with schema
+        :param discard: export failed, buffered rows are dropped as file is removed after it is closed
+        :return: None
+        """
+        if self.pa is None:
+            return
+        try:
+            if not discard and (self.buffer or self.writer is None):
+                self.__flush()
+        finally:
+            if self.writer is not None:
+                self.writer.close()
+            if self.sink is not None:
+                self.sink.close()
+            self.writer = None
+            self.sink = None
+            self.pa = None
+            self.buffer = list()
+
+    def __flush(self):
+        """
+        Convert buffered rows into one record batch and write it. Column types known from cursor description are
+        kept, other columns are inferred from values, column is widened when later values do not fit its type
+        :return: None
+        """
+        pa = self.pa
+        rows, self.buffer = self.buffer, list()
+        columns = list(zip(*rows)) if rows else [()] * len(self.header)
+
+        if self.declared is None:
+            self.declared = [self.__declaredType(index) for index in range(len(self.header))]
+
+        arrays = list()
+        for index, values in enumerate(columns):
+            arrow_type = self.declared[index] or self.__inferType(values)
+            if self.schema is not None:
+                arrow_type = self.__widen(self.schema.field(index).type, arrow_type)
+            arrays.append(self.__array(values, arrow_type))
+        schema = pa.schema([pa.field(name, array.type) for name, array in zip(self.header, arrays)])
+
+        if self.schema is None:
+            self.schema = schema
+            self.__openWriter()
+        elif not schema.equals(self.schema):
+            self.__promote(schema)
+            arrays = [array if array.type == field.type else array.cast(field.type)
+                      for array, field in zip(arrays, self.schema)]
+        self.__write(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+
+    def __openWriter(self):
+        """
+        :return: None
+        """
+        if self.format == self.PARQUET:
+            import pyarrow.parquet
+            self.writer = pyarrow.parquet.ParquetWriter(self.path, self.schema)
+        else:
+            self.sink = self.pa.OSFile(self.path, 'wb')
+            self.writer = self.pa.ipc.new_file(self.sink, self.schema)
+
+    def __write(self, data):
+        """
+        :param data: pyarrow.RecordBatch / pyarrow.Table
+        :return: None
+        """
+        if self.format == self.PARQUET:
+            table = data if isinstance(data, self.pa.Table) else self.pa.Table.from_batches([data])
+            self.writer.write_table(table)
+        else:
+            self.writer.write(data)
+
+    def __promote(self, schema):
+        """
+        Column type is widened after rows are written, file is written again with wider types. Column whose written
+        values can not be cast is widened to string
+        :param schema: pyarrow.Schema fitting latest batch
+        :return: None
+        """
+        pa = self.pa
+        self.log.info('Column types of export changed, writing {} again'.format(self.path))
+        self.writer.close()
+        if self.sink is not None:
+            self.sink.close()
+        self.writer = self.sink = None
+        if self.format == self.PARQUET:
+            import pyarrow.parquet
+            table = pyarrow.parquet.read_table(self.path)
+        else:
+            with pa.OSFile(self.path, 'rb') as source:
+                table = pa.ipc.open_file(source).read_all()
+
+        columns = list()
+        fields = list()
+        for column, field in zip(table.columns, schema):
+            try:
+                column = column.cast(field.type)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                field = pa.field(field.name, pa.string())
+                column = column.cast(field.type)
+            columns.append(column)
+            fields.append(field)
+        self.schema = pa.schema(fields)
+        self.__openWriter()
+        self.__write(pa.Table.from_arrays(columns, schema=self.schema))
+
+    def __array(self, values, arrow_type):
+        """
+        :param values: values of column
+        :param arrow_type: pyarrow.DataType expected for values
+        :return: pyarrow.Array, of wider type when values do not fit expected type
+        """
+        pa = self.pa
+        while True:
+            converter = self.__converter(arrow_type)
+            data = values if converter is None else [None if value is None else converter(value) for value in values]
+            try:
+                return pa.array(data, type=arrow_type)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError, TypeError, ValueError):
+                if arrow_type == pa.string():
+                    raise
+                arrow_type = self.__fallbackType(values, arrow_type)
+
+    def __fallbackType(self, values, arrow_type):
+        """
+        :param values: values of column which do not fit arrow_type
+        :param arrow_type: pyarrow.DataType
+        :return: uint64 for integers past int64, else string
+        """
+        pa = self.pa
+        if pa.types.is_integer(arrow_type) and arrow_type != pa.uint64():
+            try:
+                if min(value for value in values if value is not None) >= 0:
+                    return pa.uint64()
+            except (TypeError, ValueError):
+                pass
+        return pa.string()
+
+    def __widen(self, current, arrow_type):
+        """
+        :param current: pyarrow.DataType of column written so far
+        :param arrow_type: pyarrow.DataType of new values
+        :return: pyarrow.DataType holding both
+        """
+        pa = self.pa
+        if current == arrow_type or pa.types.is_null(arrow_type):
+            return current
+        if pa.types.is_null(current):
+            return arrow_type
+        if pa.types.is_integer(current) and pa.types.is_integer(arrow_type):
+            return pa.uint64() if pa.uint64() in (current, arrow_type) else pa.int64()
+        if all(pa.types.is_integer(item) or pa.types.is_floating(item) for item in (current, arrow_type)):
+            return pa.float64()
+        if {current, arrow_type} == {pa.date32(), pa.timestamp('us')}:
+            return pa.timestamp('us')
+        return pa.string()
+
+    def __declaredType(self, index):
+        """
+        Arrow type of column from cursor type code
+        :param index: column number
+        :return: pyarrow.DataType, None if type code is not known
+        """
+        pa = self.pa
+        column = self.description[index] if self.description else None
+        if column is None:
+            return None
+        # Type codes are mapped by engine of server, engine is already loaded by query being exported
+        try:
+            engine_class = get_engine_class(self.server)
+        except ImportError:
+            return None
+        if engine_class is None:
+            return None
+        name = engine_class.columnType(column)
+
+        if name == 'decimal':
+            # Precision is known only for PostgreSQL numeric(p, s), otherwise keep exact digits as text
+            precision = getattr(column, 'precision', None)
+            scale = getattr(column, 'scale', None)
+            if precision and scale is not None and precision <= 38:
+                return pa.decimal128(precision, scale)
+            name = 'string'
+        return None if name is None else self.__arrowType(name)
+
+    def __inferType(self, values):
+        """
+        Arrow type of column without known type code, from python types of its values
+        :param values: values of column
+        :return: pyarrow.DataType, null if every value is NULL
+        """
+        pa = self.pa
+        arrow_type = pa.null()
+        kinds = set(map(type, values))
+        kinds.discard(type(None))
+        for kind in kinds:
+            sample = next(value for value in values if type(value) is kind)
+            arrow_type = self.__widen(arrow_type, self.__arrowType(self.__pythonType(sample)))
+        return arrow_type
+
+    def __arrowType(self, name):
+        """
+        :param name: logical type name
+        :return: pyarrow.DataType
+        """
+        pa = self.pa
+        return {
+            'bool': pa.bool_,
+            'int16': pa.int16,
+            'int32': pa.int32,
+            'int64': pa.int64,
+            'uint64': pa.uint64,
+            'float32': pa.float32,
+            'float64': pa.float64,
+            'string': pa.string,
+            'binary': pa.binary,
+            'date': pa.date32,
+            'time': lambda: pa.time64('us'),
+            'timestamp': lambda: pa.timestamp('us'),
+            'timestamptz': lambda: pa.timestamp('us', tz='UTC'),
+            'duration': lambda: pa.duration('us')
+        }[name]()
+
+    @staticmethod
+    def __pythonType(value):
+        """
+        :param value: sample cell value
+        :return: arrow type name
+        """
+        if isinstance(value, bool):
+            return 'bool'
+        if isinstance(value, int):
+            return 'int64'
+        if isinstance(value, float):
+            return 'float64'
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return 'binary'
+        if isinstance(value, datetime.datetime):
+            return 'timestamp' if value.tzinfo is None else 'timestamptz'
+        if isinstance(value, datetime.date):
+            return 'date'
+        if isinstance(value, datetime.time):
+            return 'time'
+        if isinstance(value, datetime.timedelta):
+            return 'duration'
+        return 'string'
+
+    def __converter(self, arrow_type):
+        """
+        Driver values which arrow can not take as it is, e.g. memoryview of bytea, dict of jsonb, set of MySQL SET
+        :param arrow_type: pyarrow.DataType of column
+        :return: callable / None
+        """
+        pa = self.pa
+        if arrow_type == pa.string():
+            return self.__toString
+        if arrow_type == pa.binary():
+            return lambda value: value.encode('utf-8') if isinstance(value, str) else bytes(value)
+        return None
+
+    @staticmethod
+    def __toString(value):
+        """
+        :param value: cell value
+        :return: String
+        """
+        if isinstance(value, str):
+            return value
+        if isinstance(value, (bytes, bytearray)):
+            return value.decode('utf-8', 'replace')
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, default=str)
+        if isinstance(value, (set, frozenset)):
+            return ','.join(sorted(str(item) for item in value))
+        return str(value)
+
+
+# Types whose str() never has markup characters
+PLAIN_TYPES = frozenset({int, float, bool, decimal.Decimal, datetime.date, datetime.datetime, datetime.time})
+
+
+class HtmlWriter:
+    FILTER = 'Hyper Text Markup Language (*.html)'
+
+    def __init__(self, xsql, sql):
+        """
+        HTML page with queries and result table, rows are written as they arrive
+        :param xsql: XSQL query as written in editor
+        :param sql: SQL query sent to server
+        """
+        self.xsql = xsql
+        self.sql = sql
+        self.file = None
+
+    def open(self, path, header, description=None):
+        """
+        :param path: location of export file
+        :param header: list of column names
+        :param description: cursor.description of query, None when rows come from ResultSet
+        :return: None
+        """
+        self.file = open(path, 'w', encoding='utf-8')
+        self.file.write('<h2>XSQL Query</h2><code>{}</code>'.format(html.escape(self.xsql or '')))
+        self.file.write('<h2>SQL Query</h2><code>{}</code>'.format(html.escape(self.sql or '')))
+        self.file.write('<h2>Result Table</h2><table><tr><th>{}</th></tr>'.format(
+            '</th><th>'.join(html.escape(str(name)) for name in header)
+        ))
+
+    def write(self, rows):
+        """
+        :param rows: list of row tuples
+        :return: None
+        """
+        self.file.write(''.join(
+            '<tr><td>' + '</td><td>'.join([self.__cell(cell) for cell in row]) + '</td></tr>' for row in rows
+        ))
+
+    @staticmethod
+    def __cell(value):
+        """
+        :param value: cell value
+        :return: escaped text of cell, numbers and dates have no markup characters to escape
+        """
+        if value is None:
+            return ''
+        if value.__class__ in PLAIN_TYPES:
+            return str(value)
+        return html.escape(str(value), quote=False)
+
+    def close(self, discard=False):
+        """
+        :param discard: export failed, file is removed after it is closed
+        :return: None
+        """
+        if self.file is not None:
+            if not discard:
+                self.file.write('</table>')
+            self.file.close()
+            self.file = None
+
+
+class PdfWriter:
+    FILTER = 'Portable Document Format (*.pdf)'
+
+    def __init__(self, context):
+        """
+        PDF report made by LaTeX, needs optional pylatex package. LaTeX table is built from whole result so rows
+        are kept until writer is closed
+        :param context: shared properties in application
+        """
+        # Snapshot of query details, next query can replace context while export is running
+        self.details = {key: context.xpqe[key] for key in (
+            'execute.server', 'execute.host', 'execute.timestamp', 'execute.xsql', 'execute.sql'
+        )}
+        self.path = None
+        self.header = None
+        self.rows = None
+
+    def open(self, path, header, description=None):
+        """
+        :param path: location of export file
+        :param header: list of column names
+        :param description: cursor.description of query, None when rows come from ResultSet
+        :return: None
+        """
+        self.path = path
+        self.header = list(header)
+        self.rows = list()
+
+    def write(self, rows):
+        """
+        :param rows: list of row tuples
+        :return: None
+        """
+        self.rows.extend(rows)
+
+    def close(self, discard=False):
+        """
+        Generate PDF from collected rows
+        :param discard: export failed, no PDF is generated
+        :return: None
+        """
+        rows, self.rows = self.rows, None
+        if discard or rows is None:
+            return
+        # pylatex is only loaded when PDF is exported
+        from modules.PdfMaker import PdfMaker
+        PdfMaker(self.details, self.header, rows).generate_pdf(self.path)
+
+
+class ExportWorkerSignals(QObject):
+    """
+    Signals emitted by ExportWorker, delivered on GUI thread through queued connections
+    """
+    progress = pyqtSignal(int)
+    rows = pyqtSignal(object, object)
+    finished = pyqtSignal(str, int, float)
+    failed = pyqtSignal(str, object)
+
+
+class ExportWorker(QRunnable):
+    # Seconds between progress signals, keeps GUI thread free while rows are written
+    PROGRESS_INTERVAL = 0.1
+    # Seconds to wait for free connection in pool before giving up
+    ACQUIRE_TIMEOUT = 30
+
+    def __init__(self, engine_manager, writer, path):
+        """
+        Write result of last executed query into file away from GUI thread. Fully fetched result is written
+        from memory, partially streamed read only result is executed again on pooled connection and rows are written
+        straight from its cursor in batches of server.fetchSize, remaining rows of other queries are pulled from
+        their own cursor on worker thread
+        :param engine_manager: object of EngineManager class, provide engines for profile
+        :param writer: object with open(path, header, description), write(rows) and close(discard)
+        :param path: location of export file
+        """
+        super().__init__()
+        self.log = log.getLogger(self.__class__.__name__)
+
+        self.engineManager = engine_manager
+        self.context = engine_manager.context
+        self.writer = writer
+        self.path = path
+        self.engine = None
+        self.cancelRequested = False
+
+        # Snapshot of result, next query can replace context while export is running
+        self.query = self.context.xpqe['execute.sql']
+        self.header = self.context.xpqe['execute.header']
+        self.result = self.context.xpqe['execute.result']
+        self.profileName = None
+        self.resultEngine = None
+        result_engine = self.context.xpqe['execute.engine']
+        if result_engine is not None and not result_engine.exhausted:
+            if self.canStream(result_engine):
+                self.profileName = result_engine.profile.profile
+            else:
+                # Query with side effects must not run again, remaining rows are pulled from its cursor by run()
+                self.resultEngine = result_engine
+
+        self.signals = ExportWorkerSignals()
+
+    @property
+    def total(self):
+        """
+        :return: number of rows to be exported, 0 if unknown before remaining rows are pulled
+        """
+        return 0 if self.profileName is not None or self.resultEngine is not None else len(self.result)
+
+    @staticmethod
+    def canStream(engine):
+        """
+        Check remaining rows of streamed result can be exported by executing query again
+        :param engine: engine of result shown in table
+        :return: True if query is read only else False
+        """
+        return ResultCache.isCacheable(ResultCache.normalize(engine.query))
+
+    def run(self):
+        """
+        Executed by QThreadPool on worker thread, partially written file is removed on failure or cancel
+        :return: None
+        """
+        with Tracer.span('export', 'export', path=self.path, writer=self.writer.__class__.__name__) as span:
+            self.__export(span)
+
+    def __export(self, span):
+        """
+        :param span: Span of export
+        :return: None
+        """
+        start = time.monotonic()
+        rows = 0
+        last_progress = start
+        batches = self.__batches()
+        try:
+            for batch in batches:
+                if self.cancelRequested:
+                    break
+                self.writer.write(batch)
+                rows += len(batch)
+                if time.monotonic() - last_progress >= self.PROGRESS_INTERVAL:
+                    last_progress = time.monotonic()
+                    self.signals.progress.emit(rows)
+            if self.cancelRequested:
+                raise RuntimeError('Export cancelled after {:,} rows'.format(rows))
+            self.writer.close()
+            span.set(rows=rows)
+            self.signals.finished.emit(self.path, rows, time.monotonic() - start)
+        except Exception as e:
+            self.log.error(e)
+            self.writer.close(discard=True)
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            self.signals.failed.emit(self.path, e)
+        finally:
+            # Close cursor of stream before its connection goes back to pool
+            batches.close()
+            engine, self.engine = self.engine, None
+            self.engineManager.releaseEngine(engine)
+
+    def __batches(self):
+        """
+        Open writer and yield row batches of result
+        :return: generator
+        """
+        batch_size = self.context.server['fetchSize']
+        if self.profileName is None:
+            self.writer.open(self.path, self.header, self.result.description)
+            for index in range(0, len(self.result), batch_size):
+                yield self.result[index:index + batch_size]
+            engine = self.resultEngine
+            while engine is not None and not engine.exhausted and not engine.cancelled and not self.cancelRequested:
+                rows = engine.pull(batch_size)
+                # Result shown in table keeps pulled rows, they are appended on GUI thread which notify table model
+                self.signals.rows.emit(self.result, rows)
+                yield rows
+            return
+
+        self.log.info('Executing query again on {} to stream export'.format(self.profileName))
+        self.engine = self.engineManager.acquireEngine(self.profileName, timeout=self.ACQUIRE_TIMEOUT)
+        if self.cancelRequested:
+            return
+        stream = self.engine.stream(self.query)
+        description = next(stream)
+        self.writer.open(self.path, [col[0] for col in description or []], description)
+        yield from stream
+
+    def cancel(self):
+        """
+        Cancel export, called from GUI thread
+        :return: None
+        """
+        self.cancelRequested = True
+        # Remaining rows of result engine are pulled batch by batch, its cursor is kept open for table on cancel
+        if self.engine is not None:
+            # Cancel may need network round trip (MySQL side connection), do not block GUI thread
+            threading.Thread(target=self.__cancelEngine, args=(self.engine,), daemon=True).start()
+
+    def __cancelEngine(self, engine):
+        """
+        :param engine: engine streaming rows of export
+        :return: None
+        """
+        try:
+            engine.cancel()
+        except Exception as e:
+            self.log.error('Unable to cancel export query, {}'.format(e))
@@ -0,0 +1,208 @@
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from PyQt5.QtCore import QObject, QThreadPool, pyqtSignal, pyqtSlot
+
+from logger import log
+from modules.QueryWorker import QueryWorker
+from modules.ResultSet import ResultSet
+from modules.Tracer import Tracer
+
+
+class FanOutRun(QObject):
+    # Name of column added in front of combined result to tag source profile
+    PROFILE_COLUMN = 'profile'
+    MERGE_BATCH = 1000
+
+    done = pyqtSignal(object)
+
+    def __init__(self, engine_manager, profile_names, query, concurrency):
+        """
+        Execute same query on many profiles in parallel and combine their results
+        :param engine_manager: object of EngineManager class
+        :param profile_names: list of profile names on which query need to be executed
+        :param query: SQL query without profile prefix
+        :param concurrency: maximum number of profiles queried at same time
+        """
+        super().__init__(engine_manager)
+        self.log = log.getLogger(self.__class__.__name__)
+
+        self.engineManager = engine_manager
+        self.context = engine_manager.context
+        self.resultTable = engine_manager.resultTable
+        self.profileNames = list(profile_names)
+        self.query = query
+
+        self.threadPool = QThreadPool(self)
+        self.threadPool.setMaxThreadCount(max(1, concurrency))
+
+        self.result = ResultSet([self.PROFILE_COLUMN])
+        self.columnIndex = dict()   # (column name, occurrence in result of profile) -> position in combined result
+        self.report = OrderedDict((profile_name, None) for profile_name in self.profileNames)
+        self.types = set()
+        self.startTime = None
+        self.workers = list()
+
+    @property
+    def pending(self):
+        """
+        :return: number of profiles which are still running
+        """
+        return sum(1 for entry in self.report.values() if entry is None)
+
+    def start(self):
+        """
+        Queue one worker per profile, thread pool keeps concurrency bounded
+        :return: self
+        """
+        self.startTime = time.monotonic()
+        self.context.xpqe['execute.sql'] = self.query
+        for profile_name in self.profileNames:
+            worker = QueryWorker(self.engineManager, profile_name, self.query, fetch_all=True)
+            worker.signals.finished.connect(self.onFinished)
+            worker.signals.failed.connect(self.onFailed)
+            self.workers.append(worker)
+            self.threadPool.start(worker)
+        return self
+
+    def cancel(self):
+        """
+        Cancel all profiles, profiles which are still queued are not executed
+        :return: None
+        """
+        for worker in self.workers:
+            worker.cancel()
+
+    def progressText(self):
+        """
+        :return: progress of fan-out run for status bar
+        """
+        return 'Fan-out on {} profiles, {} done... {:.1f}s'.format(
+            len(self.profileNames), len(self.profileNames) - self.pending, time.monotonic() - self.startTime
+        )
+
+    def merge(self, profile_name, result):
+        """
+        Append rows of one profile into combined result, columns are matched by name and occurrence of name so
+        duplicate column names of join (`a.id, b.id`) keep their own column
+        :param profile_name: source profile
+        :param result: ResultSet of profile
+        :return: None
+        """
+        positions = list()
+        occurrences = dict()
+        for name in result.header:
+            key = (name, occurrences.get(name, 0))
+            occurrences[name] = key[1] + 1
+            if key not in self.columnIndex:
+                self.columnIndex[key] = self.result.addColumn(self.uniqueName(name))
+            positions.append(self.columnIndex[key])
+
+        width = len(self.result.header)
+        batch = list()
+        for row in result:
+            line = [None] * width
+            line[0] = profile_name
+            for position, cell in zip(positions, row):
+                line[position] = cell
+            batch.append(line)
+            if len(batch) >= self.MERGE_BATCH:
+                self.result.append(batch)
+                batch = list()
+        self.result.append(batch)
+
+    def uniqueName(self, name):
+        """
+        Header of combined result keeps names distinct, colliding name get suffix, e.g. `profile_1` next to tag column
+        :param name: column name in result of profile
+        :return: column name in combined result
+        """
+        names = set(self.result.header)
+        label = name
+        suffix = 0
+        while label in names:
+            suffix += 1
+            label = '{}_{}'.format(name, suffix)
+        return label
+
+    @pyqtSlot(str, object, float)
+    def onFinished(self, profile_name, engine, elapsed):
+        """
+        Profile finished, stream its rows into combined result
+        :param profile_name: name of profile
+        :param engine: engine which executed query
+        :param elapsed: seconds taken by profile including connect
+        :return: None
+        """
+        with Tracer.span('merge', 'ui', profile=profile_name, rows=len(engine.result)):
+            self.merge(profile_name, engine.result)
+        self.engineManager.recordMetrics(engine)
+        self.engineManager.expireCache(profile_name, engine.query)
+        self.types.add(engine.profile.type)
+        status = ('TIMEOUT' if engine.timedOut else 'CANCELLED') if engine.cancelled else 'OK'
+        self.report[profile_name] = {'status': status, 'elapsed': elapsed, 'rows': len(engine.result), 'error': None}
+        # All rows are fetched by worker, connection can go back to pool
+        self.engineManager.releaseEngine(engine)
+        self.resultTable.setResult(self.result.header, self.result)
+        self.checkDone()
+
+    @pyqtSlot(str, object, object, float)
+    def onFailed(self, profile_name, engine, error, elapsed):
+        """
+        Profile failed, error is kept for report
+        :param profile_name: name of profile
+        :param engine: engine which executed query, None if it could not be created
+        :param error: Exception raised
+        :param elapsed: seconds taken by profile
+        :return: None
+        """
+        self.log.error('{}: {}'.format(profile_name, error))
+        self.engineManager.recordFailure(profile_name, engine, error)
+        self.report[profile_name] = {'status': 'ERROR', 'elapsed': elapsed, 'rows': 0, 'error': str(error)}
+        self.checkDone()
+
+    def checkDone(self):
+        """
+        Publish combined result when every profile is finished
+        :return: None
+        """
+        if self.pending:
+            return
+
+        self.context.xpqe['execute.sql'] = self.query
+        self.context.xpqe['execute.header'] = self.result.header
+        self.context.xpqe['execute.result'] = self.result
+        self.context.xpqe['execute.engine'] = None
+        self.context.xpqe['execute.server'] = ', '.join(sorted(self.types))
+        self.context.xpqe['execute.host'] = ', '.join(self.profileNames)
+        self.context.xpqe['execute.timestamp'] = str(datetime.fromtimestamp(datetime.now().timestamp()).isoformat())
+
+        failed = [name for name, entry in self.report.items() if entry['status'] != 'OK']
+        self.resultTable.setResult(self.result.header, self.result)
+        self.resultTable.resultCount.setText('Showing {:,} of {:,} records from {} profiles, {} failed in {:.1f}s'.format(
+            min(self.resultTable.maxRenderRecords, len(self.result)), len(self.result),
+            len(self.profileNames) - len(failed), len(failed), time.monotonic() - self.startTime
+        ))
+        self.resultTable.resultCount.setToolTip(self.reportText())
+        self.log.info('Fan-out report\n{}'.format(self.reportText()))
+        self.done.emit(self)
+
+    def reportText(self):
+        """
+        Per profile latency and error report
+        :return: String
+        """
+        lines = list()
+        for profile_name, entry in self.report.items():
+            if entry is None:
+                lines.append('{:<24} RUNNING'.format(profile_name))
+            elif entry['error'] is None:
+                lines.append('{:<24} {:<9} {:>8.3f}s {:>10,} rows'.format(
+                    profile_name, entry['status'], entry['elapsed'], entry['rows']
+                ))
+            else:
+                lines.append('{:<24} {:<9} {:>8.3f}s {}'.format(
+                    profile_name, entry['status'], entry['elapsed'], entry['error']
+                ))
+        return '\n'.join(lines)
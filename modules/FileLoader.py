@@ -0,0 +1,131 @@
+import codecs
+import hashlib
+import mmap
+import os
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from PyQt5.QtGui import QTextCursor
+
+from logger import log
+
+
+class FileLoader(QObject):
+    # Bytes appended to document per event loop iteration
+    CHUNK_SIZE = 256 * 1024
+
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal(str, str)
+
+    def __init__(self, editor, location):
+        """
+        Populate editor from memory mapped file chunk by chunk, GUI keep responding while big file is loading
+        :param editor: object of CodeEditor class
+        :param location: path of file
+        """
+        super().__init__(editor)
+        self.log = log.getLogger(self.__class__.__name__)
+
+        self.editor = editor
+        self.location = location
+        self.file = None
+        self.map = None
+        self.size = 0
+        self.position = 0
+        self.decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        # MD5 of text as it is in editor, same as FileManager hash of whole editor text
+        self.digest = hashlib.md5()
+        self.pendingCR = False
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(0)
+        self.timer.timeout.connect(self.step)
+
+    def start(self):
+        """
+        Clear editor and start loading
+        :return: self
+        """
+        self.size = os.path.getsize(self.location)
+        self.file = open(self.location, 'rb')
+        if self.size:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.log.info('Loading {:,} bytes from {}'.format(self.size, self.location))
+
+        document = self.editor.document()
+        # Undo stack would keep second copy of whole file
+        document.setUndoRedoEnabled(False)
+        self.editor.setReadOnly(True)
+        self.editor.clear()
+        self.timer.start()
+        return self
+
+    def step(self):
+        """
+        Append next chunk at end of document, chunk is cut after last line break so lines are not split
+        :return: None
+        """
+        end = min(self.position + self.CHUNK_SIZE, self.size)
+        if end < self.size:
+            line_break = self.map.rfind(b'\n', self.position, end)
+            if line_break >= 0:
+                end = line_break + 1
+        final = end >= self.size
+        data = self.map[self.position:end] if self.map is not None else b''
+        self.position = end
+
+        # Universal newlines as text mode `open` used for small files
+        text = self.decoder.decode(data, final=final)
+        if self.pendingCR:
+            text = '\r' + text
+        self.pendingCR = not final and text.endswith('\r')
+        if self.pendingCR:
+            text = text[:-1]
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+
+        if text:
+            cursor = QTextCursor(self.editor.document())
+            cursor.movePosition(QTextCursor.End)
+            cursor.insertText(text)
+            self.digest.update(text.encode())
+        self.progress.emit(self.position, self.size)
+
+        if final:
+            self.finish()
+
+    def finish(self):
+        """
+        :return: None
+        """
+        self.timer.stop()
+        self.close()
+        document = self.editor.document()
+        document.setUndoRedoEnabled(True)
+        document.setModified(False)
+        self.editor.setReadOnly(False)
+        cursor = QTextCursor(document)
+        self.editor.setTextCursor(cursor)
+        self.log.info('Loaded {}'.format(self.location))
+        self.finished.emit(self.location, self.digest.hexdigest())
+
+    def cancel(self):
+        """
+        Stop loading, text loaded so far stay in editor
+        :return: None
+        """
+        if self.timer.isActive():
+            self.timer.stop()
+            self.close()
+            self.editor.document().setUndoRedoEnabled(True)
+            self.editor.setReadOnly(False)
+
+    def close(self):
+        """
+        Release memory map and file handle
+        :return: None
+        """
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
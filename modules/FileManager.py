@@ -1,17 +1,131 @@
 import hashlib
+import os
 
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QTimer, pyqtSignal, pyqtSlot
+from PyQt5.QtWidgets import QMessageBox
+
+from logger import log
+from modules.Journal import Journal, write_atomic
+
+
+class DigestWorkerSignals(QObject):
+    """
+    Signals emitted by DigestWorker, delivered on GUI thread through queued connections
+    """
+    finished = pyqtSignal(int, str)
+
+
+class DigestWorker(QRunnable):
+    def __init__(self, string, revision):
+        """
+        Calculate MD5 hash of editor content away from GUI thread
+        :param string: content of editor
+        :param revision: revision of document when content was taken
+        """
+        super().__init__()
+        self.string = string
+        self.revision = revision
+        self.signals = DigestWorkerSignals()
+
+    def run(self):
+        """
+        :return: None
+        """
+        self.signals.finished.emit(self.revision, hashlib.md5(self.string.encode()).hexdigest())
+
+
+class SaveWorkerSignals(QObject):
+    """
+    Signals emitted by SaveWorker, delivered on GUI thread through queued connections
+    """
+    finished = pyqtSignal(str, int, str)
+    failed = pyqtSignal(str, object)
+
+
+class SaveWorker(QRunnable):
+    def __init__(self, string, location, revision):
+        """
+        Write content of editor away from GUI thread, file is replaced atomically so crash never leave it
+        half written
+        :param string: content of editor
+        :param location: path of file
+        :param revision: revision of document when content was taken
+        """
+        super().__init__()
+        self.string = string
+        self.location = location
+        self.revision = revision
+        self.signals = SaveWorkerSignals()
+
+    def run(self):
+        """
+        :return: None
+        """
+        try:
+            write_atomic(self.location, self.string, encoding=None)
+        except OSError as e:
+            self.signals.failed.emit(self.location, e)
+            return
+        self.signals.finished.emit(self.location, self.revision, hashlib.md5(self.string.encode()).hexdigest())
+
+
+class FileManager(QObject):
+    # Seconds after last edit before content is hashed in background, to find edits which restored saved text
+    IDLE_DIGEST_DELAY = 1000
+    # Documents bigger than this many characters are hashed only when answer is really needed
+    IDLE_DIGEST_LIMIT = 4 * 1024 * 1024
+
+    modifiedChanged = pyqtSignal(bool)
+    locationChanged = pyqtSignal(str)
 
-class FileManager:
     def __init__(self, string='', location=None):
         """
-        FileManger class keeps track of current file opened in editor
+        FileManger class keeps track of current file opened in editor. Dirty state comes from
+        QTextDocument.modificationChanged, MD5 of content is only calculated when document is modified
         :param string: content of editor
         :param location: path of current file
         """
+        super().__init__()
+        self.log = log.getLogger(self.__class__.__name__)
         self.hash = None
         self.location = None
+        self.document = None
+        self.journal = None
+        self.saves = dict()     # signals of running SaveWorker -> callback
+
+        # Single thread writes saves one after another, in order they were requested
+        self.saveThreadPool = QThreadPool(self)
+        self.saveThreadPool.setMaxThreadCount(1)
+        self.checked = None     # (revision, modified) of last digest comparison
+
+        self.digestTimer = QTimer(self)
+        self.digestTimer.setSingleShot(True)
+        self.digestTimer.setInterval(self.IDLE_DIGEST_DELAY)
+        self.digestTimer.timeout.connect(self.__idleDigest)
+
         self.reset(string, location)
 
+    @property
+    def modified(self):
+        """
+        :return: True if document has edits since it was loaded/saved, by modification flag only
+        """
+        return self.document is not None and self.document.isModified()
+
+    def attach(self, document):
+        """
+        Track modifications of editor document
+        :param document: object of QTextDocument class of editor
+        :return: None
+        """
+        self.document = document
+        self.document.modificationChanged.connect(self.modifiedChanged)
+        self.document.contentsChanged.connect(self.__contentsChanged)
+        # Journal left by crashed session is kept until it is recovered or declined, recording starts once loaded
+        # content is hashed, see trigger_func.recover_journal
+        self.journal = Journal(document, self)
+        self.journal.location = self.location
+
     def reset(self, string='', location=None):
         """
         When opening new empty file in editor
@@ -19,16 +133,30 @@ class FileManager:
         :param location: location of file
         :return: None
         """
-        self.hash = hashlib.md5(string.encode()).hexdigest()
-        self.location = location
+        self.set_hash(string)
+        self.set_location(location)
 
     def set_hash(self, string):
         """
-        Used to calculate MD5 hash of given string
+        Used to calculate MD5 hash of given string, content is saved/loaded so document is not modified
         :param string: content of editor
         :return: None
         """
-        self.hash = hashlib.md5(string.encode()).hexdigest()
+        self.set_digest(hashlib.md5(string.encode()).hexdigest())
+
+    def set_digest(self, digest):
+        """
+        Used when MD5 hash is calculated while content is loaded, e.g. by FileLoader
+        :param digest: MD5 hex digest of content of editor
+        :return: None
+        """
+        self.hash = digest
+        self.checked = None
+        if self.document is not None:
+            self.document.setModified(False)
+        if self.journal is not None:
+            self.journal.reset(digest, self.location)
+            self.journal.resume()
 
     def set_location(self, location):
         """
@@ -37,6 +165,74 @@ class FileManager:
         :return: None
         """
         self.location = location
+        if self.journal is not None:
+            self.journal.reset(self.hash, location)
+        self.locationChanged.emit(location or '')
+
+    def pause(self):
+        """
+        Stop journaling edits, used before content of editor is replaced by loaded file
+        :return: None
+        """
+        if self.journal is not None:
+            self.journal.pause()
+
+    def save(self, location, callback=None):
+        """
+        Save content of editor on worker thread, editing continue while file is written
+        :param location: Path where file is saved
+        :param callback: called without arguments once file is saved
+        :return: None
+        """
+        worker = SaveWorker(self.document.toPlainText(), location, self.document.revision())
+        worker.signals.finished.connect(self.onSaved)
+        worker.signals.failed.connect(self.onSaveFailed)
+        self.saves[worker.signals] = callback
+        self.saveThreadPool.start(worker)
+
+    @pyqtSlot(str, int, str)
+    def onSaved(self, location, revision, digest):
+        """
+        :param location: Path where file is saved
+        :param revision: revision of document which was saved
+        :param digest: MD5 hex digest of saved content
+        :return: None
+        """
+        callback = self.saves.pop(self.sender(), None)
+        self.log.info('File Saved @ {}'.format(location))
+        if self.document.revision() == revision:
+            self.set_digest(digest)
+            self.set_location(location)
+        else:
+            # Edited while saving, document stay modified and journal hold edits made after save
+            self.hash = digest
+            self.checked = None
+            self.set_location(location)
+            self.journal.resume()
+            self.journal.compact()
+        if callback is not None:
+            callback()
+
+    @pyqtSlot(str, object)
+    def onSaveFailed(self, location, error):
+        """
+        :param location: Path where file was saved
+        :param error: Exception raised
+        :return: None
+        """
+        self.saves.pop(self.sender(), None)
+        self.log.error('Unable to save {}, {}'.format(location, error))
+        QMessageBox.critical(None, 'Save Error', 'Unable to save {}\n{}'.format(location, error))
+
+    def close(self):
+        """
+        Write journaled edits and pending saves before application exit, journal is kept so edits which were not
+        saved can be recovered
+        :return: None
+        """
+        self.saveThreadPool.waitForDone()
+        if self.journal is not None:
+            self.journal.waitForDone()
 
     def compare_hash(self, string):
         """
@@ -45,3 +241,57 @@ class FileManager:
         :return: True if hash matches else False
         """
         return True if self.hash == hashlib.md5(string.encode()).hexdigest() else False
+
+    def is_modified(self):
+        """
+        Check editor content differ from saved content, MD5 is calculated only for modified document and only
+        once per document revision
+        :return: True if content is changed else False
+        """
+        if not self.modified:
+            return False
+        revision = self.document.revision()
+        if self.checked is None or self.checked[0] != revision:
+            self.checked = (revision, not self.compare_hash(self.document.toPlainText()))
+        return self.checked[1]
+
+    def title(self, application):
+        """
+        Window title with file name and modified marker
+        :param application: name of application
+        :return: String
+        """
+        name = os.path.basename(self.location) if self.location else 'Untitled'
+        return '{}{} - {}'.format('*' if self.modified else '', name, application)
+
+    def __contentsChanged(self):
+        """
+        :return: None
+        """
+        if self.modified:
+            self.digestTimer.start()
+
+    def __idleDigest(self):
+        """
+        Editing stopped, hash content in background so edits which restored saved text clear modified marker
+        :return: None
+        """
+        if not self.modified or self.document.characterCount() > self.IDLE_DIGEST_LIMIT:
+            return
+        worker = DigestWorker(self.document.toPlainText(), self.document.revision())
+        worker.signals.finished.connect(self.onDigest)
+        QThreadPool.globalInstance().start(worker)
+
+    @pyqtSlot(int, str)
+    def onDigest(self, revision, digest):
+        """
+        Background hash finished, ignored if document is changed since
+        :param revision: revision of document which was hashed
+        :param digest: MD5 hex digest of content
+        :return: None
+        """
+        if self.document is None or self.document.revision() != revision:
+            return
+        self.checked = (revision, digest != self.hash)
+        if digest == self.hash:
+            self.document.setModified(False)
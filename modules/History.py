@@ -0,0 +1,426 @@
+import os
+import re
+import sqlite3
+from threading import Lock
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from logger import log
+from modules.Metrics import QueryTiming
+from modules.ResultCache import ResultCache
+from modules.Settings import Settings
+
+
+class HistoryEntry:
+    def __init__(self, timing, xsql):
+        """
+        Single executed query as it is stored in history
+        :param timing: object of QueryTiming class
+        :param xsql: XSQL as it was run, with profile prefix
+        """
+        self.started = timing.timestamp
+        self.xsql = xsql or timing.query or ''
+        self.profile = timing.profile
+        self.server = timing.server
+        self.sql = timing.query or ''
+        self.fingerprint = History.fingerprint(self.sql) if self.sql else ''
+        self.status = timing.status
+        self.error = timing.error
+        self.rows = timing.rows
+        self.bytes = timing.bytes
+        self.seconds = timing.total
+        self.phases = [timing.phases[phase] for phase in QueryTiming.PHASES]
+
+
+class HistoryWriteSignals(QObject):
+    """
+    Signals emitted by HistoryWrite, delivered on GUI thread through queued connections
+    """
+    written = pyqtSignal(int)
+    failed = pyqtSignal(object)
+
+
+class HistoryWrite(QRunnable):
+    def __init__(self, history, entry):
+        """
+        Insert entry into history database away from GUI thread
+        :param history: object of History class
+        :param entry: object of HistoryEntry class
+        """
+        super().__init__()
+        self.history = history
+        self.entry = entry
+        self.signals = HistoryWriteSignals()
+
+    def run(self):
+        """
+        :return: None
+        """
+        try:
+            self.signals.written.emit(self.history.insert(self.entry))
+        except sqlite3.Error as e:
+            self.signals.failed.emit(e)
+
+
+class History(QObject):
+    FILE_NAME = 'history.sqlite3'
+    # Most recent distinct statements scanned by fuzzy search
+    FUZZY_SCAN = 50000
+    # Old entries are pruned after this many inserts
+    PRUNE_EVERY = 1000
+
+    SCHEMA = (
+        '''CREATE TABLE IF NOT EXISTS statements (
+            id INTEGER PRIMARY KEY,
+            fingerprint TEXT NOT NULL UNIQUE,
+            last_run REAL
+        )''',
+        '''CREATE TABLE IF NOT EXISTS entries (
+            id INTEGER PRIMARY KEY,
+            started REAL NOT NULL,
+            xsql TEXT NOT NULL,
+            profile TEXT,
+            server TEXT,
+            sql TEXT,
+            statement INTEGER REFERENCES statements(id),
+            status TEXT,
+            error TEXT,
+            rows INTEGER,
+            bytes INTEGER,
+            seconds REAL,
+            connect REAL,
+            execute REAL,
+            fetch REAL,
+            convert REAL,
+            render REAL
+        )''',
+        'CREATE INDEX IF NOT EXISTS entries_statement ON entries (statement, seconds)',
+    )
+    # Trigram index match any substring of 3 or more characters, older SQLite fall back to word index
+    FTS_SCHEMA = (
+        "CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5("
+        "xsql, profile, content='entries', content_rowid='id', tokenize='trigram')",
+        "CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts USING fts5("
+        "xsql, profile, content='entries', content_rowid='id')",
+    )
+
+    # Literals replaced while statements are grouped for statistics
+    LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+    LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+
+    # Emitted on GUI thread with id of entry once it is written / with error when writing failed
+    written = pyqtSignal(int)
+    failed = pyqtSignal(object)
+
+    def __init__(self, path=None, max_entries=500000, parent=None):
+        """
+        Every executed query with its timings, kept in SQLite database next to settings file. Entries are
+        written on background thread, searched with FTS5 full-text index when SQLite has it
+        :param path: location of history database, None for default location
+        :param max_entries: oldest entries beyond this count are removed
+        :param parent: owner QObject
+        """
+        super().__init__(parent)
+        self.log = log.getLogger(self.__class__.__name__)
+
+        self.path = path or os.path.join(os.path.dirname(Settings().fileName()), self.FILE_NAME)
+        self.maxEntries = max_entries
+        self.fts = None             # None until database is opened, then True if FTS5 is available
+        self.trigram = False
+        self.inserts = 0
+        self.reader = None          # connection of GUI thread
+        self.writer = None          # connection of write thread
+        self.lock = Lock()
+
+        # Single thread keeps inserts in order
+        self.threadPool = QThreadPool(self)
+        self.threadPool.setMaxThreadCount(1)
+
+    @classmethod
+    def fingerprint(cls, query):
+        """
+        Normalized statement with literals replaced, same query with different values share fingerprint
+        :param query: SQL query
+        :return: String
+        """
+        return cls.LISTS.sub('(?)', cls.LITERALS.sub('?', ResultCache.normalize(query)))
+
+    def connect(self):
+        """
+        Open database and create tables
+        :return: connection
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        con = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+        con.execute('PRAGMA journal_mode = WAL')
+        con.execute('PRAGMA synchronous = NORMAL')
+        con.create_function('fuzzy', 2, self.fuzzyScore, deterministic=True)
+        with self.lock:
+            if self.fts is None:
+                with con:
+                    for statement in self.SCHEMA:
+                        con.execute(statement)
+                self.fts = False
+                for statement in self.FTS_SCHEMA:
+                    try:
+                        with con:
+                            con.execute(statement)
+                        self.fts = True
+                        break
+                    except sqlite3.OperationalError as e:
+                        self.log.warning('Full-text index is not available, {}'.format(e))
+                if self.fts:
+                    sql = con.execute("SELECT sql FROM sqlite_master WHERE name = 'entries_fts'").fetchone()[0]
+                    self.trigram = 'trigram' in sql
+        return con
+
+    def add(self, timing, xsql=None):
+        """
+        Queue query for writing into history
+        :param timing: object of QueryTiming class
+        :param xsql: XSQL as it was run
+        :return: None
+        """
+        worker = HistoryWrite(self, HistoryEntry(timing, xsql))
+        worker.signals.written.connect(self.written)
+        worker.signals.failed.connect(self.onFailed)
+        self.threadPool.start(worker)
+
+    def onFailed(self, error):
+        """
+        :param error: sqlite3.Error raised while writing
+        :return: None
+        """
+        self.log.error('Unable to write query history, {}'.format(error))
+        self.failed.emit(error)
+
+    def insert(self, entry):
+        """
+        Write entry, called on write thread
+        :param entry: object of HistoryEntry class
+        :return: id of entry
+        """
+        if self.writer is None:
+            self.writer = self.connect()
+        con = self.writer
+        with con:
+            statement = None
+            if entry.fingerprint:
+                con.execute(
+                    'INSERT INTO statements (fingerprint, last_run) VALUES (?, ?) '
+                    'ON CONFLICT (fingerprint) DO UPDATE SET last_run = excluded.last_run',
+                    (entry.fingerprint, entry.started)
+                )
+                statement = con.execute(
+                    'SELECT id FROM statements WHERE fingerprint = ?', (entry.fingerprint,)
+                ).fetchone()[0]
+            cursor = con.execute(
+                'INSERT INTO entries (started, xsql, profile, server, sql, statement, status, error, rows, bytes, '
+                'seconds, connect, execute, fetch, convert, render) VALUES '
+                '(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [entry.started, entry.xsql, entry.profile, entry.server, entry.sql, statement, entry.status,
+                 entry.error, entry.rows, entry.bytes, entry.seconds] + entry.phases
+            )
+            entry_id = cursor.lastrowid
+            if self.fts:
+                con.execute('INSERT INTO entries_fts (rowid, xsql, profile) VALUES (?, ?, ?)',
+                            (entry_id, entry.xsql, entry.profile))
+        self.inserts += 1
+        if self.inserts % self.PRUNE_EVERY == 0:
+            self.prune(con)
+        return entry_id
+
+    def prune(self, con):
+        """
+        Remove oldest entries beyond maxEntries
+        :param con: connection
+        :return: None
+        """
+        last = con.execute('SELECT id FROM entries ORDER BY id DESC LIMIT 1 OFFSET ?', (self.maxEntries,)).fetchone()
+        if last is None:
+            return
+        with con:
+            if self.fts:
+                # External content index need old values to remove them
+                con.execute(
+                    "INSERT INTO entries_fts (entries_fts, rowid, xsql, profile) "
+                    "SELECT 'delete', id, xsql, profile FROM entries WHERE id <= ?", last
+                )
+            con.execute('DELETE FROM entries WHERE id <= ?', last)
+            con.execute('DELETE FROM statements WHERE id NOT IN (SELECT DISTINCT statement FROM entries '
+                        'WHERE statement IS NOT NULL)')
+        self.log.info('Pruned query history to {:,} entries'.format(self.maxEntries))
+
+    def connection(self):
+        """
+        :return: connection used for reading on GUI thread
+        """
+        if self.reader is None:
+            self.reader = self.connect()
+        return self.reader
+
+    def waitForDone(self):
+        """
+        Finish pending writes, called before application quit
+        :return: None
+        """
+        self.threadPool.waitForDone()
+
+    ####################################################################################################################
+    # Search
+
+    COLUMNS = 'e.id, e.started, e.profile, e.status, e.seconds, e.rows, e.xsql, e.statement'
+
+    def search(self, text, limit=200):
+        """
+        Most recent entries matching all words of text, distinct statements matching text as fuzzy subsequence
+        are added when full-text search find less than limit
+        :param text: search text, empty for latest entries
+        :param limit: maximum entries returned
+        :return: list of (id, started, profile, status, seconds, rows, xsql, statement id)
+        """
+        con = self.connection()
+        words = text.split()
+        if not words:
+            return con.execute(
+                'SELECT {} FROM entries e ORDER BY e.id DESC LIMIT ?'.format(self.COLUMNS), (limit,)
+            ).fetchall()
+
+        rows = self.searchText(con, words, limit)
+        if len(rows) < limit:
+            found = {row[0] for row in rows}
+            rows += [row for row in self.searchFuzzy(con, text, limit - len(rows)) if row[0] not in found]
+        return rows
+
+    def searchText(self, con, words, limit):
+        """
+        :param con: connection
+        :param words: list of words, entry must contain all of them
+        :param limit: maximum entries returned
+        :return: list of rows
+        """
+        indexed = [word for word in words if not self.trigram or len(word) >= 3]
+        conditions = list()
+        params = list()
+        if self.fts and indexed:
+            if self.trigram:
+                query = ' AND '.join('"{}"'.format(word.replace('"', '""')) for word in indexed)
+            else:
+                query = ' AND '.join('"{}"*'.format(word.replace('"', '""')) for word in indexed)
+            conditions.append('e.id IN (SELECT rowid FROM entries_fts WHERE entries_fts MATCH ?)')
+            params.append(query)
+        for word in words:
+            if not self.fts or word not in indexed:
+                conditions.append("(e.xsql LIKE ? ESCAPE '\\' OR e.profile LIKE ? ESCAPE '\\')")
+                pattern = '%{}%'.format(word.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_'))
+                params += [pattern, pattern]
+        return con.execute(
+            'SELECT {} FROM entries e WHERE {} ORDER BY e.id DESC LIMIT ?'.format(
+                self.COLUMNS, ' AND '.join(conditions)
+            ), params + [limit]
+        ).fetchall()
+
+    def searchFuzzy(self, con, text, limit):
+        """
+        Latest entry of statements whose fingerprint contain characters of text in order, best match first
+        :param con: connection
+        :param text: search text
+        :param limit: maximum entries returned
+        :return: list of rows
+        """
+        return con.execute(
+            'SELECT {} FROM (SELECT id, fuzzy(?, fingerprint) AS score FROM ('
+            '    SELECT id, fingerprint FROM statements ORDER BY last_run DESC LIMIT ?'
+            ') WHERE score IS NOT NULL ORDER BY score LIMIT ?) s '
+            'JOIN entries e ON e.id = (SELECT MAX(id) FROM entries WHERE statement = s.id) '
+            'ORDER BY s.score, e.id DESC'.format(self.COLUMNS),
+            (text, self.FUZZY_SCAN, limit)
+        ).fetchall()
+
+    @staticmethod
+    def fuzzyScore(pattern, text):
+        """
+        :param pattern: search text
+        :param text: fingerprint of statement
+        :return: characters skipped between matched characters, None if text does not contain pattern in order
+        """
+        if pattern is None or text is None:
+            return None
+        text = text.lower()
+        position = 0
+        score = 0
+        for char in pattern.lower():
+            if char.isspace():
+                continue
+            found = text.find(char, position)
+            if found < 0:
+                return None
+            score += found - position
+            position = found + 1
+        return score
+
+    def entry(self, entry_id):
+        """
+        :param entry_id: id of entry
+        :return: dict of entry, None if it does not exist
+        """
+        con = self.connection()
+        cursor = con.execute('SELECT * FROM entries WHERE id = ?', (entry_id,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return dict(zip([column[0] for column in cursor.description], row))
+
+    def stats(self, statement_id, recent=20):
+        """
+        Latency percentiles of all runs of normalized statement, recent runs compared with all runs show slow
+        regression
+        :param statement_id: id of statement
+        :param recent: number of latest runs compared with all runs
+        :return: dict, None if statement has no successful run
+        """
+        con = self.connection()
+        seconds = [row[0] for row in con.execute(
+            "SELECT seconds FROM entries WHERE statement = ? AND status = 'OK' ORDER BY seconds", (statement_id,)
+        )]
+        if not seconds:
+            return None
+        latest = sorted(row[0] for row in con.execute(
+            "SELECT seconds FROM entries WHERE statement = ? AND status = 'OK' ORDER BY id DESC LIMIT ?",
+            (statement_id, recent)
+        ))
+        fingerprint = con.execute('SELECT fingerprint FROM statements WHERE id = ?', (statement_id,)).fetchone()
+        return {
+            'fingerprint': fingerprint[0] if fingerprint else '',
+            'runs': len(seconds),
+            'p50': self.percentile(seconds, 50),
+            'p90': self.percentile(seconds, 90),
+            'p99': self.percentile(seconds, 99),
+            'max': seconds[-1],
+            'recent': len(latest),
+            'recentP50': self.percentile(latest, 50),
+        }
+
+    @staticmethod
+    def percentile(values, percent):
+        """
+        :param values: sorted list of numbers
+        :param percent: 0 - 100
+        :return: value at percentile, nearest rank
+        """
+        index = max(0, min(len(values) - 1, int(round(percent / 100 * len(values) + 0.5)) - 1))
+        return values[index]
+
+    def clear(self):
+        """
+        Remove all entries
+        :return: None
+        """
+        self.waitForDone()
+        con = self.connection()
+        with con:
+            con.execute('DELETE FROM entries')
+            con.execute('DELETE FROM statements')
+            if self.fts:
+                con.execute("INSERT INTO entries_fts (entries_fts) VALUES ('delete-all')")
+        self.log.info('Query history cleared')
@@ -0,0 +1,307 @@
+import hashlib
+import json
+import os
+import stat
+import tempfile
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QTimer, pyqtSignal, pyqtSlot
+from PyQt5.QtGui import QTextCursor
+
+from logger import log
+from modules.Settings import Settings
+
+# Permission bits of newly created file, temporary file of write_atomic is created private
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+def write_atomic(location, data, encoding='utf-8'):
+    """
+    Write text file through temporary file in same directory and rename, reader never see half written file.
+    Temporary file has unique name so writes of same file from other threads never share it
+    :param location: path of file
+    :param data: content of file
+    :param encoding: encoding of file, None for locale encoding
+    :return: None
+    """
+    fd, temp_location = tempfile.mkstemp(
+        prefix='{}.'.format(os.path.basename(location)), suffix='.tmp', dir=os.path.dirname(location) or '.'
+    )
+    try:
+        with os.fdopen(fd, 'w', encoding=encoding) as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        try:
+            mode = stat.S_IMODE(os.stat(location).st_mode)
+        except FileNotFoundError:
+            mode = 0o666 & ~UMASK
+        os.chmod(temp_location, mode)
+        os.replace(temp_location, location)
+    except BaseException:
+        if os.path.exists(temp_location):
+            os.remove(temp_location)
+        raise
+
+
+class JournalWriteSignals(QObject):
+    """
+    Signals emitted by JournalWrite, delivered on GUI thread through queued connections
+    """
+    failed = pyqtSignal(str, object)
+
+
+class JournalWrite(QRunnable):
+    def __init__(self, location, data, replace=False):
+        """
+        Append records to journal, or replace whole journal when it is compacted
+        :param location: path of journal
+        :param data: String of journal lines, None to delete journal
+        :param replace: True to replace journal atomically else append
+        """
+        super().__init__()
+        self.location = location
+        self.data = data
+        self.replace = replace
+        self.signals = JournalWriteSignals()
+
+    def run(self):
+        """
+        :return: None
+        """
+        try:
+            if self.data is None:
+                if os.path.exists(self.location):
+                    os.remove(self.location)
+            elif self.replace:
+                write_atomic(self.location, self.data)
+            else:
+                with open(self.location, 'a', encoding='utf-8', newline='') as file:
+                    file.write(self.data)
+                    file.flush()
+                    os.fsync(file.fileno())
+        except OSError as e:
+            self.signals.failed.emit(self.location, e)
+
+
+class Journal(QObject):
+    SUFFIX = '.journal'
+    VERSION = 1
+    # Milliseconds edits are buffered before they are written
+    FLUSH_INTERVAL = 2000
+    # Journal bigger than this is replaced by snapshot of document
+    COMPACT_SIZE = 1024 * 1024
+    # Documents bigger than this many characters are never snapshot, their journal only grow
+    SNAPSHOT_LIMIT = 4 * 1024 * 1024
+
+    def __init__(self, document, parent=None):
+        """
+        Crash-safe autosave, every edit of document is appended to journal file next to edited file as
+        `[position, chars removed, inserted text]`. Journal start with header line holding MD5 of saved content
+        so it is replayed only on same content
+        :param document: object of QTextDocument class of editor
+        :param parent: owner QObject
+        """
+        super().__init__(parent)
+        self.log = log.getLogger(self.__class__.__name__)
+
+        self.document = document
+        self.location = None    # path of edited file, None for untitled
+        self.base = None        # MD5 of saved content
+        self.pending = list()   # journal lines not written yet
+        self.size = 0           # bytes in journal file
+        # Nothing is recorded until journal is reset for loaded content
+        self.paused = True
+        self.revision = document.revision()
+
+        # Single thread keeps appends in order
+        self.threadPool = QThreadPool(self)
+        self.threadPool.setMaxThreadCount(1)
+
+        self.flushTimer = QTimer(self)
+        self.flushTimer.setSingleShot(True)
+        self.flushTimer.setInterval(self.FLUSH_INTERVAL)
+        self.flushTimer.timeout.connect(self.flush)
+
+        self.document.contentsChange.connect(self.onContentsChange)
+
+    @classmethod
+    def pathOf(cls, location):
+        """
+        :param location: path of edited file, None for untitled
+        :return: path of journal
+        """
+        if location:
+            return location + cls.SUFFIX
+        return os.path.join(os.path.dirname(Settings().fileName()), 'untitled.xsql' + cls.SUFFIX)
+
+    @property
+    def path(self):
+        """
+        :return: path of journal of current file
+        """
+        return self.pathOf(self.location)
+
+    def pause(self):
+        """
+        Stop recording, used while content is replaced by loading a file
+        :return: None
+        """
+        self.paused = True
+
+    def resume(self):
+        """
+        Start recording again, content of document match base of journal
+        :return: None
+        """
+        self.revision = self.document.revision()
+        self.paused = False
+
+    def reset(self, base, location):
+        """
+        Content is saved, loaded or moved, current journal is deleted and new one is started by next flush
+        :param base: MD5 of saved content
+        :param location: path of file, None for untitled
+        :return: None
+        """
+        self.flushTimer.stop()
+        self.pending = list()
+        self.__submit(JournalWrite(self.path, None))
+        self.base = base
+        self.location = location
+        self.size = 0
+        self.revision = self.document.revision()
+
+    @pyqtSlot(int, int, int)
+    def onContentsChange(self, position, chars_removed, chars_added):
+        """
+        Record edit, format only changes (syntax highlighting) do not change revision and are skipped
+        :param position: position of change
+        :param chars_removed: number of characters removed
+        :param chars_added: number of characters inserted
+        :return: None
+        """
+        if self.paused or self.base is None or self.document.revision() == self.revision:
+            return
+        self.revision = self.document.revision()
+        text = ''
+        if chars_added:
+            cursor = QTextCursor(self.document)
+            cursor.setPosition(position)
+            cursor.setPosition(position + chars_added, QTextCursor.KeepAnchor)
+            text = cursor.selectedText().replace('\u2029', '\n')
+        self.pending.append(json.dumps([position, chars_removed, text], ensure_ascii=False) + '\n')
+        if not self.flushTimer.isActive():
+            self.flushTimer.start()
+
+    def flush(self):
+        """
+        Write buffered edits on journal thread, journal is compacted when it grows too big
+        :return: None
+        """
+        self.flushTimer.stop()
+        if not self.pending:
+            return
+        data = ''.join(self.pending)
+        self.pending = list()
+        if self.size == 0:
+            # Journal left at new location by other session is replaced, not appended
+            data = self.__header() + data
+            self.size = len(data)
+            self.__submit(JournalWrite(self.path, data, replace=True))
+            return
+        if self.size + len(data) > self.COMPACT_SIZE and self.document.characterCount() < self.SNAPSHOT_LIMIT:
+            self.compact()
+            return
+        self.size += len(data)
+        self.__submit(JournalWrite(self.path, data))
+
+    def compact(self):
+        """
+        Replace journal by header and single snapshot of current content
+        :return: None
+        """
+        self.pending = list()
+        self.revision = self.document.revision()
+        data = self.__header() + json.dumps({'snapshot': self.document.toPlainText()}, ensure_ascii=False) + '\n'
+        self.size = len(data)
+        self.log.info('Compacting journal {}'.format(self.path))
+        self.__submit(JournalWrite(self.path, data, replace=True))
+
+    def __header(self):
+        """
+        :return: first line of journal
+        """
+        return json.dumps({'journal': self.VERSION, 'base': self.base, 'location': self.location}) + '\n'
+
+    def __submit(self, writer):
+        """
+        :param writer: object of JournalWrite class
+        :return: None
+        """
+        writer.signals.failed.connect(self.onWriteFailed)
+        self.threadPool.start(writer)
+
+    @pyqtSlot(str, object)
+    def onWriteFailed(self, location, error):
+        """
+        :param location: path of journal
+        :param error: Exception raised
+        :return: None
+        """
+        self.log.error('Unable to write journal {}, {}'.format(location, error))
+
+    def waitForDone(self):
+        """
+        Write buffered edits and wait for journal thread, used before exit
+        :return: None
+        """
+        self.flush()
+        self.threadPool.waitForDone()
+
+    @classmethod
+    def recover(cls, location, document):
+        """
+        Replay journal of file on its saved content
+        :param location: path of file, None for untitled
+        :param document: object of QTextDocument class holding saved content of file
+        :return: recovered content, None if there is no journal for this content or it has no edits
+        """
+        path = cls.pathOf(location)
+        if not os.path.exists(path):
+            return None
+        content = document.toPlainText()
+        logger = log.getLogger(cls.__name__)
+        with open(path, 'r', encoding='utf-8', newline='') as file:
+            lines = file.read().split('\n')
+        try:
+            header = json.loads(lines[0])
+        except ValueError:
+            logger.warning('Journal {} has no header, ignored'.format(path))
+            return None
+        if header.get('base') != hashlib.md5(content.encode()).hexdigest():
+            logger.warning('Journal {} belong to different content, ignored'.format(path))
+            return None
+
+        # Document positions count UTF-16 code units, edits are applied on UTF-16 buffer
+        text = bytearray(content.encode('utf-16-le'))
+        edits = 0
+        for line in lines[1:]:
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Last line can be half written when application died
+                logger.warning('Journal {} is truncated after {} edits'.format(path, edits))
+                break
+            if isinstance(record, dict):
+                text = bytearray(record['snapshot'].encode('utf-16-le'))
+            else:
+                position, chars_removed, inserted = record
+                text[position * 2:(position + chars_removed) * 2] = inserted.encode('utf-16-le')
+            edits += 1
+        if not edits:
+            return None
+        logger.info('Recovered {} edits from journal {}'.format(edits, path))
+        return text.decode('utf-16-le', errors='replace')
@@ -0,0 +1,255 @@
+import bisect
+import json
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from logger import log
+
+
+class QueryTiming:
+    # Phases of single query, in order they happen
+    PHASES = ('connect', 'execute', 'fetch', 'convert', 'render')
+
+    def __init__(self, profile_name, server, query):
+        """
+        Time spent by single query in each phase, measured with monotonic clock
+        :param profile_name: name of profile
+        :param server: server type of profile
+        :param query: SQL query
+        """
+        self.profile = profile_name
+        self.server = server
+        self.query = query
+        self.timestamp = time.time()
+        self.phases = OrderedDict((phase, 0.0) for phase in self.PHASES)
+        self.rows = 0
+        self.bytes = 0
+        self.status = 'OK'      # OK / CANCELLED / TIMEOUT / ERROR
+        self.error = None
+
+    def add(self, phase, seconds):
+        """
+        :param phase: one of PHASES
+        :param seconds: time spent
+        :return: None
+        """
+        self.phases[phase] += seconds
+
+    @property
+    def total(self):
+        """
+        :return: seconds spent in all phases
+        """
+        return sum(self.phases.values())
+
+    def summaryText(self):
+        """
+        Short breakdown for status bar
+        :return: String
+        """
+        return '{:.3f}s = {} | {:,} rows, {}'.format(
+            self.total, ' + '.join('{} {:.3f}'.format(phase, seconds) for phase, seconds in self.phases.items()),
+            self.rows, format_bytes(self.bytes)
+        )
+
+    def toDict(self):
+        """
+        :return: dict written into metrics log
+        """
+        return {
+            'timestamp': round(self.timestamp, 3),
+            'profile': self.profile,
+            'server': self.server,
+            'query': self.query,
+            'status': self.status,
+            'error': self.error,
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'seconds': round(self.total, 6),
+            'phases': {phase: round(seconds, 6) for phase, seconds in self.phases.items()},
+        }
+
+
+class Histogram:
+    # Upper bounds of buckets in seconds, last bucket has no upper bound
+    BOUNDS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+    def __init__(self):
+        """
+        Distribution of observed durations in fixed buckets, memory does not grow with number of observations
+        """
+        self.buckets = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        """
+        :param value: seconds
+        :return: None
+        """
+        self.buckets[bisect.bisect_left(self.BOUNDS, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, percent):
+        """
+        Estimate percentile by linear interpolation inside bucket holding it
+        :param percent: 0 - 100
+        :return: seconds, None if nothing was observed
+        """
+        if not self.count:
+            return None
+        rank = percent / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            if count and seen + count >= rank:
+                low = self.BOUNDS[index - 1] if index > 0 else 0.0
+                high = self.BOUNDS[index] if index < len(self.BOUNDS) else self.max
+                value = low + (high - low) * (rank - seen) / count
+                return min(max(value, self.min), self.max)
+            seen += count
+        return self.max
+
+    @property
+    def mean(self):
+        """
+        :return: seconds, None if nothing was observed
+        """
+        return self.sum / self.count if self.count else None
+
+
+class MetricsRegistry:
+    def __init__(self, log_path=''):
+        """
+        In-process counters and histograms per profile, filled by every executed query
+        :param log_path: JSON lines file receiving timing of every query, empty to not write log
+        """
+        self.log = log.getLogger(self.__class__.__name__)
+
+        self.logPath = log_path
+        self.counters = dict()      # (name, profile) -> number
+        self.histograms = dict()    # (name, profile) -> Histogram
+        self.last = None            # QueryTiming of last finished query
+        self.lock = Lock()
+
+    def increment(self, name, profile_name, value=1):
+        """
+        :param name: name of counter ex: queries
+        :param profile_name: name of profile
+        :param value: amount added
+        :return: None
+        """
+        with self.lock:
+            self.counters[name, profile_name] = self.counters.get((name, profile_name), 0) + value
+
+    def observe(self, name, profile_name, value):
+        """
+        :param name: name of histogram ex: phase.fetch
+        :param profile_name: name of profile
+        :param value: seconds
+        :return: None
+        """
+        with self.lock:
+            histogram = self.histograms.get((name, profile_name))
+            if histogram is None:
+                histogram = self.histograms[name, profile_name] = Histogram()
+            histogram.observe(value)
+
+    def record(self, timing):
+        """
+        Add finished query to counters and histograms of its profile
+        :param timing: object of QueryTiming class
+        :return: None
+        """
+        self.increment('queries', timing.profile)
+        self.increment('rows', timing.profile, timing.rows)
+        self.increment('bytes', timing.profile, timing.bytes)
+        if timing.status != 'OK':
+            self.increment(timing.status.lower(), timing.profile)
+        for phase, seconds in timing.phases.items():
+            self.observe('phase.' + phase, timing.profile, seconds)
+        self.observe('query', timing.profile, timing.total)
+        self.last = timing
+        if self.logPath:
+            self.write(timing)
+
+    def write(self, timing):
+        """
+        Append timing of query into metrics log
+        :param timing: object of QueryTiming class
+        :return: None
+        """
+        try:
+            with open(self.logPath, 'a', encoding='utf-8') as file:
+                file.write(json.dumps(timing.toDict(), default=str) + '\n')
+        except OSError as e:
+            self.log.error('Unable to write metrics log {}, {}'.format(self.logPath, e))
+
+    def counter(self, name, profile_name=None):
+        """
+        :param name: name of counter
+        :param profile_name: name of profile, None for sum of all profiles
+        :return: number
+        """
+        with self.lock:
+            if profile_name is not None:
+                return self.counters.get((name, profile_name), 0)
+            return sum(value for (key, _), value in self.counters.items() if key == name)
+
+    def histogram(self, name, profile_name):
+        """
+        :param name: name of histogram
+        :param profile_name: name of profile
+        :return: Histogram, None if nothing was observed
+        """
+        with self.lock:
+            return self.histograms.get((name, profile_name))
+
+    def profiles(self):
+        """
+        :return: sorted names of profiles having metrics
+        """
+        with self.lock:
+            return sorted({profile_name for _, profile_name in self.counters})
+
+    def reportText(self):
+        """
+        Per profile statistics of all queries run in this session
+        :return: String
+        """
+        lines = ['{:<20} {:>8} {:>7} {:>9} {:>9} {:>9} {:>12} {:>10}'.format(
+            'Profile', 'Queries', 'Errors', 'p50 (s)', 'p95 (s)', 'max (s)', 'Rows', 'Bytes'
+        )]
+        for profile_name in self.profiles():
+            histogram = self.histogram('query', profile_name) or Histogram()
+            lines.append('{:<20} {:>8,} {:>7,} {:>9} {:>9} {:>9} {:>12,} {:>10}'.format(
+                profile_name, self.counter('queries', profile_name), self.counter('error', profile_name),
+                format_seconds(histogram.percentile(50)), format_seconds(histogram.percentile(95)),
+                format_seconds(histogram.max), self.counter('rows', profile_name),
+                format_bytes(self.counter('bytes', profile_name))
+            ))
+        return '\n'.join(lines)
+
+
+def format_seconds(seconds):
+    """
+    :param seconds: float / None
+    :return: String
+    """
+    return '-' if seconds is None else '{:.3f}'.format(seconds)
+
+
+def format_bytes(size):
+    """
+    :param size: number of bytes
+    :return: human readable size ex: 1.5 MB
+    """
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return '{:.0f} {}'.format(size, unit) if unit == 'B' else '{:.1f} {}'.format(size, unit)
+        size /= 1024
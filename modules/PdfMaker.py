@@ -3,12 +3,16 @@ from pylatex.utils import bold
 
 
 class PdfMaker:
-    def __init__(self, context):
+    def __init__(self, details, header, rows):
         """
         Make Export PDF file
-        :param context: shared properties in application
+        :param details: execute.* properties of exported query taken from context
+        :param header: list of column names
+        :param rows: list of row tuples
         """
-        self.context = context
+        self.details = details
+        self.header = header
+        self.rows = rows
         self.document = None
 
         self.create()
@@ -33,26 +37,26 @@ class PdfMaker:
         with self.document.create(Section('Server Info')) as server_info:
             with server_info.create(Tabu('||X|X||')) as table:
                 table.add_hline()
-                table.add_row(['Server', self.context.xpqe['execute.server']])
+                table.add_row(['Server', self.details['execute.server']])
                 table.add_hline()
-                table.add_row(['Host', self.context.xpqe['execute.host']])
+                table.add_row(['Host', self.details['execute.host']])
                 table.add_hline()
-                table.add_row(['Execution Timestamp', self.context.xpqe['execute.timestamp']])
+                table.add_row(['Execution Timestamp', self.details['execute.timestamp']])
                 table.add_hline()
 
         with self.document.create(Section('XSQL Query')) as xsql:
-            xsql.append(Command('texttt', self.context.xpqe['execute.xsql']))
+            xsql.append(Command('texttt', self.details['execute.xsql']))
 
         with self.document.create(Section('SQL Query')) as xsql:
-            xsql.append(Command('texttt', self.context.xpqe['execute.sql']))
+            xsql.append(Command('texttt', self.details['execute.sql']))
 
-        col_names = self.context.xpqe['execute.header']
+        col_names = self.header
 
         with self.document.create(Section('Result Table')) as result:
             with result.create(LongTabu('|' + '|'.join(['X'] * len(col_names)) + '|')) as table:
                 table.add_hline()
                 table.add_row(col_names, mapper=[bold])
-                for row in self.context.xpqe['execute.result']:
+                for row in self.rows:
                     # cells = row.items()
                     table.add_hline()
                     table.add_row(['' if cell is None else cell for cell in row])
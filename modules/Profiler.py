@@ -1,4 +1,10 @@
-from PyQt5.QtCore import QSettings
+import bisect
+import fnmatch
+from collections.abc import Sequence
+from threading import RLock
+from urllib.parse import quote, unquote
+
+from PyQt5.QtCore import QSettings, pyqtSignal
 
 from logger import log
 
@@ -31,18 +37,117 @@ class Profile:
         return 'Profile Object: {profile} @ {type}'.format(profile=self.profile, type=self.type)
 
 
+class ProfileList(Sequence):
+    def __init__(self, profiler):
+        """
+        Read only view of profiles ordered by name, profile details are loaded only when item is accessed
+        :param profiler: object of Profiler class
+        """
+        self.profiler = profiler
+
+    def __len__(self):
+        return len(self.profiler.names)
+
+    def __getitem__(self, index):
+        with self.profiler.lock:
+            if isinstance(index, slice):
+                return [self.profiler.getProfile(name) for name in self.profiler.names[index]]
+            return self.profiler.getProfile(self.profiler.names[index])
+
+    def __repr__(self):
+        return 'ProfileList: {} profiles'.format(len(self))
+
+
 class Profiler(QSettings):
+    # Every profile is kept in its own group `profiles/<name>`, edits only rewrite keys of that profile
+    GROUP = 'profiles'
+    FIELDS = ('type', 'host', 'port', 'database', 'username', 'password')
+    # Key of previous layout, single pickled list of all profiles
+    LEGACY_KEY = 'profiler'
+
+    # Profiles available without configuration, used for offline work and benchmarks, stored profile of same
+    # name take precedence
+    BUILTIN = {
+        'local': ('SQLite', ':memory:'),
+        'local_duckdb': ('DuckDB', ':memory:'),
+    }
+
+    # Emitted with profile name when existing profile is edited or removed
+    profileChanged = pyqtSignal(str)
+
     def __init__(self):
         """
-        Store all profile in single file and manages
+        Store all profile in single file and manages, only profile names are read at start, details of profile
+        are loaded on first use
         """
         super().__init__('profiler.ini', QSettings.IniFormat)
         self.log = log.getLogger(self.__class__.__name__)
+        # Group of QSettings is state of this object, profiles are looked up from worker threads too
+        self.lock = RLock()
 
         self.setFallbacksEnabled(False)
         self.log.info(self.fileName())
 
-        self.list = self.value('profiler', [], list)
+        if self.contains(self.LEGACY_KEY):
+            self.migrate()
+
+        self.beginGroup(self.GROUP)
+        self.names = sorted(unquote(group) for group in self.childGroups())
+        self.endGroup()
+        # name -> Profile, None until details are loaded
+        self.profiles = dict.fromkeys(self.names)
+        self.list = ProfileList(self)
+
+    def migrate(self):
+        """
+        Move profiles from previous single list layout into per profile groups
+        :return: None
+        """
+        with self.lock:
+            profiles = self.value(self.LEGACY_KEY, [], list)
+            self.log.info('Migrating {} profiles to per profile layout'.format(len(profiles)))
+            for profile in profiles:
+                self.writeProfile(profile)
+            self.remove(self.LEGACY_KEY)
+            self.sync()
+
+    def readProfile(self, profile_name):
+        """
+        Load details of profile from file
+        :param profile_name: name of profile
+        :return: Profile
+        """
+        with self.lock:
+            self.beginGroup('{}/{}'.format(self.GROUP, quote(profile_name, safe='')))
+            values = {field: self.value(field) for field in self.FIELDS}
+            self.endGroup()
+            return Profile(
+                profile_name, values['type'], host=values['host'], port=values['port'], database=values['database'],
+                username=values['username'], password=values['password']
+            )
+
+    def writeProfile(self, profile):
+        """
+        Write details of single profile into file
+        :param profile: object of Profile
+        :return: None
+        """
+        with self.lock:
+            self.beginGroup('{}/{}'.format(self.GROUP, quote(profile.profile, safe='')))
+            for field in self.FIELDS:
+                self.setValue(field, getattr(profile, field))
+            self.endGroup()
+
+    def deleteProfile(self, profile_name):
+        """
+        Remove profile from file and index
+        :param profile_name: name of profile
+        :return: None
+        """
+        with self.lock:
+            self.remove('{}/{}'.format(self.GROUP, quote(profile_name, safe='')))
+            del self.profiles[profile_name]
+            del self.names[bisect.bisect_left(self.names, profile_name)]
 
     def getProfile(self, profile_name):
         """
@@ -50,47 +155,85 @@ class Profiler(QSettings):
         :param profile_name: name of profile
         :return: Profile / None
         """
-        if self.checkProfileName(profile_name=profile_name):
-            for profile in self.list:
-                if profile.profile == profile_name:
-                    return profile
-            return None
-        else:
-            return None
+        with self.lock:
+            if profile_name not in self.profiles:
+                if profile_name in self.BUILTIN:
+                    profile_type, database = self.BUILTIN[profile_name]
+                    return Profile(profile_name, profile_type, database=database)
+                return None
+            profile = self.profiles[profile_name]
+            if profile is None:
+                profile = self.profiles[profile_name] = self.readProfile(profile_name)
+            return profile
+
+    def findProfiles(self, patterns):
+        """
+        Get names of profiles matching any of given names or glob patterns
+        :param patterns: list of profile names / glob patterns ex: ['shard01', 'reports*']
+        :return: list of profile names
+        """
+        with self.lock:
+            names = list()
+            found = set()
+            for pattern in patterns:
+                pattern = pattern.strip().lower()
+                if pattern in self.profiles:
+                    matches = [pattern]
+                else:
+                    matches = [name for name in self.names if fnmatch.fnmatchcase(name, pattern)]
+                for name in matches:
+                    if name not in found:
+                        found.add(name)
+                        names.append(name)
+            return names
 
     def save(self):
         """
         Hard save all profiles into file
         :return: None
         """
-        self.setValue('profiler', self.list)
+        with self.lock:
+            self.sync()
 
     def addProfile(self, profile):
         """
         Add new profile to profiler
         :param profile: object of Profie which need to added
-        :return: None
+        :return: Boolean
         """
-        if not self.checkProfileName(profile=profile):
-            self.list.append(profile)
-            self.setValue('profiler', self.list)
-            self.log.info('New profile added')
-        else:
-            self.log.error("Profile Name already exist")
+        with self.lock:
+            if not self.checkProfileName(profile=profile):
+                self.writeProfile(profile)
+                self.profiles[profile.profile] = profile
+                bisect.insort(self.names, profile.profile)
+                self.log.info('New profile added')
+                return True
+            else:
+                self.log.error("Profile Name already exist")
+                return False
 
     def editProfile(self, profile_name, profile):
         """
-        Replace existing profile with given new profile object
+        Replace existing profile with given new profile object, renaming onto other existing profile is rejected
         :param profile_name: name of profile to identify profile which need to replaced by given profile
         :param profile: Profile object which need to be replaced with existing profile
-        :return: None
+        :return: Boolean
         """
-        if self.checkProfileName(profile_name=profile_name):
-            index = self.getProfileIndex(profile_name=profile_name)
-            self.list[index] = profile
-            self.setValue('profiler', self.list)
-        else:
-            self.log.error("Given profile/profile_name doesn't exist")
+        with self.lock:
+            if not self.checkProfileName(profile_name=profile_name):
+                self.log.error("Given profile/profile_name doesn't exist")
+                return False
+            if profile.profile != profile_name and self.checkProfileName(profile=profile):
+                self.log.error('Profile Name already exist')
+                return False
+            if profile.profile != profile_name:
+                self.deleteProfile(profile_name)
+                bisect.insort(self.names, profile.profile)
+            self.writeProfile(profile)
+            self.profiles[profile.profile] = profile
+        # Emitted outside lock, slots close pools under their own lock which workers hold while looking up profile
+        self.profileChanged.emit(profile_name)
+        return True
 
     def removeProfile(self, index):
         """
@@ -98,13 +241,14 @@ class Profiler(QSettings):
         :param index: index of profile in profiler
         :return: Boolean
         """
-        if index < len(self.list):
-            del self.list[index]
-            self.setValue('profiler', self.list)
-            return True
-        else:
-            self.log.error('Index out of range, Unable to remove profile')
-            return False
+        with self.lock:
+            if index >= len(self.names):
+                self.log.error('Index out of range, Unable to remove profile')
+                return False
+            profile_name = self.names[index]
+            self.deleteProfile(profile_name)
+        self.profileChanged.emit(profile_name)
+        return True
 
     def getProfileIndex(self, profile=None, profile_name=None):
         """
@@ -113,13 +257,15 @@ class Profiler(QSettings):
         :param profile_name: name of Profile
         :return: int
         """
-        if profile:
-            return self.list.index(profile)
-        elif profile_name:
-            return [_profile.profile for _profile in self.list].index(profile_name)
-        else:
-            self.log.error("No Profile object or Profile Name is passed to compare")
-            return -1
+        with self.lock:
+            if profile:
+                profile_name = profile.profile
+            elif not profile_name:
+                self.log.error("No Profile object or Profile Name is passed to compare")
+                return -1
+            if profile_name not in self.profiles:
+                raise ValueError('{} is not in profiler'.format(profile_name))
+            return bisect.bisect_left(self.names, profile_name)
 
     def checkProfileName(self, profile=None, profile_name=None):
         """
@@ -128,15 +274,13 @@ class Profiler(QSettings):
         :param profile_name: name of profile
         :return: Boolean
         """
-        if profile:
-            profile_name = profile.profile
-        elif profile_name:
-            profile_name = profile_name
-        else:
-            self.log.error("No Profile object or Profile Name is passed to compare")
-            return False
-
-        if profile_name in [profile.profile for profile in self.list]:
-            return True
-        else:
-            return False
+        with self.lock:
+            if profile:
+                profile_name = profile.profile
+            elif profile_name:
+                profile_name = profile_name
+            else:
+                self.log.error("No Profile object or Profile Name is passed to compare")
+                return False
+
+            return profile_name in self.profiles
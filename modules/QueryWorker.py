@@ -0,0 +1,132 @@
+import threading
+import time
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+from logger import log
+from modules.Tracer import Tracer
+
+
+class QueryWorkerSignals(QObject):
+    """
+    Signals emitted by QueryWorker, delivered on GUI thread through queued connections
+    """
+    progress = pyqtSignal(str, str)
+    finished = pyqtSignal(str, object, float)
+    failed = pyqtSignal(str, object, object, float)
+
+
+class QueryWorker(QRunnable):
+    # Seconds client wait after statement timeout before cancelling query itself
+    TIMEOUT_GRACE = 1
+
+    def __init__(self, engine_manager, profile_name, query, fetch_all=False):
+        """
+        Run connect, execute and fetch of single query away from GUI thread
+        :param engine_manager: object of EngineManager class, provide engines for profile
+        :param profile_name: name of profile on which query need to be executed
+        :param query: SQL query without profile prefix
+        :param fetch_all: pull all rows on worker thread instead of only rows rendered by result table
+        """
+        super().__init__()
+        self.log = log.getLogger(self.__class__.__name__)
+
+        self.engineManager = engine_manager
+        self.profileName = profile_name
+        self.query = query
+        self.fetchAll = fetch_all
+        self.engine = None
+        self.cancelRequested = False
+        self.queuedAt = time.perf_counter()
+
+        self.signals = QueryWorkerSignals()
+
+    def run(self):
+        """
+        Executed by QThreadPool on worker thread, engine is checked out from connection pool of profile and
+        released by EngineManager once its result is no longer needed
+        :return: None
+        """
+        # Time spent waiting for free thread of pool
+        Tracer.complete('queued', self.queuedAt, time.perf_counter(), args={'profile': self.profileName})
+        with Tracer.span('query', profile=self.profileName) as span:
+            self.__run(span)
+
+    def __run(self, span):
+        """
+        :param span: Span of query
+        :return: None
+        """
+        engine = None
+        start = time.monotonic()
+        try:
+            self.signals.progress.emit(self.profileName, 'Connecting')
+            with Tracer.span('connect', profile=self.profileName):
+                engine = self.engineManager.acquireEngine(self.profileName)
+            connect = time.monotonic() - start
+            if engine is None:
+                raise RuntimeError('Unable to create engine for profile: {}'.format(self.profileName))
+            self.engine = engine
+            if self.cancelRequested:
+                raise RuntimeError('Query cancelled before execution on profile: {}'.format(self.profileName))
+
+            # Client-side timeout, fired little after server-side timeout which should normally stop query
+            timeout = self.engineManager.context.statementTimeout(self.profileName)
+            watchdog = None
+            if timeout > 0:
+                watchdog = threading.Timer(timeout + self.TIMEOUT_GRACE, self.__timeout)
+                watchdog.daemon = True
+                watchdog.start()
+
+            self.signals.progress.emit(self.profileName, 'Executing')
+            try:
+                success = engine.sql(self.query)
+                if success and self.fetchAll:
+                    self.signals.progress.emit(self.profileName, 'Fetching')
+                    engine.fetch()
+            finally:
+                if watchdog:
+                    watchdog.cancel()
+                if engine.timing is not None:
+                    # Waiting for free connection or connecting to server
+                    engine.timing.add('connect', connect)
+
+            span.set(rows=len(engine.result), status='OK' if success else 'ERROR')
+            if success:
+                self.signals.finished.emit(self.profileName, engine, time.monotonic() - start)
+            else:
+                self.engineManager.releaseEngine(engine)
+                self.signals.failed.emit(self.profileName, engine, engine.error, time.monotonic() - start)
+        except Exception as e:
+            self.log.error(e)
+            self.engineManager.releaseEngine(engine)
+            self.signals.failed.emit(self.profileName, engine, e, time.monotonic() - start)
+
+    def cancel(self):
+        """
+        Cancel query of this worker, called from GUI thread
+        :return: None
+        """
+        self.cancelRequested = True
+        if self.engine is not None:
+            # Cancel may need network round trip (MySQL side connection), do not block GUI thread
+            threading.Thread(target=self.__cancelEngine, args=(self.engine, False), daemon=True).start()
+
+    def __timeout(self):
+        """
+        Client-side statement timeout expired
+        :return: None
+        """
+        self.log.warning('Statement timeout on profile: {}'.format(self.profileName))
+        self.__cancelEngine(self.engine, True)
+
+    def __cancelEngine(self, engine, timed_out):
+        """
+        :param engine: engine running query
+        :param timed_out: True when cancelled by timeout
+        :return: None
+        """
+        try:
+            engine.cancel(timed_out=timed_out)
+        except Exception as e:
+            self.log.error('Unable to cancel query, {}'.format(e))
@@ -0,0 +1,193 @@
+import re
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from logger import log
+
+
+class CacheEntry:
+    def __init__(self, result, query, server, host, timestamp):
+        """
+        Cached result of single query
+        :param result: object of ResultSet class, must be fully fetched
+        :param query: SQL query as it was executed
+        :param server: server type of profile
+        :param host: server host of profile
+        :param timestamp: execution timestamp of cached result
+        """
+        self.result = result
+        self.query = query
+        self.server = server
+        self.host = host
+        self.timestamp = timestamp
+        self.created = time.monotonic()
+        self.nbytes = result.nbytes
+
+
+class ResultCache:
+    # Statements whose result depends only on data, anything else is never cached
+    READ_KEYWORDS = ('select', 'show', 'desc', 'describe', 'explain', 'values', 'table', 'with')
+    WRITE_PATTERN = re.compile(r'\b(insert|update|delete|merge|replace|into|create|alter|drop|truncate|grant|'
+                               r'revoke|lock|call|nextval|setval|for\s+update|for\s+share)\b')
+    # Statements changing default database / schema of session, same query read other tables after them
+    SCOPE_PATTERN = re.compile(r'(use|set\s+((session|local)\s+)?(search_path|schema))\b')
+    # Quoted literal or identifier, backslash escape next character inside string literals
+    LITERAL_PATTERN = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`", re.DOTALL)
+
+    def __init__(self, ttl=300, max_bytes=64 * 1024 * 1024):
+        """
+        LRU cache of query results keyed by profile, its last USE / SET search_path and normalized SQL
+        :param ttl: seconds after which entry expire
+        :param max_bytes: memory budget of all cached results
+        """
+        self.log = log.getLogger(self.__class__.__name__)
+
+        self.ttl = ttl
+        self.maxBytes = max_bytes
+        self.entries = OrderedDict()    # least recently used first
+        self.scopes = dict()            # profile name -> normalized USE / SET search_path last run on it
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = Lock()
+
+    @staticmethod
+    def normalize(query):
+        """
+        Collapse whitespace and lower case SQL outside of quoted literals and identifiers
+        :param query: SQL query
+        :return: normalized SQL
+        """
+        parts = list()
+        quote = None
+        escaped = False
+        space = False
+        for char in query.strip().rstrip(';').strip():
+            if quote:
+                parts.append(char)
+                if escaped:
+                    escaped = False
+                elif char == '\\' and quote != '`':
+                    escaped = True
+                elif char == quote:
+                    quote = None
+            elif char in '\'"`':
+                if space:
+                    parts.append(' ')
+                    space = False
+                quote = char
+                parts.append(char)
+            elif char.isspace():
+                space = len(parts) > 0
+            else:
+                if space:
+                    parts.append(' ')
+                    space = False
+                parts.append(char.lower())
+        return ''.join(parts)
+
+    @classmethod
+    def isCacheable(cls, normalized):
+        """
+        Detect read only statement
+        :param normalized: normalized SQL
+        :return: True if result of statement can be cached else False
+        """
+        words = normalized.split(None, 1)
+        if not words or words[0] not in cls.READ_KEYWORDS:
+            return False
+        # Literals are removed so keyword inside string does not block caching
+        return cls.WRITE_PATTERN.search(cls.LITERAL_PATTERN.sub('', normalized)) is None
+
+    def track(self, profile_name, normalized):
+        """
+        Statement ran on profile, USE / SET search_path change namespace in which following queries are cached
+        :param profile_name: name of profile
+        :param normalized: normalized SQL
+        :return: None
+        """
+        if self.SCOPE_PATTERN.match(normalized):
+            with self.lock:
+                self.scopes[profile_name] = normalized
+
+    def key(self, profile_name, normalized):
+        """
+        :param profile_name: name of profile
+        :param normalized: normalized SQL
+        :return: (profile_name, namespace statement, normalized SQL)
+        """
+        return profile_name, self.scopes.get(profile_name), normalized
+
+    def get(self, profile_name, normalized):
+        """
+        Lookup cached result, counts hit/miss
+        :param profile_name: name of profile
+        :param normalized: normalized SQL
+        :return: CacheEntry / None
+        """
+        with self.lock:
+            key = self.key(profile_name, normalized)
+            entry = self.entries.get(key)
+            if entry is not None and time.monotonic() - entry.created > self.ttl:
+                self.__remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, profile_name, normalized, entry):
+        """
+        Add result to cache, least recently used entries are evicted to stay in memory budget
+        :param profile_name: name of profile
+        :param normalized: normalized SQL
+        :param entry: object of CacheEntry class
+        :return: True if entry is cached else False
+        """
+        if entry.nbytes > self.maxBytes:
+            self.log.info('Result of {} bytes is bigger than cache budget, not cached'.format(entry.nbytes))
+            return False
+        with self.lock:
+            key = self.key(profile_name, normalized)
+            if key in self.entries:
+                self.__remove(key)
+            while self.entries and self.bytes + entry.nbytes > self.maxBytes:
+                self.__remove(next(iter(self.entries)))
+            self.entries[key] = entry
+            self.bytes += entry.nbytes
+        return True
+
+    def invalidate(self, profile_name=None, scope=False):
+        """
+        Drop cached results of given profile, or of all profiles
+        :param profile_name: name of profile, None to clear whole cache
+        :param scope: also forget USE / SET search_path of profile, its connections are opened again
+        :return: None
+        """
+        with self.lock:
+            if scope:
+                for name in [name for name in self.scopes if profile_name is None or name == profile_name]:
+                    del self.scopes[name]
+            for key in [key for key in self.entries if profile_name is None or key[0] == profile_name]:
+                self.__remove(key)
+
+    def __remove(self, key):
+        """
+        :param key: (profile_name, namespace statement, normalized SQL)
+        :return: None
+        """
+        entry = self.entries.pop(key)
+        self.bytes -= entry.nbytes
+
+    def statusText(self, hit=None):
+        """
+        Cache indicator for status bar
+        :param hit: True if last query was served from cache, False if not, None if unknown
+        :return: String
+        """
+        return 'Cache{}: {:,} hits / {:,} misses'.format(
+            '' if hit is None else (' HIT' if hit else ' MISS'), self.hits, self.misses
+        )
@@ -0,0 +1,230 @@
+from array import array
+
+
+class ResultColumn:
+    # Storage kind of column, decided by first not NULL value
+    INT = 'int'          # array('q')
+    FLOAT = 'float'      # array('d')
+    STRING = 'string'    # dictionary encoded, array('I') of codes into values
+    OBJECT = 'object'    # plain list, used for every other type (Decimal, datetime, bytes, ...)
+
+    INT_MIN = -2 ** 63
+    INT_MAX = 2 ** 63 - 1
+
+    def __init__(self):
+        """
+        Compact storage of single column of result, NULLs are tracked in a bitmap
+        """
+        self.kind = None
+        self.data = None
+        self.values = None      # dictionary of STRING column
+        self.lookup = None      # value -> code of STRING column
+        self.nulls = bytearray()
+        self.nullCount = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        """
+        Decode value of given row
+        :param index: row number
+        :return: cell value
+        """
+        if index < 0:
+            index += self.size
+        if index < 0 or index >= self.size:
+            raise IndexError('ResultColumn index out of range')
+        if self.nullCount and self.nulls[index >> 3] & (1 << (index & 7)):
+            return None
+        if self.kind == self.STRING:
+            return self.values[self.data[index]]
+        return self.data[index]
+
+    def isNull(self, index):
+        """
+        :param index: row number
+        :return: True if cell is NULL else False
+        """
+        return bool(self.nullCount and self.nulls[index >> 3] & (1 << (index & 7)))
+
+    def __start(self, value):
+        """
+        Decide storage kind from first not NULL value, NULLs seen before are back-filled
+        :param value: first not NULL value of column
+        :return: None
+        """
+        value_type = type(value)
+        if value_type is int and self.INT_MIN <= value <= self.INT_MAX:
+            self.kind = self.INT
+            self.data = array('q', bytes(8 * self.size))
+        elif value_type is float:
+            self.kind = self.FLOAT
+            self.data = array('d', bytes(8 * self.size))
+        elif value_type is str:
+            self.kind = self.STRING
+            self.data = array('I', bytes(4 * self.size))
+            self.values = ['']
+            self.lookup = {'': 0}
+        else:
+            self.kind = self.OBJECT
+            self.data = [None] * self.size
+
+    def __promote(self):
+        """
+        Column got value which does not fit in its typed storage, fallback to plain list
+        :return: None
+        """
+        self.data = [self[index] for index in range(self.size)]
+        self.kind = self.OBJECT
+        self.values = None
+        self.lookup = None
+
+    def extend(self, values):
+        """
+        Append values of one fetched batch
+        :param values: sequence of cell values
+        :return: None
+        """
+        needed = (self.size + len(values) + 7) >> 3
+        if needed > len(self.nulls):
+            self.nulls.extend(bytes(needed - len(self.nulls)))
+
+        nulls = self.nulls
+        for value in values:
+            index = self.size
+            if value is None:
+                nulls[index >> 3] |= 1 << (index & 7)
+                self.nullCount += 1
+                if self.data is not None:
+                    self.data.append(None if self.kind == self.OBJECT else 0)
+                self.size += 1
+                continue
+
+            if self.kind is None:
+                self.__start(value)
+
+            kind = self.kind
+            value_type = type(value)
+            if kind == self.INT:
+                if value_type is int and self.INT_MIN <= value <= self.INT_MAX:
+                    self.data.append(value)
+                else:
+                    self.__promote()
+                    self.data.append(value)
+            elif kind == self.FLOAT:
+                if value_type is float:
+                    self.data.append(value)
+                else:
+                    self.__promote()
+                    self.data.append(value)
+            elif kind == self.STRING:
+                if value_type is str:
+                    code = self.lookup.get(value)
+                    if code is None:
+                        code = len(self.values)
+                        self.lookup[value] = code
+                        self.values.append(value)
+                    self.data.append(code)
+                else:
+                    self.__promote()
+                    self.data.append(value)
+            else:
+                self.data.append(value)
+            self.size += 1
+
+    @property
+    def nbytes(self):
+        """
+        Approximate memory used by column
+        :return: int
+        """
+        size = len(self.nulls)
+        if self.kind in (self.INT, self.FLOAT, self.STRING):
+            size += self.data.itemsize * len(self.data)
+        if self.kind == self.STRING:
+            size += sum(len(value) for value in self.values) + 8 * len(self.values)
+        elif self.kind == self.OBJECT:
+            size += 8 * len(self.data) + sum(len(str(value)) for value in self.data if value is not None)
+        return size
+
+
+class ResultSet:
+    def __init__(self, header, description=None):
+        """
+        Columnar store of query result, single copy shared by result table, exports and clipboard
+        :param header: list of column names
+        :param description: cursor.description of query, gives column types to typed exports
+        """
+        self.header = list(header)
+        self.description = description
+        self.columns = [ResultColumn() for _ in self.header]
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        """
+        Iterate rows as tuples
+        :return: generator
+        """
+        columns = self.columns
+        for index in range(self.size):
+            yield tuple([column[index] for column in columns])
+
+    def __getitem__(self, index):
+        """
+        Row as tuple, slice return list of row tuples
+        :param index: row number or slice
+        :return: tuple / list
+        """
+        if isinstance(index, slice):
+            return [self[itr] for itr in range(*index.indices(self.size))]
+        if index < 0:
+            index += self.size
+        if index < 0 or index >= self.size:
+            raise IndexError('ResultSet index out of range')
+        return tuple([column[index] for column in self.columns])
+
+    def append(self, rows):
+        """
+        Append one fetched batch of rows
+        :param rows: sequence of row tuples as returned by cursor.fetchmany
+        :return: None
+        """
+        if not rows:
+            return
+        for column, values in zip(self.columns, zip(*rows)):
+            column.extend(values)
+        self.size += len(rows)
+
+    def addColumn(self, name):
+        """
+        Add new column, rows already in result get NULL for it
+        :param name: column name
+        :return: index of new column
+        """
+        column = ResultColumn()
+        column.extend([None] * self.size)
+        self.header.append(name)
+        self.columns.append(column)
+        return len(self.columns) - 1
+
+    def value(self, row, column):
+        """
+        Value of single cell without building row tuple
+        :param row: row number
+        :param column: column number
+        :return: cell value
+        """
+        return self.columns[column][row]
+
+    @property
+    def nbytes(self):
+        """
+        Approximate memory used by result
+        :return: int
+        """
+        return sum(column.nbytes for column in self.columns)
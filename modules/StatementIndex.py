@@ -0,0 +1,481 @@
+import re
+from operator import attrgetter
+
+from PyQt5.QtCore import QObject
+from PyQt5.QtGui import QTextCursor
+
+from logger import log
+
+
+# How statement ended
+DELIMITER = 1   # by delimiter, `;` unless changed by `DELIMITER` command
+PREFIX = 2      # by `@profile:` prefix at start of next line
+
+# Whitespace and comments before statement
+SKIP = re.compile(r'(?:\s+|--[^\n]*|/\*[\s\S]*?(?:\*/|\Z))*')
+# MySQL client command, valid only at start of statement and ends at end of line
+DELIMITER_COMMAND = re.compile(r'DELIMITER[ \t]+(\S+)[^\n]*', re.IGNORECASE)
+# `@profile:`, `@profile!:` and fan-out `@shard01,shard02:` / `@shards*:`, `@var:=` is MySQL assignment
+PROFILE = r'@([^\s:@;\'"`][^\n:@;\'"`]*):(?!=)'
+PREFIX_MATCH = re.compile(PROFILE)
+# Rest of quoted text after its opening quote, quote is escaped by backslash or by doubling it
+CLOSE = {
+    "'": re.compile(r"(?:[^'\\]|\\[\s\S]|'')*'"),
+    '"': re.compile(r'(?:[^"\\]|\\[\s\S]|"")*"'),
+    '`': re.compile(r'(?:[^`]|``)*`'),
+}
+# Token pattern of statement body for each delimiter
+BODY = dict()
+
+
+def body_pattern(delimiter):
+    """
+    :param delimiter: statement delimiter
+    :return: compiled pattern finding next token which can end statement or hide delimiter
+    """
+    pattern = BODY.get(delimiter)
+    if pattern is None:
+        # Lookahead on first characters let regex skip plain text without trying every alternative
+        pattern = BODY[delimiter] = re.compile(r'(?=[{}\-/\'"`$\n])(?:{})'.format(re.escape(delimiter[0]), '|'.join([
+            r'(?P<delimiter>{})'.format(re.escape(delimiter)),
+            r'(?P<comment>--[^\n]*)',
+            r'(?P<block>/\*)',
+            r'(?P<quote>[\'"`])',
+            # PostgreSQL dollar quoting `$$...$$` / `$body$...$body$`, `$1` parameters are not quotes
+            r'(?P<dollar>(?<![\w$])\$(?:[A-Za-z_][A-Za-z0-9_]*)?\$)',
+            r'(?P<prefix>\n[ \t]*{})'.format(PROFILE),
+        ])))
+    return pattern
+
+
+class Statement:
+    __slots__ = ('start', 'begin', 'body', 'end', 'stop', 'reach', 'delimiter', 'inherited', 'profile', 'terminator')
+
+    def __init__(self, start, begin, body, end, stop, reach, delimiter, inherited, profile, terminator):
+        """
+        Single statement of XSQL, offsets are positions in lexed text
+        :param start: start of statement, whitespace and comments after previous statement included
+        :param begin: first character of statement, `@profile:` prefix included
+        :param body: first character of SQL
+        :param end: end of SQL, trailing whitespace and delimiter excluded
+        :param stop: end of statement, next statement start here
+        :param reach: end of text read to find end of statement
+        :param delimiter: delimiter in effect
+        :param inherited: profile of previous statement, used when statement has no prefix
+        :param profile: profile of statement, inherited one if it has no prefix, None if no prefix is written before
+        :param terminator: DELIMITER, PREFIX or None when statement run till end of text
+        """
+        self.start = start
+        self.begin = begin
+        self.body = body
+        self.end = end
+        self.stop = stop
+        self.reach = reach
+        self.delimiter = delimiter
+        self.inherited = inherited
+        self.profile = profile
+        self.terminator = terminator
+
+    def __repr__(self):
+        return 'Statement({}-{}, @{})'.format(self.begin, self.end, self.profile)
+
+    def moved(self, offset):
+        """
+        :param offset: characters to add into offsets
+        :return: copy of statement at other position
+        """
+        return Statement(self.start + offset, self.begin + offset, self.body + offset, self.end + offset,
+                         self.stop + offset, self.reach + offset, self.delimiter, self.inherited, self.profile,
+                         self.terminator)
+
+    def move(self, offset):
+        """
+        Move statement in place
+        :param offset: characters to add into offsets
+        :return: None
+        """
+        self.start += offset
+        self.begin += offset
+        self.body += offset
+        self.end += offset
+        self.stop += offset
+        self.reach += offset
+
+    def matches(self, other, offset):
+        """
+        :param other: Statement
+        :param offset: offset of other statement from this statement
+        :return: True if other statement is this statement moved by offset
+        """
+        return (self.start + offset == other.start and self.begin + offset == other.begin
+                and self.body + offset == other.body and self.end + offset == other.end
+                and self.stop + offset == other.stop and self.reach + offset == other.reach
+                and self.delimiter == other.delimiter and self.inherited == other.inherited
+                and self.profile == other.profile and self.terminator == other.terminator)
+
+    def sql(self, text):
+        """
+        :param text: text statement was lexed from
+        :return: SQL of statement without prefix and delimiter
+        """
+        return text[self.body:self.end]
+
+
+def skip_commands(text, pos, delimiter, final):
+    """
+    Apply `DELIMITER` commands at position, whitespace and comments after them are skipped
+    :param text: XSQL
+    :param pos: position after whitespace and comments
+    :param delimiter: delimiter in effect at position
+    :param final: False when text is cut from larger document, command reaching end of text is not applied
+    :return: (position after commands, delimiter in effect, False if command reach end of text which is not final)
+    """
+    command = DELIMITER_COMMAND.match(text, pos)
+    while command is not None and (final or command.end() < len(text)):
+        delimiter = command.group(1)
+        pos = SKIP.match(text, command.end()).end()
+        command = DELIMITER_COMMAND.match(text, pos)
+    return pos, delimiter, command is None
+
+
+def lex_statements(text, delimiter=';', profile=None, offset=0, final=True):
+    """
+    Split XSQL into statements, delimiter inside quotes, dollar quotes and comments is skipped. Statement end at
+    delimiter or where line starting with `@profile:` begin next statement, statement without prefix run on profile
+    of previous statement
+    :param text: XSQL
+    :param delimiter: delimiter in effect at start of text
+    :param profile: profile in effect at start of text
+    :param offset: position of text in document, added into offsets of statements
+    :param final: False when text is cut from larger document, statement reaching end of text is not returned
+    :return: generator of Statement
+    """
+    size = len(text)
+    pos = start = 0
+    while True:
+        pos, delimiter, complete = skip_commands(text, SKIP.match(text, pos).end(), delimiter, final)
+        if pos >= size or not complete:
+            return
+
+        begin = pos
+        inherited = profile
+        prefix = PREFIX_MATCH.match(text, pos)
+        if prefix is not None:
+            profile = prefix.group(1).lower()
+            pos = prefix.end()
+            # Prefix can stand on its own line before `DELIMITER` command, ex: before routine body
+            skipped = SKIP.match(text, pos).end()
+            if DELIMITER_COMMAND.match(text, skipped) is not None:
+                pos, delimiter, complete = skip_commands(text, skipped, delimiter, final)
+                if not complete:
+                    return
+        body = pos
+
+        pattern = body_pattern(delimiter)
+        terminator = None
+        end = stop = size
+        trail = last = None  # comments at end of statement, they are not part of SQL
+        token = pattern.search(text, pos)
+        while token is not None:
+            kind = token.lastgroup
+            if kind == 'delimiter':
+                end, stop = token.span()
+                terminator = DELIMITER
+                break
+            if kind == 'prefix':
+                end = stop = token.start()
+                terminator = PREFIX
+                break
+            if kind == 'comment':
+                pos = token.end()
+            elif kind == 'block':
+                close = text.find('*/', token.end())
+                pos = size if close < 0 else close + 2
+            elif kind == 'quote':
+                close = CLOSE[token.group()].match(text, token.end())
+                pos = size if close is None else close.end()
+            else:
+                close = text.find(token.group(), token.end())
+                pos = size if close < 0 else close + len(token.group())
+            if kind == 'quote' or kind == 'dollar':
+                trail = None
+            else:
+                if trail is None or text[last:token.start()].strip():
+                    trail = token.start()
+                last = pos
+            token = pattern.search(text, pos) if pos < size else None
+
+        if terminator is None and not final:
+            return
+        # Prefix is looked for till end of line, text after delimiter on same line can change statement
+        newline = text.find('\n', stop + 1 if terminator == PREFIX else stop)
+        reach = size if newline < 0 else newline + 1
+        if trail is not None and not text[last:end].strip():
+            end = trail
+        end = body + len(text[body:end].rstrip())
+        if end > body:
+            yield Statement(offset + start, offset + begin, offset + body, offset + end, offset + stop,
+                            offset + reach, delimiter, inherited, profile, terminator)
+            start = stop
+        if terminator is None:
+            return
+        pos = stop
+
+
+def split_statements(xsql, profile=None):
+    """
+    :param xsql: XSQL
+    :param profile: profile of statements written before first prefix
+    :return: list of Statement
+    """
+    return list(lex_statements(xsql, profile=profile))
+
+
+def bisect_left(items, value, key):
+    """
+    Keyed `bisect.bisect_left`, `key` argument of bisect module needs Python 3.10
+    :param items: list sorted by key
+    :param value: value compared with key of items
+    :param key: function giving key of item
+    :return: index of first item whose key is not less than value
+    """
+    low, high = 0, len(items)
+    while low < high:
+        middle = (low + high) // 2
+        if key(items[middle]) < value:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def bisect_right(items, value, key):
+    """
+    Keyed `bisect.bisect_right`
+    :param items: list sorted by key
+    :param value: value compared with key of items
+    :param key: function giving key of item
+    :return: index of first item whose key is greater than value
+    """
+    low, high = 0, len(items)
+    while low < high:
+        middle = (low + high) // 2
+        if value < key(items[middle]):
+            high = middle
+        else:
+            low = middle + 1
+    return low
+
+
+class Segment:
+    __slots__ = ('shift', 'statements', 'end', 'delimiter', 'profile')
+
+    def __init__(self, shift, statements, end, delimiter, profile):
+        """
+        Run of consecutive statements lexed together, offsets of its statements are moved by shift instead of
+        updating every statement on edit
+        :param shift: characters inserted (-removed) before segment since it was lexed
+        :param statements: list of Statement
+        :param end: end of last statement, before shift
+        :param delimiter: delimiter in effect at end
+        :param profile: profile in effect at end
+        """
+        self.shift = shift
+        self.statements = statements
+        self.end = end
+        self.delimiter = delimiter
+        self.profile = profile
+
+
+class StatementIndex(QObject):
+    # Characters lexed at once, doubled while statement does not fit in it
+    WINDOW = 65536
+
+    START = attrgetter('start')
+    REACH = attrgetter('reach')
+
+    def __init__(self, document, parent=None):
+        """
+        Statements of document kept up to date while it is edited. Edit drop only statements it touched, text is
+        lexed again lazily when statement is looked up and lexing stop as soon as it meet statement lexed before
+        edit, so lookup in large file cost same as in small one
+        :param document: QTextDocument of editor
+        :param parent: parent QObject
+        """
+        super().__init__(parent)
+        self.log = log.getLogger(self.__class__.__name__)
+
+        self.document = document
+        self.revision = document.revision()
+        # First segment start at 0 and is always valid, statements after edits wait in other segments till text
+        # between them and first segment is lexed again
+        self.segments = [Segment(0, [], 0, ';', None)]
+        self.ended = False      # True when text after first segment is lexed till end of document
+        self.trailing = None    # Statement not terminated till end of document
+
+        self.document.contentsChange.connect(self.onContentsChange)
+
+    def onContentsChange(self, position, chars_removed, chars_added):
+        """
+        Drop statements touched by edit and move statements after it, format only changes are skipped
+        :param position: position of change
+        :param chars_removed: number of characters removed
+        :param chars_added: number of characters inserted
+        :return: None
+        """
+        if self.document.revision() == self.revision:
+            return
+        self.revision = self.document.revision()
+        self.ended = False
+        self.trailing = None
+
+        limit = position + chars_removed
+        delta = chars_added - chars_removed
+        segments = list()
+        for index, segment in enumerate(self.segments):
+            statements = segment.statements
+            shift = segment.shift
+            if index > 0 and statements[0].start + shift >= limit:
+                segment.shift += delta
+                segments.append(segment)
+                continue
+            if (statements[-1].reach if statements else segment.end) + shift <= position:
+                segments.append(segment)
+                continue
+            # Edit inside segment, statements before and after it are kept in separate segments
+            before = statements[:bisect_right(statements, position - shift, self.REACH)]
+            after = statements[bisect_left(statements, limit - shift, self.START):]
+            if before and before[-1].terminator == PREFIX:
+                # Its end depend on prefix of next statement which is touched
+                before.pop()
+            if before:
+                last = before[-1]
+                segments.append(Segment(shift, before, last.stop, last.delimiter, last.profile))
+            elif index == 0:
+                segments.append(Segment(0, [], 0, ';', None))
+            if after:
+                segments.append(Segment(shift + delta, after, segment.end, segment.delimiter, segment.profile))
+        self.segments = segments
+
+    def text(self, start, stop):
+        """
+        :param start: position in document
+        :param stop: position in document
+        :return: text between positions
+        """
+        cursor = QTextCursor(self.document)
+        cursor.setPosition(start)
+        cursor.setPosition(stop, QTextCursor.KeepAnchor)
+        return cursor.selectedText().replace('\u2029', '\n')
+
+    def lex(self):
+        """
+        Lex text after first segment till it meet next segment or window is lexed, `ended` is set when end of
+        document is reached
+        :return: None
+        """
+        first = self.segments[0]
+        start = first.end + first.shift
+        length = self.document.characterCount() - 1
+        size = self.WINDOW
+        while True:
+            stop = min(length, start + size)
+            statements = list(lex_statements(
+                self.text(start, stop), first.delimiter, first.profile, start, final=stop == length
+            ))
+            if statements or stop == length:
+                break
+            size *= 2
+
+        for statement in statements:
+            if statement.terminator is None:
+                # Statement can still grow by typing at end of document, it is not kept
+                self.trailing = statement
+                break
+            while len(self.segments) > 1:
+                following = self.segments[1]
+                items = following.statements
+                # Statements of next segment which are overlapped by lexed text are stale
+                del items[:bisect_left(items, statement.start - following.shift, self.START)]
+                if not items:
+                    del self.segments[1]
+                    continue
+                if items[0].matches(statement, following.shift):
+                    self.join(following)
+                    return
+                break
+            statement.move(-first.shift)
+            first.statements.append(statement)
+            first.end = statement.stop
+            first.delimiter = statement.delimiter
+            first.profile = statement.profile
+        else:
+            if stop < length:
+                return
+        self.ended = True
+
+    def join(self, following):
+        """
+        Merge second segment into first after text between them is lexed, statements of smaller one are moved
+        :param following: second segment
+        :return: None
+        """
+        first = self.segments[0]
+        offset = following.shift - first.shift
+        if len(following.statements) <= len(first.statements):
+            for statement in following.statements:
+                statement.move(offset)
+            first.statements.extend(following.statements)
+            first.end = following.end + offset
+        else:
+            for statement in first.statements:
+                statement.move(-offset)
+            following.statements[:0] = first.statements
+            first.statements = following.statements
+            first.shift = following.shift
+            first.end = following.end
+        first.delimiter = following.delimiter
+        first.profile = following.profile
+        del self.segments[1]
+
+    def statementAt(self, position):
+        """
+        Statement under position, statement ending before position when position is between statements
+        :param position: position in document, ex: cursor position
+        :return: Statement with document positions, None if document has no statement
+        """
+        while True:
+            first = self.segments[0]
+            if position < first.end + first.shift:
+                statements = first.statements
+                index = bisect_right(statements, position - first.shift, self.START) - 1
+                statement = statements[index]
+                if position - first.shift < statement.begin and index > 0:
+                    statement = statements[index - 1]
+                return statement.moved(first.shift)
+            if self.ended:
+                break
+            self.lex()
+
+        first = self.segments[0]
+        previous = first.statements[-1].moved(first.shift) if first.statements else None
+        if self.trailing is not None and (position >= self.trailing.begin or previous is None):
+            return self.trailing
+        return previous
+
+    def profileAt(self, position):
+        """
+        :param position: position in document
+        :return: profile in effect at position, None if no prefix is written before position
+        """
+        statement = self.statementAt(position)
+        if statement is None:
+            return None
+        return statement.profile if position >= statement.body else statement.inherited
+
+    def xsql(self, statement):
+        """
+        :param statement: Statement returned by statementAt
+        :return: text of statement with its prefix, without delimiter
+        """
+        return self.text(statement.begin, statement.end)
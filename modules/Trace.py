@@ -0,0 +1,477 @@
+import base64
+import datetime
+import decimal
+import json
+import struct
+import time
+import zlib
+from itertools import count
+from threading import Lock
+
+from logger import log
+
+
+class Trace:
+    """
+    Binary trace of query executions. File start with MAGIC followed by frames, frame is FRAME header
+    (kind, execution id, payload length) and zlib compressed JSON payload. Frames of executions running at same
+    time on different connections are interleaved, they are joined by execution id when trace is read. Values JSON
+    can not hold are written as {TAG: [type, value]}, trace shared by others is only data and never run as code
+    """
+    MAGIC = b'XPQT\x02'
+    FRAME = struct.Struct('<BII')
+    TAG = '\x00'
+
+    EXECUTE = 1     # (profile, server, query, description, column types, execute seconds)
+    BATCH = 2       # (fetch seconds, rows)
+    END = 3         # (rows, error message or None)
+    DESCRIBE = 4    # (description, column types) of server-side cursor, known only after first fetch
+
+    @classmethod
+    def encode(cls, payload):
+        """
+        :param payload: tuple of frame
+        :return: JSON bytes
+        """
+        return json.dumps(payload, default=cls.tag, separators=(',', ':')).encode('utf-8')
+
+    @classmethod
+    def decode(cls, data):
+        """
+        :param data: JSON bytes
+        :return: list of frame values
+        """
+        return json.loads(data.decode('utf-8'), object_hook=cls.untag)
+
+    @classmethod
+    def tag(cls, value):
+        """
+        Driver value which JSON can not hold, called by encoder for each of them so rows are converted in single pass
+        :param value: cell value
+        :return: tagged value, other values are kept as text
+        """
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return {cls.TAG: ['bytes', base64.b64encode(value).decode('ascii')]}
+        if isinstance(value, decimal.Decimal):
+            return {cls.TAG: ['decimal', str(value)]}
+        if isinstance(value, datetime.datetime):
+            return {cls.TAG: ['datetime', value.isoformat()]}
+        if isinstance(value, datetime.date):
+            return {cls.TAG: ['date', value.isoformat()]}
+        if isinstance(value, datetime.time):
+            return {cls.TAG: ['time', value.isoformat()]}
+        if isinstance(value, datetime.timedelta):
+            return {cls.TAG: ['timedelta', [value.days, value.seconds, value.microseconds]]}
+        if isinstance(value, (set, frozenset)):
+            return {cls.TAG: ['set', list(value)]}
+        return str(value)
+
+    @classmethod
+    def untag(cls, value):
+        """
+        :param value: JSON object
+        :return: value of tagged object, other objects as they are
+        """
+        if len(value) != 1 or cls.TAG not in value:
+            return value
+        kind, data = value[cls.TAG]
+        if kind == 'bytes':
+            return base64.b64decode(data)
+        if kind == 'decimal':
+            return decimal.Decimal(data)
+        if kind == 'datetime':
+            return datetime.datetime.fromisoformat(data)
+        if kind == 'date':
+            return datetime.date.fromisoformat(data)
+        if kind == 'time':
+            return datetime.time.fromisoformat(data)
+        if kind == 'timedelta':
+            return datetime.timedelta(*data)
+        if kind == 'set':
+            return set(data)
+        raise ValueError('Unknown value type in trace: {}'.format(kind))
+
+    @classmethod
+    def check(cls, file, path):
+        """
+        :param file: trace file opened for reading at its start
+        :param path: location of trace file
+        :return: None
+        """
+        magic = file.read(len(cls.MAGIC))
+        if magic != cls.MAGIC:
+            if magic[:-1] == cls.MAGIC[:-1]:
+                raise ValueError('{} is recorded by other version of XPQE, record it again'.format(path))
+            raise ValueError('{} is not a query trace'.format(path))
+
+
+class TraceWriter:
+    # path -> TraceWriter, every engine recording into same file share single writer
+    writers = dict()
+    writersLock = Lock()
+
+    def __init__(self, path):
+        """
+        Append frames to trace file, used by engines running on many worker threads
+        :param path: location of trace file
+        """
+        self.log = log.getLogger(self.__class__.__name__)
+        self.path = path
+        self.lock = Lock()
+        self.ids = count(1)
+        self.file = open(path, 'ab')
+        if self.file.tell() == 0:
+            self.file.write(Trace.MAGIC)
+        else:
+            with open(path, 'rb') as file:
+                try:
+                    Trace.check(file, path)
+                except ValueError:
+                    self.file.close()
+                    raise
+            # Continue after ids of executions already in file
+            self.ids = count(max((execution for _, execution, _ in TraceReader.frames(path)), default=0) + 1)
+        self.log.info('Recording queries into {}'.format(path))
+
+    @classmethod
+    def get(cls, path):
+        """
+        :param path: location of trace file
+        :return: shared TraceWriter of file
+        """
+        with cls.writersLock:
+            writer = cls.writers.get(path)
+            if writer is None:
+                writer = cls.writers[path] = cls(path)
+            return writer
+
+    @classmethod
+    def closeAll(cls):
+        """
+        Close all trace files, recording stopped
+        :return: None
+        """
+        with cls.writersLock:
+            for writer in cls.writers.values():
+                writer.close()
+            cls.writers.clear()
+
+    def nextId(self):
+        """
+        :return: id of new execution
+        """
+        with self.lock:
+            return next(self.ids)
+
+    def write(self, kind, execution, payload):
+        """
+        :param kind: Trace.EXECUTE / Trace.BATCH / Trace.END
+        :param execution: id of execution
+        :param payload: tuple of frame
+        :return: None
+        """
+        data = zlib.compress(Trace.encode(payload), 1)
+        with self.lock:
+            if self.file.closed:
+                return
+            self.file.write(Trace.FRAME.pack(kind, execution, len(data)))
+            self.file.write(data)
+            self.file.flush()
+
+    def close(self):
+        """
+        :return: None
+        """
+        with self.lock:
+            self.file.close()
+
+
+class RecordingCursor:
+    def __init__(self, cursor, writer, engine, query):
+        """
+        Wrap cursor of driver, executed query, description, fetched batches and time taken by server are written to
+        trace. Rows reach caller unchanged
+        :param cursor: Cursor of driver
+        :param writer: object of TraceWriter class
+        :param engine: engine owning cursor, gives profile and type mapping of columns
+        :param query: SQL query
+        """
+        self.cursor = cursor
+        self.writer = writer
+        self.engine = engine
+        self.query = query
+        self.execution = None
+        self.described = False
+        self.rows = 0
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+    def execute(self, query, *args):
+        """
+        :param query: SQL query
+        :param args: parameters of query
+        :return: None
+        """
+        self.finish()
+        start = time.perf_counter()
+        error = None
+        try:
+            return self.cursor.execute(query, *args)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.execution = self.writer.nextId()
+            self.rows = 0
+            description = self.cursor.description if error is None else None
+            self.described = bool(description)
+            self.writer.write(Trace.EXECUTE, self.execution, (
+                self.engine.profile.profile,
+                self.engine.profile.type,
+                # Query run by engine, statements it is made of by engine (e.g. `GENERATE TABLE`) are replayed as one
+                self.query
+            ) + self.describe(description) + (time.perf_counter() - start,))
+            if error is not None:
+                self.finish(error)
+
+    def fetchmany(self, size):
+        """
+        :param size: number of rows
+        :return: list of rows
+        """
+        start = time.perf_counter()
+        rows = self.cursor.fetchmany(size)
+        if self.execution is not None:
+            seconds = time.perf_counter() - start
+            if not self.described and self.cursor.description:
+                # Server-side cursor describe its columns only after first fetch
+                self.described = True
+                self.writer.write(Trace.DESCRIBE, self.execution, self.describe(self.cursor.description))
+            self.writer.write(Trace.BATCH, self.execution, (seconds, rows))
+            self.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        """
+        :return: list of rows
+        """
+        rows = list()
+        batch = self.fetchmany(10000)
+        while batch:
+            rows.extend(batch)
+            batch = self.fetchmany(10000)
+        return rows
+
+    def describe(self, description):
+        """
+        :param description: cursor.description
+        :return: (description tuples, logical column types), (None, None) if query returned no rows
+        """
+        if not description:
+            return None, None
+        return [tuple(column) for column in description], [self.engine.columnType(column) for column in description]
+
+    def finish(self, error=None):
+        """
+        Write end of current execution
+        :param error: Exception raised by execution
+        :return: None
+        """
+        if self.execution is not None:
+            self.writer.write(Trace.END, self.execution, (self.rows, None if error is None else str(error)))
+            self.execution = None
+
+    def close(self):
+        """
+        :return: None
+        """
+        self.finish()
+        self.cursor.close()
+
+
+class TraceColumn(tuple):
+    """
+    Item of cursor.description served from trace, carry logical type recorded from original engine
+    """
+    logicalType = None
+
+    @property
+    def name(self):
+        return self[0]
+
+    @property
+    def type_code(self):
+        return self[1]
+
+    @property
+    def precision(self):
+        return self[4] if len(self) > 4 else None
+
+    @property
+    def scale(self):
+        return self[5] if len(self) > 5 else None
+
+
+class TraceExecution:
+    def __init__(self, profile, server, query, description, types, seconds):
+        """
+        Single query execution read from trace
+        :param profile: name of recorded profile
+        :param server: server type of recorded profile
+        :param query: SQL query
+        :param description: list of description tuples, None if query returned no rows
+        :param types: logical type of each column
+        :param seconds: time taken by execute
+        """
+        self.profile = profile
+        self.server = server
+        self.query = query
+        self.description = None
+        self.seconds = seconds
+        self.setDescription(description, types)
+        self.batches = list()   # [(seconds, rows)]
+        self.rows = 0
+        self.error = None
+
+    def setDescription(self, description, types):
+        """
+        :param description: list of description tuples, None if query returned no rows
+        :param types: logical type of each column
+        :return: None
+        """
+        if description is None:
+            return
+        self.description = list()
+        for column, logical_type in zip(description, types or [None] * len(description)):
+            column = TraceColumn(column)
+            column.logicalType = logical_type
+            self.description.append(column)
+
+    def __repr__(self):
+        return 'TraceExecution: {} rows in {} batches of {}'.format(self.rows, len(self.batches), self.query)
+
+
+class TraceReader:
+    def __init__(self, path):
+        """
+        Read all executions of trace file
+        :param path: location of trace file
+        """
+        self.path = path
+        self.executions = list()
+        executions = dict()
+        for kind, execution, payload in self.frames(path):
+            if kind == Trace.EXECUTE:
+                executions[execution] = TraceExecution(*payload)
+                self.executions.append(executions[execution])
+            elif execution in executions:
+                if kind == Trace.BATCH:
+                    seconds, rows = payload
+                    executions[execution].batches.append((seconds, [tuple(row) for row in rows]))
+                    executions[execution].rows += len(rows)
+                elif kind == Trace.DESCRIBE:
+                    executions[execution].setDescription(*payload)
+                elif kind == Trace.END:
+                    executions[execution].error = payload[1]
+
+    @staticmethod
+    def frames(path):
+        """
+        :param path: location of trace file
+        :return: generator of (kind, execution id, payload), half written last frame is ignored
+        """
+        with open(path, 'rb') as file:
+            Trace.check(file, path)
+            while True:
+                header = file.read(Trace.FRAME.size)
+                if len(header) < Trace.FRAME.size:
+                    return
+                kind, execution, length = Trace.FRAME.unpack(header)
+                data = file.read(length)
+                if len(data) < length:
+                    return
+                yield kind, execution, Trace.decode(zlib.decompress(data))
+
+
+class ReplayCursor:
+    # Seconds slept at once, cancel is noticed within this time
+    SLEEP_STEP = 0.05
+
+    def __init__(self, execution, speed=1.0, cancelled=None):
+        """
+        Cursor serving recorded execution, latency of execute and of each recorded batch is replayed
+        :param execution: object of TraceExecution class
+        :param speed: 1 for recorded timing, 10 for ten times faster, 0 for no delay
+        :param cancelled: callable returning True when query is cancelled
+        """
+        self.execution = execution
+        self.speed = speed
+        self.cancelled = cancelled or (lambda: False)
+        self.description = None
+        self.rowcount = -1
+        self.batch = 0          # next recorded batch
+        self.pending = []       # rows of recorded batch not served yet
+        self.closed = False
+
+    def wait(self, seconds):
+        """
+        :param seconds: recorded time
+        :return: None
+        """
+        if not self.speed or seconds <= 0:
+            return
+        end = time.perf_counter() + seconds / self.speed
+        while not self.cancelled():
+            left = end - time.perf_counter()
+            if left <= 0:
+                return
+            time.sleep(min(left, self.SLEEP_STEP))
+        raise InterruptedError('Replay interrupted')
+
+    def execute(self, query=None, *args):
+        """
+        :param query: not used, query is given by execution
+        :param args: not used
+        :return: None
+        """
+        self.wait(self.execution.seconds)
+        if self.execution.error is not None and self.execution.description is None:
+            raise RuntimeError(self.execution.error)
+        self.description = self.execution.description
+        self.rowcount = self.execution.rows if self.description else -1
+        self.batch = 0
+        self.pending = []
+
+    def fetchmany(self, size):
+        """
+        Rows are served in requested size, recorded latency of batch is replayed when batch is first needed
+        :param size: number of rows
+        :return: list of rows
+        """
+        rows = list()
+        while len(rows) < size:
+            if not self.pending:
+                if self.batch >= len(self.execution.batches):
+                    break
+                seconds, self.pending = self.execution.batches[self.batch]
+                self.batch += 1
+                self.wait(seconds)
+                continue
+            take = size - len(rows)
+            rows.extend(self.pending[:take])
+            self.pending = self.pending[take:]
+        return rows
+
+    def fetchall(self):
+        """
+        :return: list of remaining rows
+        """
+        rows = self.fetchmany(self.execution.rows)
+        return rows
+
+    def close(self):
+        """
+        :return: None
+        """
+        self.closed = True
@@ -0,0 +1,219 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from PyQt5.QtCore import QObject, QTimer
+
+from logger import log
+
+
+class Span:
+    __slots__ = ('name', 'category', 'args', 'start')
+
+    def __init__(self, name, category, args):
+        """
+        Timed section of code, written to trace when it ends
+        :param name: name of span
+        :param category: category of span ex: query, ui
+        :param args: dict of values shown with span
+        """
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.args['error'] = str(exc_value)
+        Tracer.complete(self.name, self.start, time.perf_counter(), self.category, self.args)
+        return False
+
+    def set(self, **args):
+        """
+        Add values known only when span ends, ex: number of rows
+        :param args: values shown with span
+        :return: None
+        """
+        self.args.update(args)
+
+
+class NullSpan:
+    """
+    Span used while tracing is off, does nothing
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class Tracer:
+    """
+    Spans of query life cycle in Chrome Trace Event format, opened in chrome://tracing or ui.perfetto.dev. While
+    tracing is off span() return shared NullSpan and nothing is recorded
+    """
+    enabled = False
+    # Oldest events are dropped once limit is reached, long session keep its latest part
+    MAX_EVENTS = 1000000
+
+    events = deque(maxlen=MAX_EVENTS)
+    threads = dict()    # thread id -> name, written as metadata events
+    origin = time.perf_counter()
+    lock = threading.Lock()
+
+    @classmethod
+    def span(cls, name, category='query', **args):
+        """
+        :param name: name of span
+        :param category: category of span
+        :param args: values shown with span
+        :return: context manager, Span / NullSpan
+        """
+        if not cls.enabled:
+            return NULL_SPAN
+        return Span(name, category, args)
+
+    @classmethod
+    def complete(cls, name, start, end, category='query', args=None):
+        """
+        Record span measured by caller, used when span start on other thread than it ends, ex: time in queue
+        :param name: name of span
+        :param start: time.perf_counter() at start
+        :param end: time.perf_counter() at end
+        :param category: category of span
+        :param args: dict of values shown with span
+        :return: None
+        """
+        if not cls.enabled:
+            return
+        cls.add({
+            'name': name, 'cat': category, 'ph': 'X', 'ts': (start - cls.origin) * 1e6,
+            'dur': (end - start) * 1e6, 'args': args or {}
+        })
+
+    @classmethod
+    def instant(cls, name, category='query', **args):
+        """
+        Record event without duration, ex: result served from cache
+        :param name: name of event
+        :param category: category of event
+        :param args: values shown with event
+        :return: None
+        """
+        if not cls.enabled:
+            return
+        cls.add({
+            'name': name, 'cat': category, 'ph': 'i', 's': 't', 'ts': (time.perf_counter() - cls.origin) * 1e6,
+            'args': args
+        })
+
+    @classmethod
+    def add(cls, event):
+        """
+        :param event: dict of trace event without pid and tid
+        :return: None
+        """
+        thread = threading.current_thread()
+        event['pid'] = os.getpid()
+        event['tid'] = thread.ident
+        with cls.lock:
+            if thread.ident not in cls.threads:
+                cls.threads[thread.ident] = thread.name
+            cls.events.append(event)
+
+    @classmethod
+    def enable(cls, state=True):
+        """
+        :param state: True to start recording spans
+        :return: None
+        """
+        cls.enabled = state
+
+    @classmethod
+    def clear(cls):
+        """
+        Drop recorded events
+        :return: None
+        """
+        with cls.lock:
+            cls.events.clear()
+
+    @classmethod
+    def export(cls, path):
+        """
+        Write recorded events as Chrome Trace Event JSON
+        :param path: location of trace file
+        :return: number of events written
+        """
+        with cls.lock:
+            events = list(cls.events)
+            threads = dict(cls.threads)
+        pid = os.getpid()
+        metadata = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0, 'args': {'name': 'XPQE'}}]
+        metadata += [
+            {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+            for tid, name in threads.items()
+        ]
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump({'traceEvents': metadata + events, 'displayTimeUnit': 'ms'}, file, default=str)
+        return len(events)
+
+
+class StallWatchdog(QObject):
+    # Milliseconds between ticks of GUI thread
+    INTERVAL = 20
+    # Tick later than this many milliseconds is recorded as stall of GUI thread
+    THRESHOLD = 100
+
+    def __init__(self, parent=None):
+        """
+        Detect GUI thread blocked by long running work, tick of timer arriving late is recorded as `UI stall` span
+        :param parent: parent QObject
+        """
+        super().__init__(parent)
+        self.log = log.getLogger(self.__class__.__name__)
+
+        self.last = None
+        self.timer = QTimer(self)
+        self.timer.setInterval(self.INTERVAL)
+        self.timer.timeout.connect(self.tick)
+
+    def start(self):
+        """
+        :return: None
+        """
+        self.last = time.perf_counter()
+        self.timer.start()
+
+    def stop(self):
+        """
+        :return: None
+        """
+        self.timer.stop()
+
+    def tick(self):
+        """
+        Timer fired on GUI thread, gap beyond interval is time GUI thread could not process events
+        :return: None
+        """
+        now = time.perf_counter()
+        late = (now - self.last) * 1000 - self.INTERVAL
+        if late > self.THRESHOLD:
+            Tracer.complete('UI stall', self.last + self.INTERVAL / 1000, now, 'ui', {'ms': round(late, 1)})
+            self.log.debug('GUI thread stalled for {:.0f} ms'.format(late))
+        self.last = now
@@ -1,3 +1,6 @@
+import os
+from functools import partial
+
 from PyQt5.QtGui import QColor, QTextCharFormat, QFont, QTextCursor
 
 from logger import log
@@ -6,8 +9,11 @@ from PyQt5.QtWidgets import QFileDialog, QMessageBox
 
 from gui.ProfileManager import ProfileManager
 from gui.AboutDialog import AboutDialog
+from gui.LastRunDialog import LastRunDialog
 from gui.SettingsDialog import SettingsDialog
-from modules.PdfMaker import PdfMaker
+from modules.Exporter import ArrowWriter, CsvWriter, HtmlWriter, PdfWriter
+from modules.Journal import Journal
+from modules.Tracer import Tracer
 
 
 def open_profile_manager(context, profiler):
@@ -38,6 +44,15 @@ def open_settings_dialog(context, editor):
     SettingsDialog(context, editor)
 
 
+def open_last_run_dialog(engine_manager):
+    """
+    Open Last Run dialog
+    :param engine_manager: object of EngineManager class, owns metrics of executed queries
+    :return: None
+    """
+    LastRunDialog(engine_manager.metrics)
+
+
 def toggle_check(element, state):
     """
     Toggle function to Show/Hide given PyQt element
@@ -58,29 +73,16 @@ def save_file(editor, file_manager):
     :param file_manager: object of FileManger class
     :return: None
     """
-    editor_text = editor.toPlainText()
-
     if file_manager.location:
         # if location exisit in file manger then just overwrite file without opening save dialog
         log.debug('Had file location : {}, Overwriting on same path'.format(file_manager.location))
-        with open(file_manager.location, 'w') as file:
-            file.write(editor_text)
-        log.info('File Saved @ {}'.format(file_manager.location))
-
-        log.debug('Updating file context details')
-        file_manager.set_hash(editor_text)
+        file_manager.save(file_manager.location)
     else:
         # if location is None then it's a new file
         save_file_dialog = QFileDialog.getSaveFileName(None, 'Save', '/', 'Cross SQL Files (*.xsql)')
 
         if save_file_dialog[0]:
-            with open(save_file_dialog[0], 'w') as file:
-                file.write(editor_text)
-            log.info('File Saved @ {}'.format(save_file_dialog[0]))
-
-            log.debug('Updating file context details')
-            file_manager.set_hash(editor_text)
-            file_manager.set_location(save_file_dialog[0])
+            file_manager.save(save_file_dialog[0])
 
 
 def new_file(editor, file_manager):
@@ -90,11 +92,11 @@ def new_file(editor, file_manager):
     :param file_manager: object of FileManger class
     :return: None
     """
-    editor_text = editor.toPlainText()
-    # check change in content of editor before opening new empty file
-    if file_manager.compare_hash(editor_text):
+    # check change in content of editor before opening new empty file, content is hashed only when modified
+    if not file_manager.is_modified():
         # Hash matched means no changes, directly open new empty file
         log.debug('Clearing editor')
+        file_manager.pause()
         editor.setPlainText('')
         log.debug('Resetting file context details')
         file_manager.reset()
@@ -108,10 +110,13 @@ def new_file(editor, file_manager):
 
         alert_action = alert_message.exec()
         if alert_action == QMessageBox.Save:
-            save_file(editor, file_manager)
-            new_file(editor, file_manager)
+            # File is written on worker thread, new file is opened once it is saved
+            location = file_manager.location or \
+                QFileDialog.getSaveFileName(None, 'Save', '/', 'Cross SQL Files (*.xsql)')[0]
+            if location:
+                file_manager.save(location, callback=partial(new_file, editor, file_manager))
         elif alert_action == QMessageBox.Ignore:
-            file_manager.reset(string=editor_text)
+            file_manager.reset()
             new_file(editor, file_manager)
         elif alert_message == QMessageBox.Cancel:
             pass
@@ -126,19 +131,62 @@ def open_file(editor, file_manager):
     """
     open_file_dialog = QFileDialog.getOpenFileName(None, 'Open', '/')
 
-    if open_file_dialog[0]:
+    if open_file_dialog[0] and \
+            os.path.getsize(open_file_dialog[0]) > editor.context.editor['largeFile.threshold'] * 1024 * 1024:
+        # Large file is populated chunk by chunk, hash is set once whole file is loaded
+        log.info('Opening Large File @ {}'.format(open_file_dialog[0]))
+        file_manager.pause()
+        file_manager.set_location(open_file_dialog[0])
+        loader = editor.openLargeFile(open_file_dialog[0])
+        loader.finished.connect(lambda location, digest: recover_journal(editor, file_manager, digest))
+    elif open_file_dialog[0]:
         log.info('Opening File @ {}'.format(open_file_dialog[0]))
         with open(open_file_dialog[0], 'r') as file:
             file_text = file.read()
 
+        file_manager.pause()
         editor.setPlainText(file_text)
 
         log.debug('Updating file context details')
-        file_manager.set_hash(file_text)
         file_manager.set_location(open_file_dialog[0])
+        recover_journal(editor, file_manager)
         log.debug('Complete File Openning @ {}'.format(open_file_dialog[0]))
 
 
+def recover_journal(editor, file_manager, digest=None):
+    """
+    Offer edits left in autosave journal of current file by crashed session, called once content of file is loaded
+    in editor. Journal is started again for loaded content
+    :param editor: object of editor
+    :param file_manager: object of FileManger class
+    :param digest: MD5 hash of loaded content if it is already calculated
+    :return: None
+    """
+    recovered = Journal.recover(file_manager.location, editor.document())
+    accepted = False
+    if recovered is not None:
+        alert_message = QMessageBox()
+        alert_message.setIcon(QMessageBox.Question)
+        alert_message.setText('Unsaved changes of {} were found, recover them?'.format(
+            os.path.basename(file_manager.location) if file_manager.location else 'Untitled'
+        ))
+        alert_message.setWindowTitle('Recover Unsaved Changes')
+        alert_message.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
+        accepted = alert_message.exec() == QMessageBox.Yes
+
+    # Old journal is dropped only now, recovery is finished or declined
+    if digest is None:
+        file_manager.set_hash(editor.toPlainText())
+    else:
+        file_manager.set_digest(digest)
+    if accepted:
+        # Recovered content is an edit of saved content, it can be undone and is journaled again
+        cursor = QTextCursor(editor.document())
+        cursor.select(QTextCursor.Document)
+        cursor.insertText(recovered)
+        log.info('Recovered unsaved changes')
+
+
 def save_as_file(editor, file_manager):
     """
     Save file without checking any constrains
@@ -149,75 +197,46 @@ def save_as_file(editor, file_manager):
     save_as_file_dialog = QFileDialog.getSaveFileName(None, 'Save As', '/', 'Cross SQL Files (*.xsql)')
 
     if save_as_file_dialog[0]:
-        editor_text = editor.toPlainText()
-        with open(save_as_file_dialog[0], 'w') as file:
-            file.write(editor_text)
-        log.info('File Saved @ {}'.format(save_as_file_dialog[0]))
+        # File is written on worker thread, context details are updated once it is saved
+        file_manager.save(save_as_file_dialog[0])
 
-        log.debug('Updating file context details')
-        file_manager.set_hash(editor_text)
-        file_manager.set_location(save_as_file_dialog[0])
 
-
-def export_result(context, file_type, header=False):
+def export_result(context, engine_manager, file_type, header=False):
     """
     Export result table into give file format
     :param context: shared properties in application
+    :param engine_manager: object of EngineManager class, export files are written on its worker threads
     :param file_type: format of export file
     :param header: export file with header (True/False)
     :return: None
     """
-    content = ''
-    pdf_maker = None
+    if context.xpqe['execute.result'] is None:
+        log.info('No result to export')
+        return
 
     if file_type == 'csv':
-        page = list()
-
-        if header:
-            col_names = context.xpqe['execute.header']
-            page.append(','.join(col_names))
-
-        for row in context.xpqe['execute.result']:
-            line = list()
-            for cell in row:
-                line.append(str('' if cell is None else cell))
-            page.append(','.join(line))
-        content += '\n'.join(page)
-    elif file_type == 'html':
-        col_names = context.xpqe['execute.header']
-        result_header = '</th><th>'.join(col_names)
-
-        page = list()
-        for row in context.xpqe['execute.result']:
-            line = list()
-            for cell in row:
-                line.append(str('' if cell is None else cell))
-            page.append('</td><td>'.join(line))
-        result_body = '</td></tr><tr><td>'.join(page)
-
-        content += '<h2>XSQL Query</h2><code>{xsql}</code>'.format(xsql=context.xpqe['execute.xsql'])
-        content += '<h2>SQL Query</h2><code>{sql}</code>'.format(sql=context.xpqe['execute.sql'])
-        content += '<h2>Result Table</h2><table><tr><th>{header}</th></tr>' \
-                   '<tr><td>{body}</td></tr></table>'.format(header=result_header, body=result_body)
-    elif file_type == 'pdf':
-        content = 'pdf_maker'
-        pdf_maker = PdfMaker(context)
-
-    file_extension = {
-        'csv': 'Comma Separated Value (*.csv)',
-        'html': 'Hyper Text Markup Language (*.html)',
-        'pdf': 'Portable Document Format (*.pdf)'
-    }
+        # Rows are streamed into file by worker, nothing is built in memory
+        export_file_dialog = QFileDialog.getSaveFileName(None, 'Export', '/', CsvWriter.FILTER)
+        if export_file_dialog[0]:
+            engine_manager.export(CsvWriter(header=header), export_file_dialog[0])
+        return
+    if file_type in ArrowWriter.FILTER:
+        # Typed columnar formats, column types come from cursor description of executed query
+        export_file_dialog = QFileDialog.getSaveFileName(None, 'Export', '/', ArrowWriter.FILTER[file_type])
+        if export_file_dialog[0]:
+            engine_manager.export(ArrowWriter(file_type, context.xpqe['execute.server']), export_file_dialog[0])
+        return
 
-    if content.strip() != '':
-        export_file_dialog = QFileDialog.getSaveFileName(None, 'Export', '/', file_extension[file_type])
+    if file_type == 'html':
+        export_file_dialog = QFileDialog.getSaveFileName(None, 'Export', '/', HtmlWriter.FILTER)
+        if export_file_dialog[0]:
+            writer = HtmlWriter(context.xpqe['execute.xsql'], context.xpqe['execute.sql'])
+            engine_manager.export(writer, export_file_dialog[0])
+    elif file_type == 'pdf':
+        # LaTeX run after rows are collected, both are done on worker thread
+        export_file_dialog = QFileDialog.getSaveFileName(None, 'Export', '/', PdfWriter.FILTER)
         if export_file_dialog[0]:
-            if file_type == 'pdf':
-                pdf_maker.generate_pdf(export_file_dialog[0])
-            else:
-                with open(export_file_dialog[0], 'w') as file:
-                    file.write(content)
-            log.info('Result Exported @ {}'.format(export_file_dialog[0]))
+            engine_manager.export(PdfWriter(context), export_file_dialog[0])
 
 
 def undo_text(editor):
@@ -334,20 +353,130 @@ def toggle_auto_commit(context, state):
     context.server['autoCommit'] = state
 
 
+def toggle_streaming(context, state):
+    context.server['streaming'] = state
+
+
+def toggle_batch_transaction(context, state):
+    context.server['batch.transaction'] = state
+
+
+def toggle_batch_stop_on_error(context, state):
+    context.server['batch.stopOnError'] = state
+
+
+def toggle_result_cache(context, engine_manager, state):
+    context.server['cache.enabled'] = state
+    if not state:
+        engine_manager.resultCache.invalidate()
+
+
+def toggle_trace_recording(context, action, state):
+    """
+    Start recording executed queries into trace file, replayed by profile of Replay server type
+    :param context: shared properties in application
+    :param action: checkable QAction of menu, unchecked again if no file is chosen
+    :param state: True to start recording
+    :return: None
+    """
+    from modules.Trace import TraceWriter
+
+    if not state:
+        context.server['trace.record'] = ''
+        TraceWriter.closeAll()
+        return
+    location = QFileDialog.getSaveFileName(None, 'Record Trace', '', 'Query Trace (*.xpqt)')[0]
+    if not location:
+        action.setChecked(False)
+        return
+    try:
+        TraceWriter.get(location)
+    except (OSError, ValueError) as e:
+        action.setChecked(False)
+        QMessageBox.critical(None, 'Record Trace', str(e))
+        return
+    context.server['trace.record'] = location
+
+
+def toggle_tracing(watchdog, state):
+    """
+    Start or stop recording spans of query life cycle
+    :param watchdog: object of StallWatchdog class, record stalls of GUI thread while tracing
+    :param state: True to start tracing
+    :return: None
+    """
+    Tracer.enable(state)
+    if state:
+        watchdog.start()
+    else:
+        watchdog.stop()
+
+
+def export_trace():
+    """
+    Save spans recorded by tracing as Chrome Trace Event JSON
+    :return: None
+    """
+    location = QFileDialog.getSaveFileName(None, 'Export Trace', '', 'Chrome Trace (*.json)')[0]
+    if not location:
+        return
+    try:
+        count = Tracer.export(location)
+        log.info('{:,} trace events exported @ {}'.format(count, location))
+    except OSError as e:
+        QMessageBox.critical(None, 'Export Trace', str(e))
+
+
 def run_xsql(editor, engine_manager):
     """
-    Run XSQL query
+    Run selected XSQL, statement under cursor when nothing is selected. Statements without `@profile:` prefix run
+    on profile of prefix written before them in editor
     :param editor: object of editor
     :param engine_manager: object of EngineManager class
     :return: None
     """
     cursor = editor.textCursor()
     xsql = cursor.selectedText()
-    if len(xsql) == 0:
-        xsql = editor.toPlainText()
-    log.info(xsql)
+    with Tracer.span('run_xsql', 'ui'):
+        if len(xsql) == 0:
+            statement = editor.statementIndex.statementAt(cursor.position())
+            if statement is None:
+                log.info('No statement to run')
+                return
+            xsql = editor.statementIndex.xsql(statement)
+            profile_name = statement.inherited
+        else:
+            profile_name = editor.statementIndex.profileAt(cursor.selectionStart())
+        log.info(xsql)
+
+        engine_manager.parse(xsql, profile_name)
 
-    engine_manager.parse(xsql)
+
+def run_all_xsql(editor, engine_manager):
+    """
+    Run selected XSQL, whole editor when nothing is selected, as batch with report of every statement
+    :param editor: object of editor
+    :param engine_manager: object of EngineManager class
+    :return: None
+    """
+    cursor = editor.textCursor()
+    with Tracer.span('run_all_xsql', 'ui'):
+        if cursor.hasSelection():
+            xsql = cursor.selectedText()
+            profile_name = editor.statementIndex.profileAt(cursor.selectionStart())
+        else:
+            xsql = editor.toPlainText()
+            profile_name = None
+        engine_manager.runAll(xsql, profile_name)
+
+
+def cancel_xsql(engine_manager):
+    """
+    Cancel running XSQL queries
+    :param engine_manager: object of EngineManager class
+    :return: None
+    """
+    engine_manager.cancelAll()
 
 
 def fmt(color, style=''):
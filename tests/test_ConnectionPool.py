@@ -0,0 +1,75 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.ConnectionPool import ConnectionPool
+from modules.Profiler import Profile
+
+
+class FakeEngine:
+    def __init__(self, fail_rollback=False):
+        self.transaction = False
+        self.failRollback = fail_rollback
+        self.closed = False
+        self.rolledBack = False
+
+    def ping(self):
+        return not self.closed
+
+    def inTransaction(self):
+        return self.transaction
+
+    def rollback(self):
+        if self.failRollback:
+            raise RuntimeError('connection lost')
+        self.rolledBack = True
+        self.transaction = False
+
+    def close(self):
+        self.closed = True
+        return True
+
+
+class ConnectionPoolTest(unittest.TestCase):
+    def pool(self, *engines):
+        engines = list(engines)
+        return ConnectionPool(Profile('p1', 'SQLite'), lambda profile: engines.pop(0), min_size=0, max_size=4)
+
+    def test_second_transaction_is_rolled_back(self):
+        first, second = FakeEngine(), FakeEngine()
+        pool = self.pool(first, second)
+        self.assertIs(pool.acquire(), first)
+        self.assertIs(pool.acquire(), second)
+        first.transaction = second.transaction = True
+
+        pool.release(first)
+        pool.release(second)
+
+        self.assertIs(pool.pinned, first)
+        self.assertFalse(first.rolledBack)
+        self.assertTrue(second.rolledBack)
+        self.assertFalse(pool.inUse)
+        self.assertEqual([engine for engine, _ in pool.idle], [first, second])
+        # Open transaction continue on engine holding it
+        self.assertIs(pool.acquire(), first)
+
+    def test_engine_failing_rollback_is_closed(self):
+        first, second = FakeEngine(), FakeEngine(fail_rollback=True)
+        pool = self.pool(first, second)
+        pool.acquire()
+        pool.acquire()
+        first.transaction = second.transaction = True
+
+        pool.release(first)
+        pool.release(second)
+
+        self.assertIs(pool.pinned, first)
+        self.assertTrue(second.closed)
+        self.assertEqual([engine for engine, _ in pool.idle], [first])
+        self.assertEqual(pool.size, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
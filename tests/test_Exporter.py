@@ -0,0 +1,65 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.Exporter import ArrowWriter
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+@unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+class ArrowWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def export(self, file_format, header, *batches, description=None, server='SQLite'):
+        path = os.path.join(self.workdir, 'export.' + file_format)
+        writer = ArrowWriter(file_format, server)
+        writer.ROW_GROUP_SIZE = 2
+        writer.open(path, header, description)
+        for batch in batches:
+            writer.write(batch)
+        writer.close()
+        if file_format == ArrowWriter.PARQUET:
+            return pyarrow.parquet.read_table(path)
+        with pyarrow.OSFile(path, 'rb') as source:
+            return pyarrow.ipc.open_file(source).read_all()
+
+    def test_null_column_takes_type_of_later_values(self):
+        for file_format in (ArrowWriter.PARQUET, ArrowWriter.FEATHER):
+            table = self.export(file_format, ['a', 'b'], [(None, 1), (None, 2)], [(5, 2.5), (None, None)])
+            self.assertEqual(table.schema.types, [pyarrow.int64(), pyarrow.float64()])
+            self.assertEqual(table.to_pylist(), [
+                {'a': None, 'b': 1}, {'a': None, 'b': 2}, {'a': 5, 'b': 2.5}, {'a': None, 'b': None}
+            ])
+
+    def test_integer_past_int64(self):
+        table = self.export(ArrowWriter.PARQUET, ['a'], [(1,), (2,)], [(2 ** 64 - 1,), (3,)])
+        self.assertEqual(table.schema.types, [pyarrow.uint64()])
+        self.assertEqual(table.column(0).to_pylist(), [1, 2, 2 ** 64 - 1, 3])
+
+        table = self.export(ArrowWriter.PARQUET, ['a'], [(-1,), (2,)], [(2 ** 64 - 1,), (3,)])
+        self.assertEqual(table.schema.types, [pyarrow.string()])
+        self.assertEqual(table.column(0).to_pylist(), ['-1', '2', str(2 ** 64 - 1), '3'])
+
+    def test_declared_type(self):
+        # BIGINT UNSIGNED and INT of MySQL
+        description = [('a', 8, None, None, None, None, 1, 32), ('b', 3, None, None, None, None, 1, 0)]
+        table = self.export(ArrowWriter.PARQUET, ['a', 'b'], [(None, None), (None, None)], [(1, None)],
+                            description=description, server='MySQL')
+        self.assertEqual(table.schema.types, [pyarrow.uint64(), pyarrow.int64()])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import os
+import sys
+import unittest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtCore import QObject
+from PyQt5.QtWidgets import QApplication
+
+from modules.FanOut import FanOutRun
+from modules.ResultSet import ResultSet
+
+app = QApplication.instance() or QApplication([])
+
+
+class FakeEngineManager(QObject):
+    context = None
+    resultTable = None
+
+
+def result(header, rows):
+    result_set = ResultSet(header)
+    result_set.append(rows)
+    return result_set
+
+
+class MergeTest(unittest.TestCase):
+    def setUp(self):
+        self.engineManager = FakeEngineManager()
+        self.fanOut = FanOutRun(self.engineManager, ['p1', 'p2'], 'SELECT 1', 1)
+
+    def test_profile_column_of_result_keeps_tag(self):
+        self.fanOut.merge('p1', result(['profile', 'a'], [('own', 1)]))
+        self.fanOut.merge('p2', result(['a', 'profile'], [(2, 'other')]))
+        self.assertEqual(self.fanOut.result.header, ['profile', 'profile_1', 'a'])
+        self.assertEqual(list(self.fanOut.result), [('p1', 'own', 1), ('p2', 'other', 2)])
+
+    def test_duplicate_column_names(self):
+        self.fanOut.merge('p1', result(['id', 'id', 'name'], [(1, 10, 'x')]))
+        self.fanOut.merge('p2', result(['id', 'name', 'id', 'id'], [(2, 'y', 20, 200)]))
+        self.assertEqual(self.fanOut.result.header, ['profile', 'id', 'id_1', 'name', 'id_2'])
+        self.assertEqual(list(self.fanOut.result), [
+            ('p1', 1, 10, 'x', None), ('p2', 2, 20, 'y', 200)
+        ])
+
+
+if __name__ == '__main__':
+    unittest.main()
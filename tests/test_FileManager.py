@@ -0,0 +1,138 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtGui import QTextDocument
+from PyQt5.QtWidgets import QApplication, QMessageBox, QPlainTextEdit
+
+from modules.FileManager import FileManager
+from modules.Journal import Journal, write_atomic
+from modules.trigger_func import recover_journal
+
+app = QApplication.instance() or QApplication([])
+
+
+class WriteAtomicTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.location = os.path.join(self.directory.name, 'query.xsql')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_overlapping_writes_of_same_file(self):
+        contents = ['a' * 200000, 'b' * 300000]
+        for _ in range(20):
+            errors = list()
+
+            def write(data):
+                try:
+                    write_atomic(self.location, data)
+                except Exception as e:
+                    errors.append(e)
+
+            threads = [threading.Thread(target=write, args=(data,)) for data in contents]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(errors, [])
+            with open(self.location, encoding='utf-8') as file:
+                self.assertIn(file.read(), contents)
+            self.assertEqual(os.listdir(self.directory.name), ['query.xsql'])
+
+    def test_mode_of_existing_file_is_kept(self):
+        write_atomic(self.location, 'first')
+        os.chmod(self.location, 0o640)
+        write_atomic(self.location, 'second')
+        self.assertEqual(os.stat(self.location).st_mode & 0o777, 0o640)
+
+
+class OverlappingSaveTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.location = os.path.join(self.directory.name, 'query.xsql')
+        self.document = QTextDocument()
+        self.fileManager = FileManager()
+        self.fileManager.attach(self.document)
+
+    def tearDown(self):
+        self.fileManager.close()
+        self.directory.cleanup()
+
+    def wait(self):
+        deadline = time.monotonic() + 10
+        while self.fileManager.saves and time.monotonic() < deadline:
+            app.processEvents()
+            time.sleep(0.01)
+        self.assertEqual(self.fileManager.saves, {})
+
+    def test_later_save_wins(self):
+        saved = list()
+        self.document.setPlainText('x' * 500000)
+        self.fileManager.save(self.location, callback=lambda: saved.append(1))
+        self.document.setPlainText('final')
+        self.fileManager.save(self.location, callback=lambda: saved.append(2))
+        self.wait()
+
+        self.assertEqual(saved, [1, 2])
+        with open(self.location) as file:
+            self.assertEqual(file.read(), 'final')
+        self.assertFalse(self.fileManager.is_modified())
+
+    def test_edit_after_save_stay_modified(self):
+        self.document.setPlainText('saved')
+        self.fileManager.save(self.location)
+        self.document.setPlainText('edited')
+        self.wait()
+        self.assertTrue(self.fileManager.is_modified())
+
+
+class StartupRecoveryTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.journalPath = os.path.join(self.directory.name, 'untitled.xsql.journal')
+        patcher = mock.patch.object(Journal, 'pathOf', classmethod(
+            lambda cls, location: location + cls.SUFFIX if location else self.journalPath
+        ))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with open(self.journalPath, 'w', encoding='utf-8') as file:
+            file.write('{"journal": 1, "base": "d41d8cd98f00b204e9800998ecf8427e", "location": null}\n')
+            file.write('[0, 0, "SELECT 1"]\n')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def start(self, answer):
+        editor = QPlainTextEdit()
+        file_manager = FileManager()
+        file_manager.attach(editor.document())
+        # Attaching must not drop journal before it is offered
+        file_manager.journal.threadPool.waitForDone()
+        self.assertTrue(os.path.exists(self.journalPath))
+        with mock.patch.object(QMessageBox, 'exec', return_value=answer):
+            recover_journal(editor, file_manager)
+        file_manager.close()
+        return editor, file_manager
+
+    def test_untitled_edits_are_recovered(self):
+        editor, file_manager = self.start(QMessageBox.Yes)
+        self.assertEqual(editor.toPlainText(), 'SELECT 1')
+        self.assertTrue(file_manager.is_modified())
+
+    def test_declined_journal_is_dropped(self):
+        editor, file_manager = self.start(QMessageBox.No)
+        self.assertEqual(editor.toPlainText(), '')
+        self.assertFalse(os.path.exists(self.journalPath))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.Profiler import Profile, Profiler
+
+
+class ProfilerTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.workdir = tempfile.mkdtemp()
+        os.chdir(self.workdir)
+        self.profiler = Profiler()
+        self.assertTrue(self.profiler.addProfile(Profile('p1', 'MySQL', host='db1')))
+        self.assertTrue(self.profiler.addProfile(Profile('p2', 'MySQL', host='db2')))
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def test_rename_to_existing_name_is_rejected(self):
+        changed = []
+        self.profiler.profileChanged.connect(changed.append)
+        self.assertFalse(self.profiler.editProfile('p1', Profile('p2', 'MySQL', host='other')))
+        self.assertFalse(self.profiler.addProfile(Profile('p2', 'MySQL')))
+        self.assertEqual(self.profiler.names, ['p1', 'p2'])
+        self.assertEqual(self.profiler.getProfile('p2').host, 'db2')
+        self.assertEqual(changed, [])
+
+        self.assertTrue(self.profiler.editProfile('p1', Profile('p3', 'MySQL', host='db3')))
+        self.assertEqual(self.profiler.names, ['p2', 'p3'])
+        self.assertEqual(changed, ['p1'])
+
+
+if __name__ == '__main__':
+    unittest.main()
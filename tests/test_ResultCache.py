@@ -0,0 +1,41 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.ResultCache import CacheEntry, ResultCache
+from modules.ResultSet import ResultSet
+
+
+def entry():
+    result = ResultSet(['a'])
+    result.append([(1,)])
+    return CacheEntry(result, 'SELECT 1', 'MySQL', 'localhost', None)
+
+
+class ResultCacheTest(unittest.TestCase):
+    def test_escaped_quote_in_literal(self):
+        self.assertEqual(ResultCache.normalize("SELECT 'It\\'s  A'  FROM T"), "select 'It\\'s  A' from t")
+        self.assertEqual(ResultCache.normalize("SELECT 'a\\\\'  FROM T"), "select 'a\\\\' from t")
+        self.assertTrue(ResultCache.isCacheable(ResultCache.normalize("SELECT 'x\\' delete ' FROM t")))
+        self.assertFalse(ResultCache.isCacheable(ResultCache.normalize("SELECT 'x\\\\' FROM t FOR UPDATE")))
+
+    def test_key_follow_database_of_session(self):
+        cache = ResultCache()
+        query = ResultCache.normalize('SELECT * FROM t')
+        cache.put('p1', query, entry())
+        cache.track('p1', ResultCache.normalize('USE db2'))
+        self.assertIsNone(cache.get('p1', query))
+        cache.track('p1', ResultCache.normalize('SELECT 1'))
+        self.assertIsNone(cache.get('p1', query))
+
+        cache.put('p1', query, entry())
+        self.assertIsNotNone(cache.get('p1', query))
+        cache.track('p1', ResultCache.normalize('SET search_path TO other'))
+        self.assertIsNone(cache.get('p1', query))
+        self.assertIsNone(cache.get('p2', query))
+
+
+if __name__ == '__main__':
+    unittest.main()
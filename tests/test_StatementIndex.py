@@ -0,0 +1,87 @@
+import os
+import random
+import sys
+import unittest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtGui import QTextCursor
+from PyQt5.QtWidgets import QApplication, QPlainTextEdit
+
+from modules.StatementIndex import StatementIndex, split_statements
+
+app = QApplication.instance() or QApplication([])
+
+
+def sqls(xsql, profile=None):
+    return [(statement.profile, statement.sql(xsql).strip()) for statement in split_statements(xsql, profile)]
+
+
+class SplitStatementsTest(unittest.TestCase):
+    def test_delimiter_and_prefix(self):
+        self.assertEqual(sqls("@p1: SELECT ';'; SELECT 2\n@p2: SELECT 3"), [
+            ('p1', "SELECT ';'"), ('p1', 'SELECT 2'), ('p2', 'SELECT 3')
+        ])
+
+    def test_delimiter_command(self):
+        xsql = "DELIMITER //\nCREATE PROCEDURE p() BEGIN SELECT 1; END//\nDELIMITER ;\nSELECT 2;"
+        self.assertEqual(sqls(xsql, 'p1'), [
+            ('p1', 'CREATE PROCEDURE p() BEGIN SELECT 1; END'), ('p1', 'SELECT 2')
+        ])
+
+    def test_delimiter_command_after_prefix(self):
+        for delimiter in ('//', '$$'):
+            xsql = "@mysql1:\nDELIMITER {0}\nCREATE PROCEDURE p() BEGIN UPDATE t SET a='x'; END{0}\n" \
+                   "DELIMITER ;\nselect 1;".format(delimiter)
+            statements = split_statements(xsql)
+            self.assertEqual([(statement.profile, statement.sql(xsql)) for statement in statements], [
+                ('mysql1', "CREATE PROCEDURE p() BEGIN UPDATE t SET a='x'; END"), ('mysql1', 'select 1')
+            ])
+            self.assertEqual(statements[0].delimiter, delimiter)
+            # XSQL of statement run on its own give same statement again
+            first = xsql[statements[0].begin:statements[0].end]
+            self.assertEqual(sqls(first), [('mysql1', "CREATE PROCEDURE p() BEGIN UPDATE t SET a='x'; END")])
+
+    def test_dollar_quote(self):
+        xsql = "@pg: CREATE FUNCTION f() RETURNS int AS $$ SELECT 1; $$ LANGUAGE sql; SELECT $1"
+        self.assertEqual(sqls(xsql), [
+            ('pg', 'CREATE FUNCTION f() RETURNS int AS $$ SELECT 1; $$ LANGUAGE sql'), ('pg', 'SELECT $1')
+        ])
+
+
+class StatementIndexTest(unittest.TestCase):
+    PIECES = ['SELECT 1', ';', '\n', ' ', '@p1:', '@p2:', "'a;b'", '-- c;\n', 'DELIMITER //\n', 'DELIMITER ;\n',
+              '//', 'END', '$$', 'x']
+
+    def assertMatchesFresh(self, document, index):
+        text = document.toPlainText()
+        fresh = split_statements(text)
+        for statement in fresh:
+            found = index.statementAt(statement.body)
+            self.assertIsNotNone(found)
+            self.assertEqual((found.begin, found.body, found.end, found.profile, found.delimiter),
+                             (statement.begin, statement.body, statement.end, statement.profile, statement.delimiter),
+                             repr(text))
+
+    def test_edits_match_fresh_split(self):
+        generator = random.Random(7)
+        for _ in range(500):
+            # Document emit contentsChange only once it has layout, as document of editor has
+            editor = QPlainTextEdit()
+            document = editor.document()
+            document.setPlainText(''.join(generator.choice(self.PIECES) for _ in range(30)))
+            index = StatementIndex(document)
+            for _ in range(5):
+                index.statementAt(document.characterCount() - 1)
+                cursor = QTextCursor(document)
+                position = generator.randint(0, document.characterCount() - 1)
+                cursor.setPosition(position)
+                cursor.setPosition(min(document.characterCount() - 1, position + generator.randint(0, 6)),
+                                   QTextCursor.KeepAnchor)
+                cursor.insertText(generator.choice(self.PIECES))
+                self.assertMatchesFresh(document, index)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import datetime
+import decimal
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import unittest
+import zlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.Trace import Trace, TraceReader, TraceWriter
+
+
+class Executed(Exception):
+    pass
+
+
+class Payload:
+    def __reduce__(self):
+        return exec, ('raise Executed()',)
+
+
+class TraceTest(unittest.TestCase):
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.workdir, 'trace.xpqt')
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def test_values_round_trip(self):
+        row = (
+            1, 2.5, 'text', None, True, b'\x00\xff', memoryview(b'ab'), decimal.Decimal('12.3400'),
+            datetime.datetime(2024, 1, 2, 3, 4, 5, 6), datetime.datetime(2024, 1, 2, tzinfo=datetime.timezone.utc),
+            datetime.date(2024, 1, 2), datetime.time(3, 4, 5), datetime.timedelta(days=1, seconds=2),
+            {'a', 'b'}, {'key': [1, 2]}, [1, 2]
+        )
+        writer = TraceWriter(self.path)
+        writer.write(Trace.EXECUTE, 1, ('p1', 'MySQL', 'SELECT 1', [('a', 1, None, None, None, None, None)],
+                                        ['int64'], 0.5))
+        writer.write(Trace.BATCH, 1, (0.1, [row]))
+        writer.write(Trace.END, 1, (1, None))
+        writer.close()
+
+        execution, = TraceReader(self.path).executions
+        self.assertEqual(execution.query, 'SELECT 1')
+        self.assertEqual(execution.description[0].name, 'a')
+        self.assertEqual(execution.batches[0][1], [row[:6] + (b'ab',) + row[7:]])
+
+    def test_pickle_frame_is_not_run(self):
+        with open(self.path, 'wb') as file:
+            file.write(Trace.MAGIC)
+            data = zlib.compress(pickle.dumps((0.1, [Payload()])))
+            file.write(Trace.FRAME.pack(Trace.BATCH, 1, len(data)))
+            file.write(data)
+        with self.assertRaises(ValueError):
+            TraceReader(self.path)
+
+    def test_old_version_is_rejected(self):
+        with open(self.path, 'wb') as file:
+            file.write(b'XPQT\x01')
+        with self.assertRaisesRegex(ValueError, 'other version'):
+            TraceReader(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()